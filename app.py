@@ -11,12 +11,23 @@ This gives you a web interface to:
 """
 
 import os
+import io
 import json
+import queue
 import time
+import hashlib
+import tarfile
 import urllib.request
 import ssl
 import sys
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import shlex
+import shutil
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from collections import deque
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 from urllib.parse import parse_qs, urlparse
 from dotenv import load_dotenv
 
@@ -32,9 +43,108 @@ def log(msg):
         f.write(f"{time.strftime('%H:%M:%S')} - {msg}\n")
 
 # Store multiple sandbox instances
-SANDBOXES = {}  # id -> {sandbox_id, terminal_url, vnc_base_url, vnc_token}
+SANDBOXES = {}  # id -> {sandbox_id, terminal_url, vnc_base_url, vnc_token, status}
 NEXT_ID = 1
 
+# Guards SANDBOXES against the background reconciler
+SANDBOXES_LOCK = threading.Lock()
+
+# Startup latencies in seconds, so resume can be compared with fresh creation
+TIMINGS = {"create": [], "create_headless": [], "resume": []}
+
+# Opt-in: defer the VNC desktop until someone opens /vnc/<id> (or a GUI tool
+# needs it); OpenCode starts in a tmux session that the desktop terminal
+# later attaches to
+LAZY_DESKTOP = os.getenv("LAZY_DESKTOP", "").lower() in ("1", "true", "yes")
+OPENCODE_TMUX = "opencode"
+# Installs tmux if the image lacks it; opencode_tmux_start() then starts OpenCode in a detached session
+TMUX_INSTALL = (
+    'SUDO=; [ "$(id -u)" = 0 ] || SUDO="sudo -n"; '
+    "command -v tmux >/dev/null || { $SUDO apt-get update -q && $SUDO apt-get install -y -q tmux; }"
+)
+DESKTOP_LOCK = threading.Lock()
+
+# Default clone options (see core/repo.py); a create request can override them
+CLONE_DEFAULTS = {
+    "depth": int(os.getenv("CLONE_DEPTH", 0)) or None,
+    "blobless": os.getenv("CLONE_BLOBLESS", "0").lower() in ("1", "true", "yes"),
+    "bundle_cache": os.getenv("REPO_BUNDLE_CACHE", "0").lower() in ("1", "true", "yes"),
+}
+
+# Headless instances run "opencode web" in a session instead of a desktop
+OPENCODE_WEB_PORT = 4096
+OPENCODE_SESSION = "opencode-web"
+
+# Reconciliation of SANDBOXES against the Daytona API (0 disables it)
+RECONCILE_INTERVAL = int(os.getenv("RECONCILE_INTERVAL", 60))
+RECONCILE = {"last_run": None, "api_calls": 0, "drift": deque(maxlen=50)}
+
+# noVNC client, bundled under static/novnc/<content hash>/ on first start
+NOVNC_VERSION = "1.4.0"
+NOVNC_TARBALL = f"https://registry.npmjs.org/@novnc/novnc/-/novnc-{NOVNC_VERSION}.tgz"
+NOVNC_CDN_URL = f"https://cdn.jsdelivr.net/npm/@novnc/novnc@{NOVNC_VERSION}/core/rfb.js"
+STATIC_ROOT = Path(__file__).parent
+NOVNC_DIR = STATIC_ROOT / "static" / "novnc"
+NOVNC = {"rfb_url": NOVNC_CDN_URL}
+
+# Viewer/stream profiles. quality and compression are noVNC's JPEG quality
+# and zlib level (0-9); wait/defer are x11vnc's poll interval and update
+# delay in ms, which cap the frame rate; resolution is applied with xrandr
+# when the desktop starts.
+VNC_PROFILES = {
+    "interactive": {"quality": 6, "compression": 2, "wait": 10, "defer": 10,
+                    "resolution": None, "view_only": False},
+    "watch": {"quality": 4, "compression": 6, "wait": 100, "defer": 100,
+              "resolution": None, "view_only": True},
+    "thumbnail": {"quality": 1, "compression": 9, "wait": 500, "defer": 500,
+                  "resolution": "800x600", "view_only": True},
+}
+DEFAULT_VNC_PROFILE = os.getenv("VNC_PROFILE", "interactive")
+if DEFAULT_VNC_PROFILE not in VNC_PROFILES:
+    print(f"Warning: unknown VNC_PROFILE '{DEFAULT_VNC_PROFILE}', using 'interactive' "
+          f"(choices: {', '.join(VNC_PROFILES)})")
+    DEFAULT_VNC_PROFILE = "interactive"
+
+# Bytes received by viewers, reported by the VNC page: id -> {total, samples}
+BANDWIDTH = {}
+BANDWIDTH_WINDOW = 30
+
+# Grid view: low-resolution screenshots instead of one live stream per card
+THUMBNAIL_TTL = float(os.getenv("THUMBNAIL_TTL", 5))
+THUMBNAIL_SCALE = 0.25
+THUMBNAIL_QUALITY = 40
+THUMBNAILS = {}  # instance_id -> {"image": data URI, "taken_at": epoch seconds}
+THUMBNAILS_LOCK = threading.Lock()
+SANDBOX_HANDLES = {}  # sandbox_id -> SDK Sandbox, so refreshes skip daytona.get()
+
+# Share one upstream VNC websocket per sandbox between all viewers (core/vnc_relay.py)
+VNC_RELAY = os.getenv("VNC_RELAY", "").lower() in ("1", "true", "yes")
+RELAYS = {}  # instance_id -> VncRelay
+RELAYS_LOCK = threading.Lock()
+
+# Live output of install and server commands (core/logs.py), at /api/logs/<id>
+LOG_STREAMS = {}  # sandbox_id -> {stream name: LogStream}
+LOG_STREAMS_LOCK = threading.Lock()
+
+# Restart x11vnc with its current arguments plus -wait/-defer from $WAIT/$DEFER
+X11VNC_TUNE = r"""
+pid=$(pgrep -o -x x11vnc) || { echo "x11vnc not running"; exit 3; }
+mapfile -d '' args < /proc/$pid/cmdline
+keep=(); skip=0
+for a in "${args[@]}"; do
+    if [ $skip = 1 ]; then skip=0; continue; fi
+    case "$a" in -wait|-defer) skip=1 ;; *) keep+=("$a") ;; esac
+done
+kill $pid
+for i in $(seq 50); do kill -0 $pid 2>/dev/null || break; sleep 0.1; done
+nohup "${keep[@]}" -wait "$WAIT" -defer "$DEFER" >/tmp/x11vnc.log 2>&1 &
+echo "x11vnc restarted with -wait $WAIT -defer $DEFER"
+"""
+
+# Daytona sandbox states mapped to our instance status
+STATE_STATUS = {"started": "running", "stopped": "parked", "archived": "parked"}
+DEAD_STATES = {"destroyed", "destroying", "error", "build_failed"}
+
 
 class OpenCodeHandler(SimpleHTTPRequestHandler):
     """HTTP handler for the OpenCode web UI"""
@@ -46,6 +156,16 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
             self.serve_ui()
         elif path == "/api/status":
             self.serve_status()
+        elif path == "/api/bandwidth":
+            self.serve_bandwidth()
+        elif path == "/api/thumbnails":
+            self.serve_thumbnails()
+        elif path.startswith("/vnc-ws/"):
+            self.handle_vnc_websocket()
+        elif path == "/api/relay":
+            self.send_json(relay_summary())
+        elif path.startswith("/api/logs/"):
+            self.serve_logs()
         elif path.startswith("/vnc/"):
             # /vnc/1, /vnc/2, etc.
             self.handle_vnc_proxy()
@@ -54,6 +174,12 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
         else:
             self.send_error(404)
 
+    def end_headers(self):
+        # Bundled noVNC lives under a content-hashed directory, so it never changes
+        if self.path.startswith("/static/novnc/"):
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        super().end_headers()
+
     def handle_vnc_proxy(self):
         """Serve a custom noVNC page that connects directly to Daytona"""
         # Extract instance ID from path: /vnc/1 -> 1
@@ -65,15 +191,35 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
             return
 
         sandbox = SANDBOXES.get(instance_id)
+        if sandbox and sandbox.get("status") == "parked":
+            self.send_error(409, "Instance is parked - resume it first")
+            return
+        if sandbox and sandbox.get("mode") == "headless":
+            self.send_error(404, "Headless instance has no desktop")
+            return
         if not sandbox or not sandbox.get("vnc_base_url"):
             self.send_error(404, "No VNC URL available for this instance")
             return
+        if sandbox.get("desktop", "running") != "running":
+            start_desktop_async(instance_id)
+            self.serve_desktop_starting(instance_id)
+            return
 
         base = sandbox["vnc_base_url"].rstrip("/")
         ws_base = base.replace("https://", "wss://").replace("http://", "ws://")
         token = sandbox.get("vnc_token", "")
-
-        # Serve a minimal noVNC page that connects directly to Daytona
+        rfb_url = NOVNC["rfb_url"]
+        # A stored name may predate a profile being renamed or removed
+        profile = VNC_PROFILES.get(sandbox.get("profile"), VNC_PROFILES[DEFAULT_VNC_PROFILE])
+        view_only = "true" if profile["view_only"] else "false"
+        relay = "true" if VNC_RELAY else "false"
+        control_button = (
+            '<button id="control" onclick="takeControl()">Take control</button>'
+            if VNC_RELAY and not profile["view_only"] else ""
+        )
+
+        # Serve a minimal noVNC page that connects to Daytona directly or
+        # through our shared relay (/vnc-ws/<id>) when VNC_RELAY is enabled
         html = f'''<!DOCTYPE html>
 <html>
 <head>
@@ -91,48 +237,96 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
         }}
         #status.error {{ color: #f55; }}
         #status.connected {{ display: none; }}
+        #control {{
+            position: fixed; top: 10px; right: 10px; z-index: 1000;
+            background: rgba(0,0,0,0.7); color: #c9d1d9; border: 1px solid #30363d;
+            padding: 6px 12px; border-radius: 4px; font-family: monospace; cursor: pointer;
+        }}
     </style>
     <script type="module" crossorigin="anonymous">
-        import RFB from 'https://cdn.jsdelivr.net/npm/@novnc/novnc@1.4.0/core/rfb.js';
+        import RFB from '{rfb_url}';
 
         const status = document.getElementById('status');
-        const wsUrl = '{ws_base}/websockify?token={token}';
+        const directUrl = '{ws_base}/websockify?token={token}';
+        const viewerId = Math.random().toString(36).slice(2, 10);
+        const relayUrl = (location.protocol === 'https:' ? 'wss://' : 'ws://') + location.host
+            + '/vnc-ws/{instance_id}?viewer=' + viewerId;
+
+        // Count bytes on our own socket so bandwidth can be reported per instance
+        let received = 0;
+        setInterval(() => {{
+            if (!received) return;
+            const bytes = received;
+            received = 0;
+            fetch('/api/bandwidth', {{
+                method: 'POST',
+                headers: {{ 'Content-Type': 'application/json' }},
+                body: JSON.stringify({{ instance_id: {instance_id}, bytes }}),
+                keepalive: true
+            }}).catch(() => {{}});
+        }}, 5000);
+
+        function connect(url, fallbackUrl) {{
+            status.textContent = 'Connecting to VNC...';
+            const ws = new WebSocket(url, ['binary']);
+            ws.binaryType = 'arraybuffer';
+            ws.addEventListener('message', (e) => {{ received += e.data.byteLength || 0; }});
 
-        status.textContent = 'Connecting to VNC...';
-
-        try {{
-            const rfb = new RFB(
-                document.getElementById('screen'),
-                wsUrl,
-                {{ credentials: {{ password: '' }} }}
-            );
+            try {{
+                const rfb = new RFB(
+                    document.getElementById('screen'),
+                    ws,
+                    {{ credentials: {{ password: '' }} }}
+                );
+                let connected = false;
+
+                rfb.scaleViewport = true;
+                rfb.resizeSession = true;
+                rfb.qualityLevel = {profile["quality"]};
+                rfb.compressionLevel = {profile["compression"]};
+                rfb.viewOnly = {view_only};
+
+                rfb.addEventListener('connect', () => {{
+                    connected = true;
+                    status.textContent = 'Connected!';
+                    status.className = 'connected';
+                }});
 
-            rfb.scaleViewport = true;
-            rfb.resizeSession = true;
+                rfb.addEventListener('disconnect', (e) => {{
+                    // The relay could not reach the sandbox: connect directly instead
+                    if (!connected && fallbackUrl) return connect(fallbackUrl, null);
+                    status.textContent = 'Disconnected' + (e.detail.clean ? '' : ' (error)');
+                    status.className = 'error';
+                }});
 
-            rfb.addEventListener('connect', () => {{
-                status.textContent = 'Connected!';
-                status.className = 'connected';
-            }});
+                rfb.addEventListener('securityfailure', (e) => {{
+                    status.textContent = 'Security error: ' + e.detail.reason;
+                    status.className = 'error';
+                }});
 
-            rfb.addEventListener('disconnect', (e) => {{
-                status.textContent = 'Disconnected' + (e.detail.clean ? '' : ' (error)');
+            }} catch (err) {{
+                status.textContent = 'Error: ' + err.message;
                 status.className = 'error';
-            }});
+            }}
+        }}
 
-            rfb.addEventListener('securityfailure', (e) => {{
-                status.textContent = 'Security error: ' + e.detail.reason;
-                status.className = 'error';
+        window.takeControl = async () => {{
+            const res = await fetch('/api/relay/control', {{
+                method: 'POST',
+                headers: {{ 'Content-Type': 'application/json' }},
+                body: JSON.stringify({{ instance_id: {instance_id}, viewer: viewerId }})
             }});
+            const data = await res.json();
+            if (data.error) alert('Error: ' + data.error);
+        }};
 
-        }} catch (err) {{
-            status.textContent = 'Error: ' + err.message;
-            status.className = 'error';
-        }}
+        if ({relay}) connect(relayUrl, directUrl);
+        else connect(directUrl, null);
     </script>
 </head>
 <body>
     <div id="status">Initializing...</div>
+    {control_button}
     <div id="screen"></div>
 </body>
 </html>'''
@@ -144,6 +338,106 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(content)
 
+    def handle_vnc_websocket(self):
+        """Attach a viewer websocket to the instance's shared upstream relay"""
+        from core.vnc_relay import WebSocket, websocket_accept
+
+        url = urlparse(self.path)
+        try:
+            instance_id = int(url.path.split("/")[2])
+        except (IndexError, ValueError):
+            self.send_error(400, "Invalid instance ID")
+            return
+
+        sandbox = SANDBOXES.get(instance_id)
+        key = self.headers.get("Sec-WebSocket-Key")
+        if not VNC_RELAY or not key or not sandbox or sandbox.get("status") != "running":
+            self.send_error(404, "No VNC relay for this instance")
+            return
+
+        try:
+            relay = get_relay(instance_id)
+        except Exception as e:
+            log(f"VNC relay for instance {instance_id} failed: {e}")
+            self.send_error(502, f"VNC relay failed: {e}")
+            return
+
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", websocket_accept(key))
+        if "binary" in self.headers.get("Sec-WebSocket-Protocol", ""):
+            self.send_header("Sec-WebSocket-Protocol", "binary")
+        self.end_headers()
+
+        viewer_id = parse_qs(url.query).get("viewer", [str(id(self))])[0]
+        self.close_connection = True
+        relay.serve(viewer_id, WebSocket(self.rfile.read1, self.wfile.write, client=False))
+
+    def handle_relay_control(self):
+        """Give input control of a relayed instance to one viewer"""
+        data = self.read_json()
+        relay = RELAYS.get(data.get("instance_id"))
+        if not relay or not relay.take_control(data.get("viewer")):
+            self.send_json({"error": "Viewer is not connected through the relay"}, 400)
+            return
+        self.send_json({"success": True, **relay.stats()})
+
+    def serve_desktop_starting(self, instance_id):
+        """Placeholder shown while a lazily started desktop comes up"""
+        html = f'''<!DOCTYPE html>
+<html>
+<head>
+    <title>Starting desktop</title>
+    <meta charset="utf-8">
+    <style>
+        html, body {{ height: 100%; margin: 0; background: #1a1a2e; color: #8b949e; }}
+        body {{ display: flex; align-items: center; justify-content: center; font-family: monospace; }}
+        .error {{ color: #f55; }}
+    </style>
+</head>
+<body>
+    <div id="status">Starting desktop...</div>
+    <script>
+        const started = Date.now();
+        async function poll() {{
+            try {{
+                const res = await fetch('/api/status');
+                const data = await res.json();
+                const sandbox = data.sandboxes['{instance_id}'] || {{}};
+                if (sandbox.desktop === 'running') return window.location.reload();
+                if (sandbox.desktop === 'error') {{
+                    document.getElementById('status').textContent = 'Desktop failed to start: ' + (sandbox.desktop_error || '');
+                    document.getElementById('status').className = 'error';
+                    return;
+                }}
+                const secs = Math.round((Date.now() - started) / 1000);
+                document.getElementById('status').textContent = 'Starting desktop... ' + secs + 's';
+            }} catch (e) {{}}
+            setTimeout(poll, 1000);
+        }}
+        poll();
+    </script>
+</body>
+</html>'''
+        content = html.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", len(content))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def handle_desktop(self):
+        """Start an instance's desktop ahead of time (e.g. before scripted GUI use)"""
+        data = self.read_json()
+        instance_id = data.get("instance_id")
+        sandbox = SANDBOXES.get(instance_id)
+        if not sandbox or sandbox.get("mode") == "headless":
+            self.send_json({"error": "Invalid instance_id"}, 400)
+            return
+        start_desktop_async(instance_id)
+        self.send_json({"instance_id": instance_id, "desktop": sandbox.get("desktop")})
+
     def do_POST(self):
         path = urlparse(self.path).path
 
@@ -151,12 +445,25 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
             self.handle_create()
         elif path == "/api/stop":
             self.handle_stop()
+        elif path == "/api/park":
+            self.handle_park()
+        elif path == "/api/resume":
+            self.handle_resume()
+        elif path == "/api/profile":
+            self.handle_profile()
+        elif path == "/api/bandwidth":
+            self.handle_bandwidth_report()
+        elif path == "/api/relay/control":
+            self.handle_relay_control()
+        elif path == "/api/desktop":
+            self.handle_desktop()
         else:
             self.send_error(404)
 
     def serve_ui(self):
         """Serve the main HTML UI"""
-        html = self.get_ui_html()
+        view = parse_qs(urlparse(self.path).query).get("view", ["live"])[0]
+        html = self.get_ui_html(view)
         self.send_response(200)
         self.send_header("Content-Type", "text/html")
         self.send_header("Content-Length", len(html))
@@ -165,7 +472,18 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
 
     def serve_status(self):
         """Return all sandboxes status as JSON"""
-        self.send_json({"sandboxes": SANDBOXES})
+        with SANDBOXES_LOCK:
+            sandboxes = dict(SANDBOXES)
+        self.send_json({
+            "sandboxes": sandboxes,
+            "timings": timing_summary(),
+            "reconcile": {
+                "interval": RECONCILE_INTERVAL,
+                "last_run": RECONCILE["last_run"],
+                "api_calls": RECONCILE["api_calls"],
+                "drift": list(RECONCILE["drift"])
+            }
+        })
 
     def handle_create(self):
         """Create a new Daytona sandbox"""
@@ -181,18 +499,53 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
             data = {}
 
         repo_url = data.get("repo_url")
+        mode = data.get("mode") or "desktop"
+        if mode not in ("desktop", "headless"):
+            self.send_json({"error": f"Unknown mode: {mode}"}, 400)
+            return
+        from core.repo import CLONE_OPTIONS, check_clone_args
+
+        # Optional clone options, e.g. {"depth": 1, "blobless": true, "sparse": ["src"]}
+        clone = {**CLONE_DEFAULTS, **(data.get("clone") or {})}
+        unknown = set(clone) - set(CLONE_OPTIONS)
+        if unknown:
+            self.send_json({"error": f"Unknown clone options: {', '.join(sorted(unknown))}"}, 400)
+            return
+        if repo_url:
+            # Reject bad URLs and refs before a sandbox is paid for
+            try:
+                clone["sparse"] = check_clone_args(repo_url, clone.get("sparse"), clone.get("branch"))
+            except ValueError as e:
+                self.send_json({"error": str(e)}, 400)
+                return
+        profile = data.get("profile") or DEFAULT_VNC_PROFILE
+        if profile not in VNC_PROFILES:
+            self.send_json({"error": f"Unknown profile: {profile}"}, 400)
+            return
 
         try:
-            result = create_sandbox(repo_url)
-            instance_id = NEXT_ID
-            NEXT_ID += 1
-
-            SANDBOXES[instance_id] = {
-                "sandbox_id": result["sandbox_id"],
-                "terminal_url": result["terminal_url"],
-                "vnc_base_url": result.get("vnc_base_url"),
-                "vnc_token": result.get("vnc_token")
-            }
+            if mode == "headless":
+                result = create_headless_sandbox(repo_url, clone)
+            else:
+                result = create_sandbox(repo_url, profile, lazy=LAZY_DESKTOP, clone=clone)
+            # Requests are served on threads now, so allocate ids under the lock
+            with SANDBOXES_LOCK:
+                instance_id = NEXT_ID
+                NEXT_ID += 1
+                SANDBOXES[instance_id] = {
+                    "sandbox_id": result["sandbox_id"],
+                    "mode": mode,
+                    "terminal_url": result["terminal_url"],
+                    "vnc_base_url": result.get("vnc_base_url"),
+                    "vnc_token": result.get("vnc_token"),
+                    "workdir": result.get("workdir"),
+                    "desktop": result.get("desktop"),
+                    "status": "running",
+                    "profile": profile,
+                    "startup_seconds": result.get("startup_seconds"),
+                    "tmux_error": result.get("tmux_error"),
+                    "updated_at": time.time()
+                }
             self.send_json({"instance_id": instance_id, **SANDBOXES[instance_id]})
         except Exception as e:
             self.send_json({"error": str(e)}, 500)
@@ -215,11 +568,204 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
         try:
             sandbox = SANDBOXES[instance_id]
             stop_sandbox(sandbox["sandbox_id"])
-            del SANDBOXES[instance_id]
+            with SANDBOXES_LOCK:
+                SANDBOXES.pop(instance_id, None)
+            forget_instance(instance_id, sandbox["sandbox_id"])
             self.send_json({"success": True})
         except Exception as e:
             self.send_json({"error": str(e)}, 500)
 
+    def handle_park(self):
+        """Stop (or archive) a sandbox but keep its disk for a fast resume"""
+        data = self.read_json()
+        instance_id = data.get("instance_id")
+        if not instance_id or instance_id not in SANDBOXES:
+            self.send_json({"error": "Invalid instance_id"}, 400)
+            return
+
+        try:
+            sandbox = SANDBOXES[instance_id]
+            park_sandbox(sandbox["sandbox_id"], archive=bool(data.get("archive")))
+            sandbox["status"] = "parked"
+            forget_instance(instance_id, sandbox["sandbox_id"], parked=True)
+            self.send_json({"success": True, **sandbox})
+        except Exception as e:
+            self.send_json({"error": str(e)}, 500)
+
+    def handle_resume(self):
+        """Resume a parked instance, or adopt a parked sandbox by sandbox_id"""
+        global NEXT_ID
+
+        data = self.read_json()
+        instance_id = data.get("instance_id")
+        sandbox_id = data.get("sandbox_id")
+
+        if instance_id:
+            if instance_id not in SANDBOXES:
+                self.send_json({"error": "Invalid instance_id"}, 400)
+                return
+            sandbox_id = SANDBOXES[instance_id]["sandbox_id"]
+        elif not sandbox_id:
+            self.send_json({"error": "instance_id or sandbox_id required"}, 400)
+            return
+
+        try:
+            existing = SANDBOXES.get(instance_id, {})
+            profile = existing.get("profile", DEFAULT_VNC_PROFILE)
+            if existing.get("mode") == "headless":
+                result = resume_headless_sandbox(sandbox_id, existing.get("workdir"))
+            else:
+                result = resume_sandbox(sandbox_id, profile)
+            with SANDBOXES_LOCK:
+                if not instance_id:
+                    instance_id = NEXT_ID
+                    NEXT_ID += 1
+                    SANDBOXES[instance_id] = {"sandbox_id": sandbox_id, "profile": profile}
+
+                SANDBOXES[instance_id].update({
+                    "terminal_url": result["terminal_url"],
+                    "vnc_base_url": result.get("vnc_base_url"),
+                    "vnc_token": result.get("vnc_token"),
+                    "status": "running",
+                    "desktop": result.get("desktop"),
+                    "resume_seconds": result.get("resume_seconds"),
+                    "updated_at": time.time()
+                })
+            self.send_json({"instance_id": instance_id, **SANDBOXES[instance_id]})
+        except Exception as e:
+            self.send_json({"error": str(e)}, 500)
+
+    def handle_profile(self):
+        """Switch an instance's VNC profile (frame rate applies immediately)"""
+        data = self.read_json()
+        instance_id = data.get("instance_id")
+        profile = data.get("profile")
+        if not instance_id or instance_id not in SANDBOXES:
+            self.send_json({"error": "Invalid instance_id"}, 400)
+            return
+        if profile not in VNC_PROFILES:
+            self.send_json({"error": f"Unknown profile: {profile}"}, 400)
+            return
+
+        try:
+            sandbox = SANDBOXES[instance_id]
+            sandbox["profile"] = profile
+            if sandbox.get("status") == "running" and sandbox.get("desktop") == "running":
+                tune_vnc_server(get_daytona().get(sandbox["sandbox_id"]), profile, resize=False)
+            self.send_json({"success": True, **sandbox})
+        except Exception as e:
+            self.send_json({"error": str(e)}, 500)
+
+    def handle_bandwidth_report(self):
+        """Record bytes a VNC viewer received since its last report"""
+        data = self.read_json()
+        instance_id = data.get("instance_id")
+        try:
+            nbytes = int(data.get("bytes", 0))
+        except (TypeError, ValueError):
+            nbytes = 0
+        if instance_id not in SANDBOXES or nbytes <= 0:
+            self.send_json({"error": "Invalid report"}, 400)
+            return
+
+        entry = BANDWIDTH.setdefault(instance_id, {"total": 0, "samples": deque(maxlen=200)})
+        entry["total"] += nbytes
+        entry["samples"].append((time.time(), nbytes))
+        self.send_json({"success": True})
+
+    def serve_thumbnails(self):
+        """Return cached (or freshly taken) thumbnails for ?ids=1,2,3 in one response"""
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            ids = [int(i) for i in query.get("ids", [""])[0].split(",") if i]
+        except ValueError:
+            self.send_json({"error": "ids must be comma-separated instance ids"}, 400)
+            return
+        self.send_json(get_thumbnails(ids or list(SANDBOXES)))
+
+    def serve_logs(self):
+        """
+        /api/logs/<id> lists an instance's log streams;
+        ?stream=NAME&since=N returns buffered lines from sequence number N on;
+        adding &follow=1 streams them as Server-Sent Events instead.
+        """
+        path = urlparse(self.path).path
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            instance_id = int(path.split("/")[3])
+        except (IndexError, ValueError):
+            self.send_error(400, "Invalid instance ID")
+            return
+
+        entry = SANDBOXES.get(instance_id)
+        if not entry:
+            self.send_json({"error": "Instance not found"}, 404)
+            return
+        with LOG_STREAMS_LOCK:
+            streams = dict(LOG_STREAMS.get(entry["sandbox_id"], {}))
+
+        name = query.get("stream", [None])[0]
+        if name is None:
+            self.send_json({
+                "streams": {
+                    n: {"lines": s.total, "closed": s.closed, "exit_code": s.exit_code}
+                    for n, s in streams.items()
+                }
+            })
+            return
+        stream = streams.get(name)
+        if stream is None:
+            self.send_json({"error": f"No log stream {name!r}"}, 404)
+            return
+
+        if query.get("follow", ["0"])[0] not in ("1", "true"):
+            try:
+                since = int(query.get("since", ["0"])[0])
+            except ValueError:
+                since = 0
+            self.send_json(stream.read(since))
+            return
+
+        # A bounded subscriber: if this client reads too slowly it misses
+        # lines (and is told how many) rather than holding up the tail
+        subscriber = stream.subscribe()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            while True:
+                try:
+                    line = subscriber.get(timeout=15)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                if line is None:
+                    end = json.dumps({"exit_code": stream.exit_code})
+                    self.wfile.write(f"event: end\ndata: {end}\n\n".encode())
+                    break
+                self.wfile.write(f"data: {line}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            subscriber.close()
+
+    def serve_bandwidth(self):
+        """Return bytes received and recent rate per instance"""
+        self.send_json(bandwidth_summary())
+
+    def read_json(self):
+        """Read the request body as JSON, returning {} if empty or invalid"""
+        content_length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(content_length).decode() if content_length > 0 else "{}"
+
+        try:
+            return json.loads(body) if body else {}
+        except ValueError:
+            return {}
+
     def send_json(self, data, status=200):
         """Send JSON response"""
         body = json.dumps(data).encode()
@@ -229,10 +775,15 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
-    def get_ui_html(self):
-        """Return the HTML for the web UI"""
+    def get_ui_html(self, view="live"):
+        """Return the HTML for the web UI ("live" iframes or a "grid" of thumbnails)"""
         # Build instance cards
         instance_count = len(SANDBOXES)
+        grid = view == "grid"
+        view_toggle = (
+            '<a class="btn-secondary view-toggle" href="/">Live view</a>' if grid
+            else '<a class="btn-secondary view-toggle" href="/?view=grid">Grid view</a>'
+        )
 
         return f'''<!DOCTYPE html>
 <html>
@@ -285,6 +836,56 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
         .btn-primary:hover {{ background: #2ea043; }}
         .btn-danger {{ background: #da3633; color: white; padding: 6px 12px; font-size: 12px; }}
         .btn-danger:hover {{ background: #f85149; }}
+        .btn-secondary {{ background: #30363d; color: #c9d1d9; padding: 6px 12px; font-size: 12px; margin-right: 6px; }}
+        .btn-secondary:hover {{ background: #484f58; }}
+        select {{
+            padding: 5px 8px;
+            background: #0d1117;
+            border: 1px solid #30363d;
+            border-radius: 6px;
+            color: #c9d1d9;
+            font-size: 12px;
+            margin-right: 6px;
+        }}
+        .view-toggle {{ text-decoration: none; margin-left: auto; }}
+        .instances.grid {{ grid-template-columns: repeat(auto-fill, minmax(280px, 1fr)); }}
+        .thumb {{
+            display: block;
+            width: 100%;
+            aspect-ratio: 4 / 3;
+            object-fit: contain;
+            background: #000;
+            color: #8b949e;
+            cursor: pointer;
+        }}
+        .overlay {{
+            display: none;
+            position: fixed;
+            inset: 0;
+            background: rgba(0, 0, 0, 0.8);
+            z-index: 100;
+            padding: 32px;
+        }}
+        .overlay.open {{ display: flex; flex-direction: column; }}
+        .overlay iframe {{ flex: 1; width: 100%; border: none; }}
+        .terminal-card {{
+            padding: 24px;
+            display: flex;
+            flex-direction: column;
+            gap: 10px;
+            font-size: 13px;
+            color: #8b949e;
+        }}
+        .terminal-card a {{ color: #58a6ff; font-size: 15px; }}
+        .terminal-card code {{ color: #c9d1d9; }}
+        .bandwidth {{ color: #8b949e; font-size: 12px; margin-right: 12px; }}
+        .parked {{
+            height: 500px;
+            display: flex;
+            align-items: center;
+            justify-content: center;
+            color: #8b949e;
+        }}
         .instances {{
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(600px, 1fr));
@@ -330,13 +931,26 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
 
     <div class="controls">
         <input type="text" id="repo-url" placeholder="Git repo URL (optional)" />
+        <select id="mode" title="Instance type">
+            <option value="desktop">Desktop (VNC)</option>
+            <option value="headless">Headless (terminal only)</option>
+        </select>
         <button class="btn-primary" id="start-btn" onclick="createSandbox()">
             + New Instance
         </button>
+        {view_toggle}
     </div>
 
-    <div class="instances">
-        {self._render_instances()}
+    <div class="instances{' grid' if grid else ''}">
+        {self._render_instances(grid)}
+    </div>
+
+    <div class="overlay" id="overlay" onclick="if (event.target === this) collapseInstance()">
+        <div class="instance-header">
+            <span id="overlay-title"></span>
+            <button class="btn-secondary" onclick="collapseInstance()">Close</button>
+        </div>
+        <iframe id="overlay-frame" allow="clipboard-read; clipboard-write; fullscreen"></iframe>
     </div>
 
     {'''<div class="empty-state">
@@ -347,6 +961,7 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
     <script>
         async function createSandbox() {{
             const repoUrl = document.getElementById('repo-url').value;
+            const mode = document.getElementById('mode').value;
             const btn = document.getElementById('start-btn');
             btn.disabled = true;
             btn.textContent = 'Creating...';
@@ -355,7 +970,7 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
                 const res = await fetch('/api/create', {{
                     method: 'POST',
                     headers: {{ 'Content-Type': 'application/json' }},
-                    body: JSON.stringify({{ repo_url: repoUrl || null }})
+                    body: JSON.stringify({{ repo_url: repoUrl || null, mode }})
                 }});
                 const data = await res.json();
                 if (data.error) {{
@@ -372,6 +987,101 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
             }}
         }}
 
+        async function postInstance(action, instanceId, extra) {{
+            try {{
+                const res = await fetch('/api/' + action, {{
+                    method: 'POST',
+                    headers: {{ 'Content-Type': 'application/json' }},
+                    body: JSON.stringify({{ instance_id: instanceId, ...extra }})
+                }});
+                const data = await res.json();
+                if (data.error) alert('Error: ' + data.error);
+                window.location.reload();
+            }} catch (e) {{
+                alert('Error: ' + e.message);
+            }}
+        }}
+
+        async function setProfile(instanceId, profile) {{
+            await postInstance('profile', instanceId, {{ profile }});
+        }}
+
+        function formatRate(bytesPerSec) {{
+            if (bytesPerSec >= 1048576) return (bytesPerSec / 1048576).toFixed(1) + ' MB/s';
+            return (bytesPerSec / 1024).toFixed(1) + ' KB/s';
+        }}
+
+        async function refreshBandwidth() {{
+            try {{
+                const res = await fetch('/api/bandwidth');
+                const data = await res.json();
+                for (const [id, bw] of Object.entries(data)) {{
+                    const el = document.getElementById('bw-' + id);
+                    if (el) el.textContent = formatRate(bw.bytes_per_sec);
+                }}
+            }} catch (e) {{}}
+        }}
+        setInterval(refreshBandwidth, 5000);
+
+        // Grid view: one batched request refreshes the thumbnails on screen,
+        // and a live stream only opens for the expanded instance
+        const GRID = {'true' if grid else 'false'};
+        const visibleThumbs = new Set();
+        let expanded = null;
+
+        async function refreshThumbnails() {{
+            if (document.hidden || !visibleThumbs.size) return;
+            const ids = [...visibleThumbs].filter(id => id !== expanded);
+            if (!ids.length) return;
+            try {{
+                const res = await fetch('/api/thumbnails?ids=' + ids.join(','));
+                const data = await res.json();
+                for (const [id, thumb] of Object.entries(data)) {{
+                    const img = document.getElementById('thumb-' + id);
+                    if (!img) continue;
+                    if (thumb.image) img.src = thumb.image;
+                    else img.alt = thumb.error || thumb.status || 'No preview';
+                }}
+            }} catch (e) {{}}
+        }}
+
+        function expandInstance(instanceId) {{
+            expanded = instanceId;
+            document.getElementById('overlay-title').textContent = 'Instance #' + instanceId;
+            document.getElementById('overlay-frame').src = '/vnc/' + instanceId;
+            document.getElementById('overlay').classList.add('open');
+        }}
+
+        function collapseInstance() {{
+            expanded = null;
+            // Dropping the iframe closes its VNC websocket
+            document.getElementById('overlay-frame').src = 'about:blank';
+            document.getElementById('overlay').classList.remove('open');
+        }}
+
+        if (GRID) {{
+            const observer = new IntersectionObserver((entries) => {{
+                for (const entry of entries) {{
+                    const id = Number(entry.target.dataset.id);
+                    if (entry.isIntersecting) visibleThumbs.add(id);
+                    else visibleThumbs.delete(id);
+                }}
+                refreshThumbnails();
+            }});
+            document.querySelectorAll('img.thumb').forEach(img => observer.observe(img));
+            setInterval(refreshThumbnails, {int(THUMBNAIL_TTL * 1000)});
+        }}
+
+        function parkInstance(instanceId) {{
+            postInstance('park', instanceId, {{}});
+        }}
+
+        function resumeInstance(instanceId, btn) {{
+            btn.disabled = true;
+            btn.textContent = 'Resuming...';
+            postInstance('resume', instanceId, {{}});
+        }}
+
         async function stopInstance(instanceId) {{
             if (!confirm('Stop this instance?')) return;
 
@@ -390,23 +1100,53 @@ class OpenCodeHandler(SimpleHTTPRequestHandler):
 </body>
 </html>'''
 
-    def _render_instances(self):
-        """Render HTML for all running instances"""
+    def _render_instances(self, grid=False):
+        """Render HTML for all instances (thumbnails instead of iframes in grid view)"""
         if not SANDBOXES:
             return ""
 
         html_parts = []
-        for instance_id, sandbox in SANDBOXES.items():
+        for instance_id, sandbox in list(SANDBOXES.items()):
+            if sandbox.get("status") == "parked":
+                toggle = f'<button class="btn-secondary" onclick="resumeInstance({instance_id}, this)">Resume</button>'
+                body = '<div class="parked">Parked - disk kept, resume to re-attach</div>'
+            elif sandbox.get("mode") == "headless":
+                toggle = f'<button class="btn-secondary" onclick="parkInstance({instance_id})">Park</button>'
+                body = f'''<div class="terminal-card">
+                    <span>Headless OpenCode (no desktop)</span>
+                    <a href="{sandbox.get('terminal_url', '#')}" target="_blank">Open OpenCode web UI &rarr;</a>
+                    <span>Workspace: <code>{sandbox.get('workdir') or '/home/daytona'}</code></span>
+                    <span>Started in {sandbox.get('resume_seconds') or sandbox.get('startup_seconds')}s</span>
+                </div>'''
+            elif grid:
+                toggle = f'<button class="btn-secondary" onclick="parkInstance({instance_id})">Park</button>'
+                body = f'<img class="thumb" id="thumb-{instance_id}" data-id="{instance_id}" alt="Loading preview..." onclick="expandInstance({instance_id})">'
+            else:
+                toggle = f'<button class="btn-secondary" onclick="parkInstance({instance_id})">Park</button>'
+                body = f'<iframe src="/vnc/{instance_id}" allow="clipboard-read; clipboard-write; fullscreen"></iframe>'
+
+            current = sandbox.get("profile", DEFAULT_VNC_PROFILE)
+            options = "".join(
+                f'<option value="{name}"{" selected" if name == current else ""}>{name}</option>'
+                for name in VNC_PROFILES
+            )
+            profile_select = f'<select onchange="setProfile({instance_id}, this.value)" title="VNC profile">{options}</select>'
+            if sandbox.get("mode") == "headless":
+                profile_select = ""
+
             html_parts.append(f'''
             <div class="instance">
                 <div class="instance-header">
                     <span>Instance #{instance_id}</span>
                     <div>
+                        <span class="bandwidth" id="bw-{instance_id}"></span>
+                        {profile_select}
                         <a href="{sandbox.get('terminal_url', '#')}" target="_blank" style="color: #8b949e; margin-right: 12px; text-decoration: none;">Open in Tab</a>
+                        {toggle}
                         <button class="btn-danger" onclick="stopInstance({instance_id})">Stop</button>
                     </div>
                 </div>
-                <iframe src="/vnc/{instance_id}" allow="clipboard-read; clipboard-write; fullscreen"></iframe>
+                {body}
             </div>
             ''')
         return "\n".join(html_parts)
@@ -426,10 +1166,47 @@ def get_tool_scripts():
 DEFAULT_QUIZ_URL = "https://www.buzzfeed.com/luisdelvalle/this-is-not-the-quiz-youre-looking-for"
 
 
-def create_sandbox(repo_url=None):
-    """Create a Daytona sandbox with VNC desktop and terminal running OpenCode"""
+def bundle_novnc():
+    """
+    Make the noVNC client available from /static/ instead of the CDN.
+
+    Downloads the npm tarball once and unpacks core/ and vendor/ into
+    static/novnc/<sha256 prefix>/. Later starts reuse that directory. On any
+    failure the viewer keeps importing from the CDN.
+    """
+    for existing in sorted(NOVNC_DIR.glob(f"{NOVNC_VERSION}-*/core/rfb.js")):
+        NOVNC["rfb_url"] = "/" + existing.relative_to(STATIC_ROOT).as_posix()
+        return NOVNC["rfb_url"]
+
     try:
-        from daytona import Daytona, DaytonaConfig, CreateSandboxBaseParams
+        with urllib.request.urlopen(NOVNC_TARBALL, timeout=30) as resp:
+            data = resp.read()
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        target = NOVNC_DIR / f"{NOVNC_VERSION}-{digest}"
+        staging = NOVNC_DIR / f".staging-{os.getpid()}"
+
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+            members = []
+            for member in tar.getmembers():
+                name = member.name.split("/", 1)[-1]
+                if member.isfile() and name.startswith(("core/", "vendor/")) and ".." not in name:
+                    member.name = name
+                    members.append(member)
+            tar.extractall(staging, members=members)
+
+        staging.replace(target)
+        NOVNC["rfb_url"] = "/" + (target / "core" / "rfb.js").relative_to(STATIC_ROOT).as_posix()
+        log(f"noVNC {NOVNC_VERSION} bundled at {NOVNC['rfb_url']}")
+    except Exception as e:
+        log(f"noVNC bundling failed, using CDN: {e}")
+        shutil.rmtree(NOVNC_DIR / f".staging-{os.getpid()}", ignore_errors=True)
+    return NOVNC["rfb_url"]
+
+
+def get_daytona():
+    """Return a Daytona client configured from the environment"""
+    try:
+        from daytona import Daytona, DaytonaConfig
     except ImportError:
         raise Exception("daytona not installed. Run: pip install daytona")
 
@@ -440,16 +1217,33 @@ def create_sandbox(repo_url=None):
     if not api_key:
         raise Exception("DAYTONA_API_KEY not set in .env file")
 
+    config = DaytonaConfig(api_key=api_key, api_url=api_url, target=target)
+    return Daytona(config)
+
+
+def create_sandbox(repo_url=None, profile=DEFAULT_VNC_PROFILE, lazy=False, clone=None):
+    """
+    Create a Daytona sandbox with VNC desktop and terminal running OpenCode,
+    in repo_url's checkout if given (clone holds options for
+    core.repo.clone_repo).
+
+    With lazy=True the desktop is not started: OpenCode runs in a tmux
+    session, and start_desktop() later opens a desktop terminal attached
+    to it.
+    """
+    from core.logs import run_streamed
+
+    try:
+        from daytona import CreateSandboxBaseParams
+    except ImportError:
+        raise Exception("daytona not installed. Run: pip install daytona")
+
+    started = time.monotonic()
+
     log("=" * 50)
     log("[1/4] Creating Daytona sandbox...")
 
-    # Initialize Daytona client
-    config = DaytonaConfig(
-        api_key=api_key,
-        api_url=api_url,
-        target=target
-    )
-    daytona = Daytona(config)
+    daytona = get_daytona()
 
     # Create public sandbox
     params = CreateSandboxBaseParams(public=True)
@@ -457,8 +1251,70 @@ def create_sandbox(repo_url=None):
     sandbox_id = sandbox.id
     log(f"       Sandbox ID: {sandbox_id}")
 
-    # Start VNC desktop
-    log("[2/4] Starting VNC desktop...")
+    if lazy:
+        log("[2/4] Deferring VNC desktop until first viewer")
+    else:
+        log("[2/4] Starting VNC desktop...")
+        start_vnc(sandbox, profile)
+
+    # Install OpenCode using npm
+    log("[3/5] Installing OpenCode via npm...")
+    try:
+        exit_code, _ = run_streamed(
+            sandbox, "npm install -g opencode-ai@latest", log_stream(sandbox_id, "install"),
+            session_id="install", timeout=180
+        )
+        log(f"       OpenCode install: exit_code={exit_code}")
+    except Exception as e:
+        log(f"       Install error: {e}")
+
+    workdir = clone_workspace(sandbox, repo_url, clone)
+
+    tmux_error = None
+    if lazy:
+        log("[4/4] Starting OpenCode in tmux...")
+        try:
+            exit_code, output = run_streamed(
+                sandbox, f"{TMUX_INSTALL} && cd {workdir} && tmux new-session -d -s {OPENCODE_TMUX} opencode",
+                log_stream(sandbox_id, "tmux"), session_id="tmux", timeout=180
+            )
+            if exit_code != 0:
+                tmux_error = f"exit_code={exit_code}: {output.strip()[-300:]}"
+        except Exception as e:
+            tmux_error = str(e)
+
+        if tmux_error:
+            # Nothing would be running for the desktop to attach to later
+            log(f"       tmux failed ({tmux_error}), starting the desktop now")
+            lazy = False
+            start_vnc(sandbox, profile)
+
+    if not lazy:
+        launch_opencode_terminal(sandbox, f"cd {workdir} && opencode")
+        time.sleep(2)
+
+    links = get_vnc_links(sandbox)
+    startup_seconds = round(time.monotonic() - started, 1)
+    TIMINGS["create"].append(startup_seconds)
+
+    log("=" * 50)
+    log(f"  DONE in {startup_seconds}s! Check VNC in browser.")
+    log("=" * 50)
+
+    return {
+        "sandbox_id": sandbox_id,
+        **links,
+        "workdir": workdir,
+        "desktop": "stopped" if lazy else "running",
+        "tmux_error": tmux_error,
+        "startup_seconds": startup_seconds
+    }
+
+
+def start_vnc(sandbox, profile):
+    """Start the sandbox's VNC desktop and apply the stream profile"""
+    from core.readiness import poll_until, vnc_ready
+
     try:
         result = sandbox.computer_use.start()
         log(f"       VNC started: {result}")
@@ -466,15 +1322,356 @@ def create_sandbox(repo_url=None):
         log(f"       VNC error: {e}")
 
     log("       Waiting for VNC to initialize...")
-    time.sleep(5)
+    try:
+        _, waited = poll_until(lambda: vnc_ready(sandbox), timeout=30)
+        log(f"       VNC ready after {waited:.1f}s")
+    except TimeoutError:
+        log("       VNC not answering yet, continuing")
+    tune_vnc_server(sandbox, profile)
 
-    # Install OpenCode using npm
-    log("[3/5] Installing OpenCode via npm...")
+
+def start_desktop_async(instance_id):
+    """Start an instance's deferred desktop in the background (once)"""
+    with DESKTOP_LOCK:
+        sandbox = SANDBOXES.get(instance_id)
+        if not sandbox or sandbox.get("desktop") not in ("stopped", "error"):
+            return
+        sandbox["desktop"] = "starting"
+    threading.Thread(target=start_desktop, args=(instance_id,), daemon=True).start()
+
+
+def start_desktop(instance_id):
+    """Bring up the VNC desktop and attach a terminal to the OpenCode tmux session"""
+    from core.readiness import ensure_desktop
+
+    entry = SANDBOXES[instance_id]
+    started = time.monotonic()
+    log(f"Starting desktop for instance {instance_id}...")
     try:
-        result = sandbox.process.exec("npm install -g opencode-ai@latest", timeout=180)
-        log(f"       OpenCode install: exit_code={result.exit_code}")
+        sandbox = get_sandbox_handle(entry["sandbox_id"])
+        waited = ensure_desktop(sandbox)
+        log(f"       VNC ready after {waited:.1f}s")
+        tune_vnc_server(sandbox, entry.get("profile", DEFAULT_VNC_PROFILE))
+        launch_opencode_terminal(
+            sandbox, f"tmux attach -t {OPENCODE_TMUX} || opencode"
+        )
+        entry["desktop"] = "running"
+        entry["desktop_seconds"] = round(time.monotonic() - started, 1)
+        log(f"       Desktop up in {entry['desktop_seconds']}s")
     except Exception as e:
-        log(f"       Install error: {e}")
+        entry["desktop"] = "error"
+        entry["desktop_error"] = str(e)
+        log(f"       Desktop start error: {e}")
+
+
+def log_stream(sandbox_id, name):
+    """Return a fresh LogStream for a sandbox's command output (replacing a finished one)"""
+    from core.logs import LogStream
+
+    with LOG_STREAMS_LOCK:
+        streams = LOG_STREAMS.setdefault(sandbox_id, {})
+        if name not in streams or streams[name].closed:
+            streams[name] = LogStream(name)
+        return streams[name]
+
+
+def get_sandbox_handle(sandbox_id):
+    """Return the SDK Sandbox for sandbox_id, fetched once and then reused"""
+    handle = SANDBOX_HANDLES.get(sandbox_id)
+    if handle is None:
+        handle = get_daytona().get(sandbox_id)
+        SANDBOX_HANDLES[sandbox_id] = handle
+    return handle
+
+
+def take_thumbnail(sandbox_id):
+    """Take a small JPEG screenshot of a sandbox desktop as a data URI"""
+    try:
+        from daytona import ScreenshotOptions
+    except ImportError:
+        raise Exception("daytona not installed. Run: pip install daytona")
+
+    shot = get_sandbox_handle(sandbox_id).computer_use.screenshot.take_compressed(
+        ScreenshotOptions(fmt="jpeg", quality=THUMBNAIL_QUALITY, scale=THUMBNAIL_SCALE)
+    )
+    return "data:image/jpeg;base64," + shot.screenshot
+
+
+def get_thumbnails(instance_ids):
+    """
+    Return {instance_id: {"image", "taken_at", "age"} or {"status"/"error"}}.
+
+    Thumbnails younger than THUMBNAIL_TTL come from the cache, so any number
+    of open dashboards cost at most one screenshot per instance per TTL.
+    Stale ones are refreshed in parallel.
+    """
+    now = time.time()
+    result = {}
+    stale = []
+    for instance_id in instance_ids:
+        sandbox = SANDBOXES.get(instance_id)
+        if not sandbox:
+            result[instance_id] = {"error": "unknown instance"}
+        elif sandbox.get("status") != "running":
+            result[instance_id] = {"status": sandbox.get("status")}
+        elif sandbox.get("mode") == "headless":
+            result[instance_id] = {"status": "headless"}
+        elif sandbox.get("desktop", "running") != "running":
+            # Thumbnails never start a desktop; expanding the card does
+            state = sandbox.get("desktop")
+            result[instance_id] = {"status": "desktop not started - click to start" if state == "stopped" else f"desktop {state}"}
+        else:
+            with THUMBNAILS_LOCK:
+                cached = THUMBNAILS.get(instance_id)
+            if cached and now - cached["taken_at"] < THUMBNAIL_TTL:
+                result[instance_id] = {**cached, "age": round(now - cached["taken_at"], 1)}
+            else:
+                stale.append((instance_id, sandbox["sandbox_id"]))
+
+    def refresh(item):
+        instance_id, sandbox_id = item
+        try:
+            entry = {"image": take_thumbnail(sandbox_id), "taken_at": time.time()}
+        except Exception as e:
+            SANDBOX_HANDLES.pop(sandbox_id, None)
+            return instance_id, {"error": str(e)}
+        with THUMBNAILS_LOCK:
+            THUMBNAILS[instance_id] = entry
+        return instance_id, {**entry, "age": 0}
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(8, len(stale))) as pool:
+            result.update(pool.map(refresh, stale))
+    return result
+
+
+def tune_vnc_server(sandbox, profile, resize=True):
+    """
+    Apply a profile's server side: desktop resolution (only when resize,
+    i.e. as the desktop starts) and the x11vnc frame-rate limits.
+    Best effort - failures are logged and the defaults stay in place.
+    """
+    settings = VNC_PROFILES.get(profile, VNC_PROFILES[DEFAULT_VNC_PROFILE])
+    log(f"       Applying VNC profile '{profile}'...")
+
+    if resize and settings["resolution"]:
+        try:
+            result = sandbox.process.exec(f"DISPLAY=:1 xrandr -s {settings['resolution']}", timeout=15)
+            log(f"       Resolution {settings['resolution']}: exit_code={result.exit_code}")
+        except Exception as e:
+            log(f"       Resolution error: {e}")
+
+    try:
+        result = sandbox.process.exec(
+            f"WAIT={settings['wait']} DEFER={settings['defer']} bash -c {shlex.quote(X11VNC_TUNE)}",
+            timeout=30
+        )
+        log(f"       {result.result.strip() or f'x11vnc tune: exit_code={result.exit_code}'}")
+    except Exception as e:
+        log(f"       x11vnc tune error: {e}")
+
+
+def get_relay(instance_id):
+    """Return the instance's shared VNC relay, connecting upstream on first use"""
+    from core.vnc_relay import VncRelay
+
+    with RELAYS_LOCK:
+        relay = RELAYS.get(instance_id)
+    if relay is not None and relay.sock is not None:
+        return relay
+
+    sandbox = SANDBOXES[instance_id]
+    base = sandbox["vnc_base_url"].rstrip("/")
+    ws_base = base.replace("https://", "wss://").replace("http://", "ws://")
+
+    def forget(closed):
+        with RELAYS_LOCK:
+            if RELAYS.get(instance_id) is closed:
+                RELAYS.pop(instance_id)
+
+    # Connect outside the lock so one slow upstream does not hold up other instances
+    relay = VncRelay(f"{ws_base}/websockify?token={sandbox.get('vnc_token', '')}", on_empty=forget)
+    relay.connect()
+    with RELAYS_LOCK:
+        current = RELAYS.get(instance_id)
+        if current is not None and current.sock is not None:
+            # Another viewer connected one meanwhile; share that one
+            duplicate, relay = relay, current
+        else:
+            duplicate = None
+            RELAYS[instance_id] = relay
+    if duplicate:
+        duplicate.close()
+    else:
+        log(f"VNC relay for instance {instance_id} connected ({relay.width}x{relay.height})")
+    return relay
+
+
+def close_relay(instance_id):
+    with RELAYS_LOCK:
+        relay = RELAYS.pop(instance_id, None)
+    if relay:
+        relay.close()
+
+
+def forget_instance(instance_id, sandbox_id, parked=False):
+    """
+    Drop the per-instance caches of a deleted sandbox, or of a parked one
+    (whose desktop, relay and SDK handle are stale but whose bandwidth
+    totals and log streams are kept for when it resumes).
+    """
+    from core.readiness import forget_desktop
+
+    close_relay(instance_id)
+    with THUMBNAILS_LOCK:
+        THUMBNAILS.pop(instance_id, None)
+    SANDBOX_HANDLES.pop(sandbox_id, None)
+    forget_desktop(sandbox_id)
+    if not parked:
+        BANDWIDTH.pop(instance_id, None)
+        with LOG_STREAMS_LOCK:
+            LOG_STREAMS.pop(sandbox_id, None)
+
+
+def relay_summary():
+    """Viewers, controller and upstream/downstream bytes per relayed instance"""
+    with RELAYS_LOCK:
+        relays = dict(RELAYS)
+    return {instance_id: relay.stats() for instance_id, relay in relays.items()}
+
+
+def bandwidth_summary():
+    """Total and recent (BANDWIDTH_WINDOW seconds) viewer bytes per instance"""
+    now = time.time()
+    summary = {}
+    for instance_id, entry in list(BANDWIDTH.items()):
+        recent = sum(n for t, n in entry["samples"] if now - t <= BANDWIDTH_WINDOW)
+        summary[instance_id] = {
+            "profile": SANDBOXES.get(instance_id, {}).get("profile", DEFAULT_VNC_PROFILE),
+            "total_bytes": entry["total"],
+            "bytes_per_sec": round(recent / BANDWIDTH_WINDOW),
+        }
+    for instance_id, stats in relay_summary().items():
+        summary.setdefault(instance_id, {"total_bytes": 0, "bytes_per_sec": 0})["relay"] = stats
+    return summary
+
+
+def start_opencode_web(sandbox, workdir):
+    """
+    Run "opencode web" in a background session and wait until it answers.
+    Its output is tailed into the sandbox's "opencode-web" log stream.
+    """
+    from core.logs import tail_session_command
+    from core.readiness import wait_for_server
+
+    try:
+        sandbox.process.create_session(OPENCODE_SESSION)
+    except Exception:
+        pass  # session survives from before a park
+    command = sandbox.process.execute_session_command(
+        OPENCODE_SESSION,
+        f"cd {workdir} && opencode web --hostname 0.0.0.0 --port {OPENCODE_WEB_PORT}",
+        var_async=True
+    )
+    cmd_id = getattr(command, "cmd_id", None)
+    if cmd_id:
+        # A long-lived server: poll its logs less often than a short install
+        tail_session_command(
+            sandbox, OPENCODE_SESSION, cmd_id, log_stream(sandbox.id, "opencode-web"), interval=2
+        )
+    waited = wait_for_server(sandbox, OPENCODE_WEB_PORT, OPENCODE_SESSION, cmd_id)
+    log(f"       OpenCode web ready after {waited:.1f}s")
+
+    preview = sandbox.get_preview_link(OPENCODE_WEB_PORT)
+    return str(preview.url) if hasattr(preview, "url") else str(preview)
+
+
+def clone_workspace(sandbox, repo_url, clone=None):
+    """Clone repo_url into the sandbox and return the directory OpenCode should open"""
+    from core.repo import clone_repo, transfer_summary
+
+    if not repo_url:
+        return "/home/daytona"
+    stats = clone_repo(sandbox, repo_url, log=log, **(clone or {}))
+    log(f"       Clone: exit_code={stats['exit_code']} via {stats['method']} "
+        f"in {stats['seconds']}s, {transfer_summary(stats)}")
+    return "/home/daytona/project" if stats["exit_code"] == 0 else "/home/daytona"
+
+
+def create_headless_sandbox(repo_url=None, clone=None):
+    """
+    Create a sandbox running "opencode web" only - no desktop, no VNC.
+    clone holds options for core.repo.clone_repo.
+    """
+    from core.logs import run_streamed
+
+    try:
+        from daytona import CreateSandboxBaseParams
+    except ImportError:
+        raise Exception("daytona not installed. Run: pip install daytona")
+
+    started = time.monotonic()
+
+    log("=" * 50)
+    log("[1/3] Creating headless Daytona sandbox...")
+    daytona = get_daytona()
+    sandbox = daytona.create(CreateSandboxBaseParams(public=True))
+    log(f"       Sandbox ID: {sandbox.id}")
+
+    log("[2/3] Installing OpenCode via npm...")
+    exit_code, _ = run_streamed(
+        sandbox, "npm install -g opencode-ai@latest", log_stream(sandbox.id, "install"),
+        session_id="install", timeout=180
+    )
+    log(f"       OpenCode install: exit_code={exit_code}")
+
+    workdir = clone_workspace(sandbox, repo_url, clone)
+
+    log("[3/3] Starting OpenCode web...")
+    web_url = start_opencode_web(sandbox, workdir)
+
+    startup_seconds = round(time.monotonic() - started, 1)
+    TIMINGS["create_headless"].append(startup_seconds)
+    log("=" * 50)
+    log(f"  DONE in {startup_seconds}s! OpenCode web: {web_url}")
+    log("=" * 50)
+
+    return {
+        "sandbox_id": sandbox.id,
+        "terminal_url": web_url,
+        "workdir": workdir,
+        "startup_seconds": startup_seconds
+    }
+
+
+def resume_headless_sandbox(sandbox_id, workdir=None):
+    """Restart a parked headless sandbox and its OpenCode web server"""
+    started = time.monotonic()
+    daytona = get_daytona()
+
+    log("=" * 50)
+    log(f"[1/2] Resuming headless sandbox {sandbox_id}...")
+    sandbox = daytona.get(sandbox_id)
+    if "started" not in str(getattr(sandbox, "state", "")).lower():
+        sandbox.start(timeout=120)
+
+    log("[2/2] Restarting OpenCode web...")
+    web_url = start_opencode_web(sandbox, workdir or "/home/daytona")
+
+    resume_seconds = round(time.monotonic() - started, 1)
+    TIMINGS["resume"].append(resume_seconds)
+    log(f"  RESUMED in {resume_seconds}s")
+
+    return {
+        "sandbox_id": sandbox_id,
+        "terminal_url": web_url,
+        "resume_seconds": resume_seconds
+    }
+
+
+def launch_opencode_terminal(sandbox, command="opencode"):
+    """Open a terminal on the desktop and run command (OpenCode) in it"""
+    from core.actions import enter_text
 
     # Open terminal via Daytona keyboard API
     log("[4/5] Opening terminal via Ctrl+Alt+T...")
@@ -494,16 +1691,16 @@ def create_sandbox(repo_url=None):
     except Exception as e:
         log(f"       Click error: {e}")
 
-    # Type opencode and press Enter (using Ctrl+M which works in terminals)
-    log("[6/6] Typing opencode and pressing Enter...")
+    # Type the command and press Enter (using Ctrl+M which works in terminals)
+    log(f"[6/6] Typing {command} and pressing Enter...")
     try:
         # Click to focus
         sandbox.computer_use.mouse.click(x=500, y=350, button="left")
         time.sleep(0.5)
 
-        # Type opencode
-        sandbox.computer_use.keyboard.type("opencode")
-        log("       Typed 'opencode'")
+        # Type the command (long input would be pasted via the clipboard)
+        entered = enter_text(sandbox, command)
+        log(f"       Typed '{command}' via {entered['path']} in {entered['ms']:.0f} ms")
         time.sleep(0.3)
 
         # Ctrl+M = Enter in terminals (ASCII carriage return)
@@ -513,9 +1710,9 @@ def create_sandbox(repo_url=None):
     except Exception as e:
         log(f"       Error: {e}")
 
-    time.sleep(2)
 
-    # Get VNC URL
+def get_vnc_links(sandbox):
+    """Fetch fresh noVNC preview links for a sandbox"""
     terminal_url = None
     vnc_base_url = None
     vnc_token = None
@@ -536,12 +1733,7 @@ def create_sandbox(repo_url=None):
     except Exception as e:
         log(f"       VNC URL error: {e}")
 
-    log("=" * 50)
-    log("  DONE! Check VNC in browser.")
-    log("=" * 50)
-
     return {
-        "sandbox_id": sandbox_id,
         "terminal_url": terminal_url,
         "vnc_base_url": vnc_base_url,
         "vnc_token": vnc_token
@@ -550,24 +1742,173 @@ def create_sandbox(repo_url=None):
 
 def stop_sandbox(sandbox_id):
     """Stop and delete a Daytona sandbox"""
+    daytona = get_daytona()
+
+    print(f"Stopping sandbox: {sandbox_id}")
+    daytona.delete(sandbox_id)
+    print("Sandbox stopped")
+
+
+def park_sandbox(sandbox_id, archive=False):
+    """
+    Stop a sandbox but keep its disk, so a later resume skips re-provisioning.
+
+    With archive=True the stopped sandbox is also moved to archive storage,
+    which is cheaper to keep but slower to resume.
+    """
+    daytona = get_daytona()
+    sandbox = daytona.get(sandbox_id)
+
+    log(f"Parking sandbox: {sandbox_id}")
+    sandbox.stop()
+    if archive:
+        sandbox.archive()
+    log("Sandbox archived" if archive else "Sandbox stopped (disk kept)")
+
+
+def resume_sandbox(sandbox_id, profile=DEFAULT_VNC_PROFILE):
+    """Restart a parked sandbox and bring VNC and OpenCode back up"""
+    from core.readiness import poll_until, vnc_ready, process_running
+
+    started = time.monotonic()
+    daytona = get_daytona()
+
+    log("=" * 50)
+    log(f"[1/4] Resuming sandbox {sandbox_id}...")
+    sandbox = daytona.get(sandbox_id)
+    if "started" not in str(getattr(sandbox, "state", "")).lower():
+        sandbox.start(timeout=120)
+    log(f"       Sandbox started after {time.monotonic() - started:.1f}s")
+
+    # Desktop processes do not survive a stop, so start VNC again
+    log("[2/4] Starting VNC desktop...")
     try:
-        from daytona import Daytona, DaytonaConfig
-    except ImportError:
-        raise Exception("daytona not installed")
+        sandbox.computer_use.start()
+    except Exception as e:
+        log(f"       VNC error: {e}")
+    _, waited = poll_until(lambda: vnc_ready(sandbox), timeout=60)
+    log(f"       VNC ready after {waited:.1f}s")
+    tune_vnc_server(sandbox, profile)
+
+    # OpenCode is already installed on the kept disk; only relaunch it
+    log("[3/4] Relaunching OpenCode...")
+    if not process_running(sandbox, "opencode"):
+        launch_opencode_terminal(sandbox)
+        try:
+            _, waited = poll_until(lambda: process_running(sandbox, "opencode"), timeout=30)
+            log(f"       OpenCode running after {waited:.1f}s")
+        except TimeoutError:
+            log("       OpenCode did not start - check the desktop")
+
+    # Preview tokens are not guaranteed to survive a stop
+    log("[4/4] Refreshing preview links...")
+    links = get_vnc_links(sandbox)
+
+    resume_seconds = round(time.monotonic() - started, 1)
+    TIMINGS["resume"].append(resume_seconds)
+    summary = timing_summary()
+    log("=" * 50)
+    log(f"  RESUMED in {resume_seconds}s (avg fresh create: {summary['create_avg']}s)")
+    log("=" * 50)
 
-    api_key = os.getenv("DAYTONA_API_KEY")
-    api_url = os.getenv("DAYTONA_API_URL", "https://app.daytona.io/api")
-    target = os.getenv("DAYTONA_TARGET", "us")
+    return {
+        "sandbox_id": sandbox_id,
+        **links,
+        "desktop": "running",
+        "resume_seconds": resume_seconds
+    }
 
-    if not api_key:
-        raise Exception("DAYTONA_API_KEY not set")
 
-    config = DaytonaConfig(api_key=api_key, api_url=api_url, target=target)
-    daytona = Daytona(config)
+def list_sandbox_states(daytona):
+    """Return {sandbox_id: state} for every sandbox in the account"""
+    states = {}
+    page = 1
+    while True:
+        result = daytona.list() if page == 1 else daytona.list(page=page)
+        RECONCILE["api_calls"] += 1
+        # Newer SDKs return a paginated object, older ones a plain list
+        for sandbox in getattr(result, "items", result):
+            state = getattr(sandbox.state, "value", sandbox.state)
+            states[sandbox.id] = str(state).lower()
+        if page >= getattr(result, "total_pages", 1):
+            return states
+        page += 1
+
+
+def reconcile_sandboxes(daytona):
+    """
+    Sync SANDBOXES with the real sandbox states using one list call.
+
+    Auto-stopped sandboxes become "parked" (they can be resumed), deleted or
+    failed ones are dropped, and every change is recorded as drift.
+    Instances created or resumed after the listing started are left alone:
+    the listing may predate them.
+    """
+    listed_at = time.time()
+    states = list_sandbox_states(daytona)
+    RECONCILE["last_run"] = time.strftime("%H:%M:%S")
+
+    stale = []  # (instance_id, sandbox_id, parked) whose caches to drop
+    with SANDBOXES_LOCK:
+        for instance_id, sandbox in list(SANDBOXES.items()):
+            if sandbox.get("updated_at", 0) >= listed_at:
+                continue
+            state = states.get(sandbox["sandbox_id"])
+            old_status = sandbox.get("status")
+
+            if state is None or state in DEAD_STATES:
+                new_status = "gone"
+                SANDBOXES.pop(instance_id, None)
+                stale.append((instance_id, sandbox["sandbox_id"], False))
+            else:
+                new_status = STATE_STATUS.get(state, old_status)
+                sandbox["state"] = state
+                sandbox["status"] = new_status
+                if new_status == "parked" and old_status != "parked":
+                    stale.append((instance_id, sandbox["sandbox_id"], True))
+
+            if new_status != old_status:
+                RECONCILE["drift"].append({
+                    "time": RECONCILE["last_run"],
+                    "instance_id": instance_id,
+                    "sandbox_id": sandbox["sandbox_id"],
+                    "from": old_status,
+                    "to": new_status,
+                    "state": state
+                })
+                log(f"Drift: instance #{instance_id} {old_status} -> {new_status} (state={state})")
+
+    # Outside the lock: closing a relay waits on its connection
+    for instance_id, sandbox_id, parked in stale:
+        forget_instance(instance_id, sandbox_id, parked=parked)
+
+
+def reconcile_loop(interval):
+    """Reconcile SANDBOXES every interval seconds, forever"""
+    daytona = get_daytona()
+    while True:
+        time.sleep(interval)
+        if not SANDBOXES:
+            continue
+        try:
+            reconcile_sandboxes(daytona)
+        except Exception as e:
+            log(f"Reconcile error: {e}")
 
-    print(f"Stopping sandbox: {sandbox_id}")
-    daytona.delete(sandbox_id)
-    print("Sandbox stopped")
+
+def timing_summary():
+    """Average create and resume latency over this server's lifetime"""
+    def avg(values):
+        return round(sum(values) / len(values), 1) if values else None
+
+    return {
+        "create_avg": avg(TIMINGS["create"]),
+        "create_count": len(TIMINGS["create"]),
+        "create_headless_avg": avg(TIMINGS["create_headless"]),
+        "create_headless_count": len(TIMINGS["create_headless"]),
+        "resume_avg": avg(TIMINGS["resume"]),
+        "resume_count": len(TIMINGS["resume"])
+    }
 
 
 def main():
@@ -587,7 +1928,15 @@ def main():
     print("=" * 50)
     print("")
 
-    server = HTTPServer(("0.0.0.0", port), OpenCodeHandler)
+    if RECONCILE_INTERVAL > 0 and os.getenv("DAYTONA_API_KEY"):
+        threading.Thread(
+            target=reconcile_loop, args=(RECONCILE_INTERVAL,), daemon=True
+        ).start()
+
+    # Fetch noVNC in the background; the viewer uses the CDN until it is ready
+    threading.Thread(target=bundle_novnc, daemon=True).start()
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), partial(OpenCodeHandler, directory=str(STATIC_ROOT)))
 
     try:
         server.serve_forever()
@@ -18,25 +18,17 @@ import os
 import sys
 import time
 import argparse
-from pathlib import Path
 from dotenv import load_dotenv
 
+from core.readiness import poll_until, vnc_ready
+from core.sandbox_tools import upload_tools
+from core.screen import wait_until_settled
+
 load_dotenv()
 
 # Default quiz URL
 DEFAULT_QUIZ_URL = "https://www.buzzfeed.com/luisdelvalle/this-is-not-the-quiz-youre-looking-for"
 
-# Tool scripts to upload
-TOOLS_DIR = Path(__file__).parent / "tools"
-
-
-def get_tool_scripts():
-    """Read all tool scripts from the tools directory"""
-    scripts = {}
-    for script_file in TOOLS_DIR.glob("*.sh"):
-        scripts[script_file.name] = script_file.read_text()
-    return scripts
-
 
 def create_computer_agent_sandbox(quiz_url=None, keep_alive=False):
     """Create a Daytona sandbox configured for computer use agent"""
@@ -85,13 +77,18 @@ def create_computer_agent_sandbox(quiz_url=None, keep_alive=False):
     except Exception as e:
         print(f"       VNC start error: {e}")
 
-    time.sleep(3)
+    try:
+        _, waited = poll_until(lambda: vnc_ready(sandbox), timeout=30)
+        print(f"       Desktop ready after {waited:.1f}s")
+    except TimeoutError:
+        print("       Desktop not answering yet, continuing")
 
-    # Step 3: Install dependencies (xdotool, scrot, firefox)
+    # Step 3: Install dependencies (xdotool, scrot, firefox, AT-SPI for a11y_tree.py)
     print("[3/7] Installing tools (xdotool, scrot, firefox)...")
     try:
         result = sandbox.process.exec(
-            "apt-get update && apt-get install -y xdotool scrot firefox-esr xterm",
+            "apt-get update && apt-get install -y xdotool scrot firefox-esr xterm "
+            "python3-pyatspi at-spi2-core",
             timeout=180
         )
         print(f"       Tools installed")
@@ -118,28 +115,23 @@ def create_computer_agent_sandbox(quiz_url=None, keep_alive=False):
     # Step 5: Upload tool scripts
     print("[5/7] Uploading computer control tools...")
     try:
-        # Create tools directory
-        sandbox.process.exec("mkdir -p /home/daytona/tools")
-
-        # Upload each script
-        scripts = get_tool_scripts()
-        for name, content in scripts.items():
-            sandbox.fs.upload_file(f"/home/daytona/tools/{name}", content.encode())
-            print(f"       Uploaded: {name}")
-
-        # Make scripts executable
-        sandbox.process.exec("chmod +x /home/daytona/tools/*.sh")
-        print(f"       Made {len(scripts)} scripts executable")
+        # Uploads the scripts and starts the input daemon they talk to
+        count = upload_tools(sandbox)
+        print(f"       Made {count} scripts executable")
     except Exception as e:
         print(f"       Upload error: {e}")
 
     # Step 6: Open browser to quiz URL
     print("[6/7] Opening Firefox to quiz URL...")
     try:
-        # Launch Firefox in background
-        sandbox.process.exec(f'DISPLAY=:1 firefox-esr "{quiz_url}" &')
-        time.sleep(5)  # Give Firefox time to load
-        print(f"       Firefox launched")
+        # Launch Firefox in background, exposing its accessibility tree
+        sandbox.process.exec(f'DISPLAY=:1 GNOME_ACCESSIBILITY=1 firefox-esr "{quiz_url}" &')
+        # Continue as soon as the window has appeared and stopped redrawing,
+        # and never wait much longer than the fixed 5s this replaced
+        settled = wait_until_settled(
+            sandbox, stable_ms=1000, timeout=6, change_timeout=4, fallback=5
+        )
+        print(f"       Firefox launched (settled after {settled.get('waited_ms')} ms)")
     except Exception as e:
         print(f"       Firefox launch error: {e}")
 
@@ -161,12 +153,23 @@ echo "  ./tools/type_text.sh TEXT - Type text"
 echo "  ./tools/scroll.sh up/down - Scroll the page"
 echo "  ./tools/key.sh KEY        - Press a key (e.g., Return, ctrl+l)"
 echo "  ./tools/screen_info.sh    - Get screen dimensions"
+echo "  ./tools/batch.py JSON     - Run several actions in one call"
+echo "  ./tools/screen_cache.py   - Reuse analyses of unchanged screens"
+echo "  ./tools/a11y_tree.py      - Text + clickable elements as JSON (no image)"
 echo ""
 echo "Example workflow:"
 echo "  1. ./tools/screenshot.sh"
 echo "  2. View /tmp/screen.png to see the page"
 echo "  3. ./tools/click.sh 500 300 to click"
 echo ""
+echo "Skip re-analysing a screen you have already seen:"
+echo "  ./tools/screen_cache.py lookup            (exit 0 + cached value on a hit)"
+echo "  ./tools/screen_cache.py store --hash H 'what you decided'"
+echo "  ./tools/screen_cache.py stats             (hit rate and time saved)"
+echo ""
+echo "Batch example (click, type, Enter, then screenshot):"
+echo "  ./tools/batch.py '[{{\\\"action\\\": \\\"click\\\", \\\"x\\\": 500, \\\"y\\\": 300}}, {{\\\"action\\\": \\\"type\\\", \\\"text\\\": \\\"hi\\\"}}, {{\\\"action\\\": \\\"key\\\", \\\"keys\\\": \\\"ctrl+m\\\"}}]' --screenshot"
+echo ""
 echo "Starting OpenCode..."
 echo ""
 '''
@@ -191,7 +194,7 @@ exec opencode
     except Exception as e:
         print(f"       Launch error: {e}")
 
-    time.sleep(2)
+    wait_until_settled(sandbox, stable_ms=500, timeout=3, fallback=2)
 
     # Get VNC URL
     vnc_url = None
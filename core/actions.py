@@ -0,0 +1,193 @@
+"""
+Batched computer control actions.
+
+Sends an ordered list of actions to tools/batch.py in a single remote exec,
+instead of one exec or computer_use call per action. enter_text() pastes
+long strings through the clipboard instead of typing them key by key.
+run_batch_or_computer_use() finishes a failed batch through the computer_use
+API, for sandboxes where the tools cannot run.
+
+Example:
+    from core.actions import run_batch, click, type_text, key, settle
+
+    result = run_batch(sandbox, [
+        click(500, 350),
+        type_text("opencode"),
+        key("ctrl+m"),
+        settle(),
+    ], screenshot=True)
+"""
+
+import json
+import time
+import shlex
+
+from core.readiness import ensure_desktop
+from core.sandbox_tools import REMOTE_TOOLS_DIR, input_daemon_started
+
+# Matches INPUTD_PASTE_MIN in tools/input_daemon.py
+PASTE_MIN_CHARS = 32
+
+
+def click(x, y, button=1):
+    return {"action": "click", "x": x, "y": y, "button": button}
+
+
+def type_text(text):
+    return {"action": "type", "text": text}
+
+
+def paste_text(text):
+    """Paste long text via the clipboard; short text is typed"""
+    return {"action": "text", "text": text}
+
+
+def key(keys):
+    return {"action": "key", "keys": keys}
+
+
+def scroll(direction="down", amount=3):
+    return {"action": "scroll", "direction": direction, "amount": amount}
+
+
+def wait(ms):
+    return {"action": "wait", "ms": ms}
+
+
+def settle(stable_ms=300, timeout_ms=5000, change_timeout_ms=1000):
+    """Wait for the UI to react (up to change_timeout_ms) and then stop changing"""
+    return {
+        "action": "settle",
+        "stable_ms": stable_ms,
+        "timeout_ms": timeout_ms,
+        "change_timeout_ms": change_timeout_ms
+    }
+
+
+def run_batch(sandbox, actions, screenshot=False, stop_on_error=True, timeout=60):
+    """
+    Run actions in order inside the sandbox with one round trip.
+
+    Returns the dict printed by tools/batch.py:
+        {"ok", "via", "total_ms", "results": [{"action", "ok", "ms", ...}],
+         "screenshot": "data:image/jpeg;base64,..." (if requested)}
+    A failed entry has "sent": False if none of its input reached the
+    display. If batch.py was never uploaded, "started" is False.
+    """
+    ensure_desktop(sandbox)
+    payload = json.dumps({
+        "actions": actions,
+        "screenshot": screenshot,
+        "stop_on_error": stop_on_error
+    })
+    missing = json.dumps({"ok": False, "started": False, "error": "batch.py not uploaded", "results": []})
+    batch = f"{REMOTE_TOOLS_DIR}/batch.py"
+    result = sandbox.process.exec(
+        f"if [ -f {batch} ]; then DISPLAY=:1 python3 {batch} {shlex.quote(payload)}; "
+        f"else echo {shlex.quote(missing)}; fi",
+        timeout=timeout
+    )
+
+    try:
+        return json.loads(result.result.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {"ok": False, "error": result.result.strip(), "results": []}
+
+
+def run_with_computer_use(sandbox, actions):
+    """
+    Perform actions through the sandbox's computer_use API, one call each.
+
+    The slow path for when run_batch() cannot run (no tools uploaded, or no
+    input daemon and no xdotool). Waits and settles become short sleeps.
+    """
+    for action in actions:
+        kind = action["action"]
+        if kind == "click":
+            button = {1: "left", 2: "middle", 3: "right"}.get(action.get("button", 1), "left")
+            sandbox.computer_use.mouse.click(x=action["x"], y=action["y"], button=button)
+        elif kind in ("type", "text"):
+            sandbox.computer_use.keyboard.type(action["text"])
+        elif kind == "key":
+            mods, _, last = action["keys"].rpartition("+")
+            if "+" in mods:
+                # hotkey() handles chords such as ctrl+alt+t
+                sandbox.computer_use.keyboard.hotkey(action["keys"])
+            else:
+                # press("m", ["ctrl"]) is the Enter that reaches terminals
+                sandbox.computer_use.keyboard.press(last, [mods] if mods else None)
+        elif kind == "scroll":
+            # The daemon scrolls wherever the pointer is, so do the same
+            if "x" in action:
+                x, y = action["x"], action["y"]
+            else:
+                position = sandbox.computer_use.mouse.get_position()
+                x, y = position.x, position.y
+            sandbox.computer_use.mouse.scroll(
+                x=x, y=y, direction=action.get("direction", "down"), amount=action.get("amount", 3)
+            )
+        elif kind == "wait":
+            time.sleep(action["ms"] / 1000)
+        elif kind == "settle":
+            time.sleep((action.get("stable_ms", 300) + action.get("change_timeout_ms", 1000)) / 1000)
+
+
+def run_batch_or_computer_use(sandbox, actions, timeout=60):
+    """
+    Run actions with run_batch(), and if the batch fails, perform the
+    actions it did not get through with run_with_computer_use().
+
+    Input is never repeated: the fallback only runs when batch.py never
+    started, or when its results show exactly where it stopped and that
+    the failed action sent nothing. Otherwise (an exec timeout, a crash,
+    an action that failed partway) the failure is returned as it is.
+
+    Returns the batch result dict, with "fallback" set to the number of
+    actions that went through computer_use.
+    """
+    try:
+        result = run_batch(sandbox, actions, timeout=timeout)
+    except Exception as e:
+        # The batch may still be running in the sandbox
+        return {"ok": False, "error": str(e), "results": [], "fallback": 0}
+    result["fallback"] = 0
+    if result.get("ok"):
+        return result
+
+    if result.get("started") is False:
+        done = 0
+    else:
+        results = result.get("results", [])
+        done = 0
+        while done < len(results) and results[done].get("ok"):
+            done += 1
+        if done == len(results) or results[done].get("sent", True):
+            return result
+
+    run_with_computer_use(sandbox, actions[done:])
+    result["fallback"] = len(actions) - done
+    return result
+
+
+def enter_text(sandbox, text, timeout=60):
+    """
+    Enter text into the focused window by the fastest available path.
+
+    Long text goes through the input daemon's clipboard paste (which itself
+    falls back to typing if the window never reads the clipboard). Short
+    text, or a sandbox whose input daemon was not started by upload_tools(),
+    uses computer_use typing.
+
+    Returns {"path": "paste" | "type" | "keyboard", "ms": float}.
+    """
+    start = time.perf_counter()
+    if len(text) >= PASTE_MIN_CHARS and input_daemon_started(sandbox):
+        result = run_batch(sandbox, [paste_text(text)], timeout=timeout)
+        if result.get("ok"):
+            return {
+                "path": result["results"][0].get("path", "type"),
+                "ms": round((time.perf_counter() - start) * 1000, 2)
+            }
+
+    sandbox.computer_use.keyboard.type(text)
+    return {"path": "keyboard", "ms": round((time.perf_counter() - start) * 1000, 2)}
@@ -0,0 +1,161 @@
+"""
+Several OpenCode agents in one sandbox.
+
+An agent spends most of its time waiting on the LLM, so one sandbox can
+host several. Each agent gets its own tmux window and working directory
+(a git worktree when the workspace is a repository), and its shell is put
+under CPU and memory caps before OpenCode starts:
+    - a cgroup v2 group per agent (cpu.max, memory.max) when the sandbox
+      lets us create one
+    - otherwise a lower scheduling priority (nice 10) and no memory cap
+
+agent_stats() reports CPU time and memory per agent, so throughput per
+sandbox can be compared across packing densities.
+
+Example:
+    from core.agents import upload_agent_limits, agent_setup_commands
+
+    upload_agent_limits(sandbox)
+    script = "\\n".join(agent_setup_commands("/home/daytona/project", 4, cpus=0.5, memory="1G"))
+"""
+
+import json
+import shlex
+
+AGENTS_DIR = "/home/daytona/agents"
+REMOTE_LIMITS = "/home/daytona/agent_limits.sh"
+
+# Sourced by each agent's shell: ". agent_limits.sh NAME" with $CPU_MAX
+# ("QUOTA PERIOD" in microseconds) and $MEM_MAX (e.g. 1G) set, or empty
+AGENT_LIMITS = r"""
+name=$1
+mkdir -p /tmp/agents
+SUDO=; [ "$(id -u)" = 0 ] || SUDO="sudo -n"
+group=/sys/fs/cgroup/agents
+method=nice
+if [ -f /sys/fs/cgroup/cgroup.controllers ] && $SUDO mkdir -p "$group/$name" 2>/dev/null; then
+    echo "+cpu +memory" | $SUDO tee /sys/fs/cgroup/cgroup.subtree_control >/dev/null 2>&1
+    echo "+cpu +memory" | $SUDO tee "$group/cgroup.subtree_control" >/dev/null 2>&1
+    ok=1
+    [ -z "$CPU_MAX" ] || echo "$CPU_MAX" | $SUDO tee "$group/$name/cpu.max" >/dev/null 2>&1 || ok=
+    [ -z "$MEM_MAX" ] || echo "$MEM_MAX" | $SUDO tee "$group/$name/memory.max" >/dev/null 2>&1 || ok=
+    [ -n "$ok" ] && echo $$ | $SUDO tee "$group/$name/cgroup.procs" >/dev/null 2>&1 && method=cgroup
+fi
+[ $method = nice ] && renice -n 10 -p $$ >/dev/null 2>&1
+echo $method > /tmp/agents/$name.limits
+"""
+
+# Prints {window: {"limits", "cpu_seconds", "memory_bytes", "processes"}}
+# for every agent window of tmux session "main"
+AGENT_STATS = r"""
+import os, re, json, subprocess
+
+panes = subprocess.run(
+    ["tmux", "list-panes", "-s", "-t", "main", "-F", "#{window_name}|#{pane_pid}"],
+    capture_output=True, text=True
+).stdout.split()
+hz, page = os.sysconf("SC_CLK_TCK"), os.sysconf("SC_PAGE_SIZE")
+
+procs, children = {}, {}
+for pid in filter(str.isdigit, os.listdir("/proc")):
+    try:
+        fields = open(f"/proc/{pid}/stat").read().rsplit(")", 1)[1].split()
+    except OSError:
+        continue
+    procs[pid] = ((int(fields[11]) + int(fields[12])) / hz, int(fields[21]) * page)
+    children.setdefault(fields[1], []).append(pid)
+
+def read(path):
+    try:
+        return open(path).read()
+    except OSError:
+        return None
+
+stats = {}
+for line in panes:
+    name, _, pid = line.partition("|")
+    if not re.fullmatch(r"opencode|agent\d+", name) or name in stats:
+        continue
+    tree, todo = [], [pid]
+    while todo:
+        p = todo.pop()
+        if p in procs:
+            tree.append(p)
+            todo.extend(children.get(p, []))
+    limits = (read(f"/tmp/agents/{name}.limits") or "none").strip()
+    cpu = sum(procs[p][0] for p in tree)
+    memory = sum(procs[p][1] for p in tree)
+    if limits == "cgroup":
+        # The group also counts processes that have already exited
+        usage = re.search(r"usage_usec (\d+)", read(f"/sys/fs/cgroup/agents/{name}/cpu.stat") or "")
+        current = read(f"/sys/fs/cgroup/agents/{name}/memory.current")
+        cpu = int(usage.group(1)) / 1e6 if usage else cpu
+        memory = int(current) if current else memory
+    stats[name] = {"limits": limits, "cpu_seconds": round(cpu, 1),
+                   "memory_bytes": memory, "processes": len(tree)}
+print(json.dumps(stats))
+"""
+
+
+def agent_windows(agents):
+    """tmux window names for the agents: "opencode" for one, else agent1..agentN"""
+    if agents == 1:
+        return ["opencode"]
+    return [f"agent{i}" for i in range(1, agents + 1)]
+
+
+def cpu_max(cpus, agents):
+    """
+    cgroup cpu.max value for cpus CPUs per agent. Without cpus, several
+    agents share the sandbox's CPUs evenly and a single agent is uncapped.
+    """
+    if cpus:
+        return f"{int(cpus * 100000)} 100000"
+    if agents > 1:
+        return f"$(( $(nproc) * 100000 / {agents} )) 100000"
+    return ""
+
+
+def upload_agent_limits(sandbox):
+    sandbox.fs.upload_file(REMOTE_LIMITS, AGENT_LIMITS.encode())
+
+
+def agent_setup_commands(workdir, agents, cpus=None, memory=None, command="opencode"):
+    """
+    Return (windows, lines): the agent window names and bash lines that
+    create their working directories and start an agent in each window of
+    tmux session "main". The session must already exist, with its first
+    window named windows[0].
+
+    A single agent with no caps is started as before, uncapped. With
+    several agents and a git workspace, each agent works in its own
+    worktree on branch agentN; otherwise each gets an empty directory.
+    """
+    windows = agent_windows(agents)
+    capped = agents > 1 or cpus or memory
+    limits = f'CPU_MAX="{cpu_max(cpus, agents)}" MEM_MAX="{memory or ""}" . {REMOTE_LIMITS}'
+    lines = []
+    for i, name in enumerate(windows):
+        if agents == 1:
+            agent_dir = workdir
+        else:
+            agent_dir = f"{AGENTS_DIR}/{name}"
+            lines.append(
+                f"git -C {workdir} worktree add -q {agent_dir} -b {name} 2>/dev/null "
+                f"|| mkdir -p {agent_dir}"
+            )
+        if i > 0:
+            lines.append(f"tmux new-window -t main -n {name}")
+        start = f"{limits} {name} && {command}" if capped else command
+        pane_command = f"cd {agent_dir} && {start}"
+        lines.append(f"tmux send-keys -t main:{name} {shlex.quote(pane_command)} Enter")
+    return windows, lines
+
+
+def agent_stats(sandbox):
+    """Return per-agent CPU seconds, memory bytes, process count and cap method"""
+    result = sandbox.process.exec(f"python3 -c {shlex.quote(AGENT_STATS)}", timeout=30)
+    try:
+        return json.loads(result.result.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise Exception(f"Agent stats failed: {result.result.strip()[:500]}")
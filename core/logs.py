@@ -0,0 +1,262 @@
+"""
+Live output of sandbox session commands.
+
+exec() returns a command's output only once it has finished, and commands
+started with execute_session_command(var_async=True) are never looked at
+again. Here a background thread tails a session command's logs into a
+LogStream: a ring buffer of the last lines plus any number of subscribers.
+
+Each subscriber has a bounded queue. A consumer that falls behind (a slow
+browser, a paused terminal) never blocks the tail or other consumers;
+lines it could not take are dropped and counted, and the next line it
+reads says how many it missed.
+
+Example:
+    from core.logs import LogStream, run_streamed
+
+    stream = LogStream("install")
+    exit_code, output = run_streamed(sandbox, "apt-get install -y tmux", stream, echo=print)
+"""
+
+import time
+import queue
+import threading
+from collections import deque
+
+MAX_LINES = 2000
+SUBSCRIBER_QUEUE = 500
+
+
+def logs_text(logs):
+    """Return the text of a get_session_command_logs() result (str or response object)"""
+    if logs is None:
+        return ""
+    if isinstance(logs, str):
+        return logs
+    output = getattr(logs, "output", None)
+    if output is not None:
+        return output
+    return (getattr(logs, "stdout", "") or "") + (getattr(logs, "stderr", "") or "")
+
+
+class Subscriber:
+    """One consumer of a LogStream; iterate it, or call get()"""
+
+    def __init__(self, stream, maxsize=SUBSCRIBER_QUEUE):
+        self.stream = stream
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.reported = 0
+
+    def offer(self, line):
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout=None):
+        """Return the next line, None at end of stream; raises queue.Empty on timeout"""
+        if self.dropped > self.reported:
+            missed = self.dropped - self.reported
+            self.reported = self.dropped
+            return f"[... {missed} lines dropped]"
+        return self.queue.get(timeout=timeout)
+
+    def __iter__(self):
+        while True:
+            line = self.get()
+            if line is None:
+                return
+            yield line
+
+    def close(self):
+        self.stream.unsubscribe(self)
+
+
+class LogStream:
+    """Bounded ring buffer of output lines with fan-out to subscribers"""
+
+    def __init__(self, name, max_lines=MAX_LINES):
+        self.name = name
+        self.lines = deque(maxlen=max_lines)
+        self.total = 0  # lines ever written; the sequence number of the next line
+        self.partial = ""
+        self.closed = False
+        self.exit_code = None
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        """Append output; only complete lines are published"""
+        with self.lock:
+            self.partial += text
+            *complete, self.partial = self.partial.split("\n")
+            for line in complete:
+                self._publish(line.rstrip("\r"))
+
+    def _publish(self, line):
+        self.lines.append(line)
+        self.total += 1
+        for subscriber in self.subscribers:
+            subscriber.offer(line)
+
+    def close(self, exit_code=None):
+        with self.lock:
+            if self.closed:
+                return
+            if self.partial:
+                self._publish(self.partial)
+                self.partial = ""
+            self.closed = True
+            self.exit_code = exit_code
+            for subscriber in self.subscribers:
+                # The end marker must get through even to a full queue
+                try:
+                    subscriber.queue.put_nowait(None)
+                except queue.Full:
+                    subscriber.queue.get_nowait()
+                    subscriber.dropped += 1
+                    subscriber.queue.put_nowait(None)
+
+    def subscribe(self, replay=True, maxsize=SUBSCRIBER_QUEUE):
+        """Return a Subscriber, first fed the buffered lines if replay is set"""
+        subscriber = Subscriber(self, maxsize)
+        with self.lock:
+            lines = list(self.lines) if replay else []
+            if self.closed and maxsize > 0 and len(lines) >= maxsize:
+                # Keep room for the end marker; the reader is told what it missed
+                subscriber.dropped = len(lines) - (maxsize - 1)
+                lines = lines[subscriber.dropped:]
+            for line in lines:
+                subscriber.offer(line)
+            if self.closed:
+                subscriber.offer(None)
+            else:
+                self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def read(self, since=0, limit=MAX_LINES):
+        """
+        Return {"lines", "next", "missed", "closed", "exit_code"} for polling
+        clients: the buffered lines from sequence number since on. missed
+        counts lines that were already overwritten in the ring buffer.
+        """
+        with self.lock:
+            first = self.total - len(self.lines)
+            start = max(since, first)
+            lines = list(self.lines)[start - first:][:limit]
+            return {
+                "lines": lines,
+                "next": start + len(lines),
+                "missed": max(0, first - since),
+                "closed": self.closed,
+                "exit_code": self.exit_code
+            }
+
+
+def tail_session_command(sandbox, session_id, cmd_id, stream, interval=0.5, stop=None):
+    """
+    Start a daemon thread copying a session command's logs into stream
+    until the command exits (or stop, a threading.Event, is set). The
+    stream is closed with the command's exit code. Returns the thread.
+    """
+    stop = stop or threading.Event()
+
+    def run():
+        seen = 0
+        exit_code = None
+        while True:
+            try:
+                exit_code = getattr(
+                    sandbox.process.get_session_command(session_id, cmd_id), "exit_code", None
+                )
+                text = logs_text(sandbox.process.get_session_command_logs(session_id, cmd_id))
+            except Exception:
+                text = None
+            if text is not None:
+                if len(text) < seen:
+                    seen = 0  # logs were rotated
+                if len(text) > seen:
+                    stream.write(text[seen:])
+                    seen = len(text)
+            # exit_code was read before the logs, so this read had all the output
+            if exit_code is not None or stop.is_set():
+                break
+            stop.wait(interval)
+        stream.close(exit_code)
+
+    thread = threading.Thread(target=run, name=f"tail-{stream.name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def echo_stream(stream, echo=print, prefix="  | "):
+    """Print a stream's lines as they arrive, from a daemon thread"""
+    subscriber = stream.subscribe()
+
+    def run():
+        for line in subscriber:
+            echo(f"{prefix}{line}")
+
+    thread = threading.Thread(target=run, name=f"echo-{stream.name}", daemon=True)
+    thread.start()
+    return thread
+
+
+def run_streamed(sandbox, command, stream=None, session_id="streamed", timeout=600,
+                 echo=None, interval=0.5):
+    """
+    Run command in a session, streaming its output while it runs. A
+    drop-in for a blocking exec(): returns (exit_code, output) once it
+    finishes, or raises TimeoutError after deleting the session, which
+    ends the command. Output is written to stream (a new LogStream if
+    None) and, with echo given, printed live.
+    """
+    stream = stream or LogStream(session_id)
+    try:
+        sandbox.process.create_session(session_id)
+    except Exception:
+        pass  # session already exists
+
+    response = sandbox.process.execute_session_command(session_id, command, var_async=True)
+    cmd_id = getattr(response, "cmd_id", None)
+    if cmd_id is None:
+        raise Exception(f"No command id for {command!r}; its output cannot be followed")
+
+    # Unbounded: this consumer must see every line
+    subscriber = stream.subscribe(replay=False, maxsize=0)
+    printer = echo_stream(stream, echo) if echo else None
+    stop = threading.Event()
+    tail = tail_session_command(sandbox, session_id, cmd_id, stream, interval, stop)
+
+    output = []
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                try:
+                    sandbox.process.delete_session(session_id)
+                except Exception:
+                    pass
+                raise TimeoutError(f"{command!r} still running after {timeout}s")
+            try:
+                line = subscriber.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                break
+            output.append(line)
+    finally:
+        # Never leave the tail polling, whether the command finished or not
+        stop.set()
+        subscriber.close()
+        tail.join(timeout=interval + 30)
+    if printer:
+        printer.join(timeout=1)
+    return stream.exit_code, "\n".join(output)
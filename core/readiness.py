@@ -0,0 +1,179 @@
+"""
+Readiness checks for services running inside a sandbox.
+
+Instead of sleeping for a fixed worst-case delay, poll a cheap check until
+it succeeds or a deadline passes.
+"""
+
+import time
+
+from core.logs import logs_text
+
+
+class ReadinessFailed(Exception):
+    """Raised by a check to stop polling at once: the service will never come up"""
+
+
+# Sandbox ids whose desktop is known to be up, so ensure_desktop() is cheap
+_DESKTOPS_UP = set()
+
+
+def poll_until(check, timeout=60, interval=0.5, backoff=1.0, max_interval=5.0):
+    """
+    Call check() until it returns a truthy value.
+
+    Args:
+        check: Zero-argument callable; exceptions count as "not ready yet",
+            except ReadinessFailed, which is re-raised immediately
+        timeout: Seconds before giving up
+        interval: Initial delay between attempts
+        backoff: Multiplier applied to the delay after each failed attempt
+        max_interval: Upper bound for the delay
+
+    Returns:
+        (value, elapsed_seconds) where value is the first truthy result
+
+    Raises:
+        TimeoutError if the deadline passes first
+        ReadinessFailed if check() reports a fatal error
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    last_error = None
+
+    while True:
+        try:
+            value = check()
+            if value:
+                return value, time.monotonic() - start
+        except ReadinessFailed:
+            raise
+        except Exception as e:
+            last_error = e
+
+        now = time.monotonic()
+        if now >= deadline:
+            detail = f" (last error: {last_error})" if last_error else ""
+            raise TimeoutError(f"Not ready after {timeout}s{detail}")
+
+        time.sleep(min(interval, deadline - now))
+        interval = min(interval * backoff, max_interval)
+
+
+def http_ready(sandbox, port, path="/"):
+    """Return True once an HTTP server answers on port inside the sandbox"""
+    result = sandbox.process.exec(
+        f"curl -s -o /dev/null -w '%{{http_code}}' http://127.0.0.1:{port}{path} || true",
+        timeout=10
+    )
+    return result.result.strip().endswith(("200", "301", "302"))
+
+
+def vnc_ready(sandbox, port=6080):
+    """Return True once the noVNC web server answers inside the sandbox"""
+    return http_ready(sandbox, port)
+
+
+def session_command_output(sandbox, session_id, cmd_id, limit=2000):
+    """Return the tail of a session command's logs, or "" if unavailable"""
+    if not cmd_id:
+        return ""
+    try:
+        logs = sandbox.process.get_session_command_logs(session_id, cmd_id)
+    except Exception:
+        return ""
+    return logs_text(logs).strip()[-limit:]
+
+
+def wait_for_server(sandbox, port, session_id, cmd_id=None, path="/", timeout=60):
+    """
+    Wait for a server started with execute_session_command(var_async=True)
+    to answer HTTP on port, backing off from 0.25s to 2s between probes.
+    Returns seconds waited.
+
+    Raises ReadinessFailed as soon as the command exits, or TimeoutError
+    at the deadline; both carry the command's output.
+    """
+    def check():
+        if http_ready(sandbox, port, path):
+            return True
+        if cmd_id:
+            command = sandbox.process.get_session_command(session_id, cmd_id)
+            exit_code = getattr(command, "exit_code", None)
+            if exit_code is not None:
+                raise ReadinessFailed(
+                    f"server exited with code {exit_code}:\n"
+                    f"{session_command_output(sandbox, session_id, cmd_id)}"
+                )
+        return False
+
+    try:
+        _, waited = poll_until(check, timeout=timeout, interval=0.25, backoff=1.5, max_interval=2)
+    except TimeoutError as e:
+        output = session_command_output(sandbox, session_id, cmd_id)
+        raise TimeoutError(f"{e}\n{output}" if output else str(e)) from None
+    return waited
+
+
+def process_running(sandbox, name):
+    """Return True if a process whose command line contains name is running"""
+    # "[x]yz" matches "xyz" but not the pgrep command line itself
+    pattern = f"[{name[0]}]{name[1:]}"
+    result = sandbox.process.exec(f"pgrep -f '{pattern}' >/dev/null && echo up || echo down", timeout=10)
+    return result.result.strip() == "up"
+
+
+def tmux_panes(sandbox, session):
+    """
+    Return {window_name: (pane_command, pane_dead)} for a tmux session,
+    or None if the session does not exist (one exec covers has-session
+    and the window list).
+    """
+    result = sandbox.process.exec(
+        f"tmux list-panes -s -t {session} "
+        f"-F '#{{window_name}}|#{{pane_current_command}}|#{{pane_dead}}' 2>/dev/null "
+        f"|| echo __missing__",
+        timeout=10
+    )
+    output = result.result.strip()
+    if output.endswith("__missing__"):
+        return None
+
+    panes = {}
+    for line in output.splitlines():
+        name, _, rest = line.partition("|")
+        command, _, dead = rest.partition("|")
+        panes.setdefault(name, (command, dead == "1"))
+    return panes
+
+
+def capture_pane(sandbox, target, lines=40):
+    """Return the last lines of a tmux pane's visible output"""
+    result = sandbox.process.exec(
+        f"tmux capture-pane -p -t {target} -S -{int(lines)} 2>&1 | tail -n {int(lines)}",
+        timeout=10
+    )
+    return result.result.rstrip()
+
+
+def ensure_desktop(sandbox, timeout=60):
+    """
+    Start the sandbox's VNC desktop if it is not running yet.
+
+    Lets GUI helpers start the desktop on first use instead of every
+    sandbox paying for it at creation. Returns the seconds spent waiting
+    (0 once the desktop has been seen up).
+    """
+    if sandbox.id in _DESKTOPS_UP:
+        return 0
+    waited = 0
+    if not vnc_ready(sandbox):
+        sandbox.computer_use.start()
+        _, waited = poll_until(lambda: vnc_ready(sandbox), timeout=timeout)
+    _DESKTOPS_UP.add(sandbox.id)
+    return waited
+
+
+def forget_desktop(sandbox_id):
+    """Forget that a sandbox's desktop was up, e.g. once it is stopped or deleted"""
+    _DESKTOPS_UP.discard(sandbox_id)
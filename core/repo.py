@@ -0,0 +1,270 @@
+"""
+Put a git repository into a sandbox quickly.
+
+A plain `git clone` of a large monorepo can take minutes. There are three
+ways to make it cheaper, and they can be combined:
+    depth=N        shallow clone, only the last N commits of one branch
+    blobless=True  partial clone (--filter=blob:none); file contents are
+                   fetched on checkout, so only the checked-out tree is
+                   downloaded in full
+    sparse=[dirs]  sparse checkout (cone mode) of just those directories
+
+With bundle_cache=True the repository is instead fetched once into a bare
+repository on this machine under REPO_CACHE_DIR (branches and tags only),
+refreshed with `git fetch` on later uses, and uploaded to each new sandbox
+as a git bundle. The sandbox then clones from the bundle and fetches only
+what is newer than it. The cache holds full history, so depth and blobless
+only apply to direct clones. sparse and branch work either way.
+
+Example:
+    from core.repo import clone_repo
+
+    stats = clone_repo(sandbox, "https://github.com/org/big.git",
+                       depth=1, blobless=True, sparse=["services/api"])
+    print(stats)  # method, seconds, bytes, git_dir_bytes, exit_code, ...
+"""
+
+import os
+import re
+import time
+import shlex
+import hashlib
+import subprocess
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("REPO_CACHE_DIR", Path.home() / ".cache" / "opencode-sandbox" / "repos"))
+REMOTE_BUNDLE = "/tmp/repo.bundle"
+# Bundles are uploaded in parts of this size, so they are never read into memory whole
+UPLOAD_CHUNK = 16 * 1024 * 1024
+# Only branches and tags are cached; a mirror would also fetch refs/pull/* and the like
+CACHE_REFSPECS = ("+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+
+# Keyword arguments of clone_repo() that callers may pass through from user input
+CLONE_OPTIONS = ("depth", "blobless", "sparse", "branch", "bundle_cache")
+# Repository URLs we clone: https, ssh, or scp-like git@host:path (never file:// or local paths)
+REPO_URL_PATTERN = re.compile(r"(https|ssh)://\w[\w.@:-]*/\S+|\w[\w.-]*@\w[\w.-]*:[^\s-]\S*")
+
+
+def check_clone_args(repo_url, sparse=None, branch=None):
+    """
+    Validate user-supplied clone arguments before they reach git on this
+    machine or in the sandbox. Returns sparse as a list (a single directory
+    may be given as a string); raises ValueError.
+    """
+    if not isinstance(repo_url, str) or not REPO_URL_PATTERN.fullmatch(repo_url):
+        raise ValueError(f"Repository URL must be https://, ssh:// or user@host:path, got {repo_url!r}")
+    if isinstance(sparse, str):
+        sparse = [sparse]
+    for directory in sparse or []:
+        if not isinstance(directory, str) or not directory or directory.startswith("-"):
+            raise ValueError(f"Bad sparse directory: {directory!r}")
+    if branch is not None and (not isinstance(branch, str) or not re.fullmatch(r"[\w./-]+", branch)
+                               or branch.startswith("-") or ".." in branch):
+        raise ValueError(f"Bad branch name: {branch!r}")
+    return sparse
+
+
+def clone_command(repo_url, dest, depth=None, blobless=False, sparse=None, branch=None):
+    """Return the shell command for a direct clone with the given options"""
+    args = ["git", "clone", "--progress"]
+    if depth:
+        args += ["--depth", str(int(depth))]
+    if blobless:
+        args.append("--filter=blob:none")
+    if sparse:
+        # Starts with only top-level files checked out; set below expands it
+        args.append("--sparse")
+    if branch:
+        args.append(f"--branch={branch}")
+    args += ["--", repo_url, dest]
+
+    command = shlex.join(args)
+    if sparse:
+        command += f" && cd {shlex.quote(dest)} && git sparse-checkout set -- {shlex.join(sparse)}"
+    return command
+
+
+def _git(*args, cwd=None, timeout=600):
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise Exception(f"git {args[0]} failed: {result.stderr.strip()[-500:]}")
+    return result.stdout
+
+
+def cached_bundle(repo_url, log=print):
+    """
+    Fetch repo_url's branches and tags into a bare repository under
+    CACHE_DIR and return the path of a bundle of them and HEAD. The bundle
+    is only rebuilt when the refs have moved.
+    """
+    check_clone_args(repo_url)
+    key = hashlib.sha1(repo_url.encode()).hexdigest()[:16]
+    mirror = CACHE_DIR / f"{key}.git"
+    bundle = CACHE_DIR / f"{key}.bundle"
+    refs_file = CACHE_DIR / f"{key}.refs"
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    start = time.monotonic()
+    fresh = not mirror.exists()
+    if fresh:
+        _git("init", "-q", "--bare", str(mirror))
+        _git("remote", "add", "--", "origin", repo_url, cwd=mirror)
+    # Explicit refspecs, so caches made by older versions with --mirror stop fetching refs/pull/*
+    _git("fetch", "-q", "--prune", "origin", *CACHE_REFSPECS, cwd=mirror, timeout=3600)
+    head = re.search(r"^ref: (\S+)\tHEAD$", _git("ls-remote", "--symref", "origin", "HEAD", cwd=mirror), re.M)
+    if head:
+        _git("symbolic-ref", "HEAD", head.group(1), cwd=mirror)
+    log(f"       Bundle cache: {'fetched' if fresh else 'updated'} in {time.monotonic() - start:.1f}s")
+
+    refs = _git("show-ref", "--heads", "--tags", cwd=mirror) + (head.group(1) if head else "")
+    if not bundle.exists() or not refs_file.exists() or refs_file.read_text() != refs:
+        _git("bundle", "create", str(bundle), "HEAD", "--branches", "--tags", cwd=mirror, timeout=3600)
+        refs_file.write_text(refs)
+    return bundle
+
+
+def upload_in_chunks(sandbox, local_path, remote_path, chunk_size=UPLOAD_CHUNK):
+    """Upload a local file part by part and join the parts in the sandbox; returns its size"""
+    q_remote = shlex.quote(remote_path)
+    sandbox.process.exec(f"rm -f {q_remote} {q_remote}.part*")
+    size = 0
+    with open(local_path, "rb") as f:
+        for i, chunk in enumerate(iter(lambda: f.read(chunk_size), b"")):
+            sandbox.fs.upload_file(f"{remote_path}.part{i:05d}", chunk)
+            size += len(chunk)
+    result = sandbox.process.exec(
+        f"cat {q_remote}.part* > {q_remote} && rm -f {q_remote}.part*", timeout=300
+    )
+    if result.exit_code != 0:
+        raise Exception(f"Joining uploaded parts failed: {result.result.strip()[-500:]}")
+    return size
+
+
+def received_bytes(output):
+    """
+    Sum the final "Receiving objects: 100% (...), 1.20 MiB ..., done." totals
+    git prints with --progress. None if git printed none (it omits the size for quick fetches).
+    """
+    units = {"bytes": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+    sizes = re.findall(
+        r"Receiving objects: 100% \(\d+/\d+\), ([\d.]+) (bytes|KiB|MiB|GiB)[^\r\n]*, done\.", output
+    )
+    if not sizes:
+        return None
+    return int(sum(float(n) * units[unit] for n, unit in sizes))
+
+
+def _git_dir_bytes(sandbox, dest):
+    result = sandbox.process.exec(f"du -sb {shlex.quote(dest)}/.git 2>/dev/null | cut -f1", timeout=30)
+    try:
+        return int(result.result.strip())
+    except ValueError:
+        return None
+
+
+def clone_repo(sandbox, repo_url, dest="/home/daytona/project", depth=None, blobless=False,
+               sparse=None, branch=None, bundle_cache=False, timeout=600, log=print):
+    """
+    Clone repo_url to dest inside the sandbox.
+
+    Returns {"method", "exit_code", "seconds", "bytes", "git_dir_bytes",
+    "output"}. bytes is what crossed the wire: the uploaded bundle plus
+    what git reported receiving (None if git did not report it).
+    git_dir_bytes is the size of .git afterwards. A failing bundle cache
+    falls back to a direct clone.
+    """
+    sparse = check_clone_args(repo_url, sparse, branch)
+    start = time.monotonic()
+    q_dest = shlex.quote(dest)
+
+    if bundle_cache:
+        try:
+            bundle = cached_bundle(repo_url, log)
+            uploaded = upload_in_chunks(sandbox, bundle, REMOTE_BUNDLE)
+
+            steps = [
+                f"git clone --no-checkout {REMOTE_BUNDLE} {q_dest}",
+                f"cd {q_dest}",
+                f"git remote set-url -- origin {shlex.quote(repo_url)}",
+            ]
+            if sparse:
+                steps.append(f"git sparse-checkout set -- {shlex.join(sparse)}")
+            # Top up with anything pushed since the bundle was made
+            steps.append("{ git fetch --progress origin 2>&1 || true; }")
+            # Check out the fetched tip, not the bundle's; a tag is checked out detached
+            if branch:
+                q_branch = shlex.quote(branch)
+                steps.append(
+                    f"if git rev-parse -q --verify refs/remotes/origin/{q_branch} >/dev/null; "
+                    f"then git checkout -q -B {q_branch} origin/{q_branch}; "
+                    "else git checkout -q --detach "
+                    f"\"$(git rev-parse --verify refs/tags/{q_branch}^{{commit}})\"; fi"
+                )
+            else:
+                steps.append('git checkout -q -B "$(git symbolic-ref --short HEAD)" '
+                             'origin/"$(git symbolic-ref --short HEAD)"')
+            steps.append(f"rm -f {REMOTE_BUNDLE}")
+
+            result = sandbox.process.exec(" && ".join(steps), timeout=timeout)
+            if result.exit_code != 0:
+                raise Exception(result.result.strip()[-500:])
+
+            return {
+                "method": "bundle",
+                "exit_code": 0,
+                "seconds": round(time.monotonic() - start, 1),
+                # An up-to-date bundle means the top-up fetch received nothing
+                "bytes": uploaded + (received_bytes(result.result) or 0),
+                "git_dir_bytes": _git_dir_bytes(sandbox, dest),
+                "output": result.result.strip()[-2000:]
+            }
+        except Exception as e:
+            log(f"       Bundle cache failed ({e}), cloning directly")
+            sandbox.process.exec(f"rm -rf {q_dest} {REMOTE_BUNDLE}")
+
+    command = clone_command(repo_url, dest, depth, blobless, sparse, branch)
+    result = sandbox.process.exec(f"{{ {command}; }} 2>&1", timeout=timeout)
+    return {
+        "method": "clone",
+        "exit_code": result.exit_code,
+        "seconds": round(time.monotonic() - start, 1),
+        "bytes": received_bytes(result.result),
+        "git_dir_bytes": _git_dir_bytes(sandbox, dest) if result.exit_code == 0 else None,
+        "output": result.result.strip()[-2000:]
+    }
+
+
+def format_bytes(n):
+    if n is None:
+        return "size unknown"
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def transfer_summary(stats):
+    """Human-readable bytes transferred by clone_repo(), else the size on disk"""
+    if stats.get("bytes") is not None:
+        return f"{format_bytes(stats['bytes'])} transferred"
+    if stats.get("git_dir_bytes") is not None:
+        return f".git is {format_bytes(stats['git_dir_bytes'])}"
+    return "size unknown"
+
+
+def add_clone_arguments(parser):
+    """Add the clone options to an argparse parser (see clone_options())"""
+    parser.add_argument("--depth", type=int, help="shallow clone of the last N commits")
+    parser.add_argument("--blobless", action="store_true",
+                        help="partial clone: fetch file contents only on checkout")
+    parser.add_argument("--sparse", nargs="+", metavar="DIR",
+                        help="check out only these directories")
+    parser.add_argument("--branch", help="branch to check out")
+    parser.add_argument("--bundle-cache", action="store_true",
+                        help="clone from a locally cached git bundle")
+
+
+def clone_options(args):
+    """Collect the clone options from parsed arguments into clone_repo() kwargs"""
+    return {name: getattr(args, name) for name in CLONE_OPTIONS}
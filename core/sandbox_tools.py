@@ -0,0 +1,81 @@
+"""
+Upload the computer control tools into a sandbox and start their daemons.
+
+The tools themselves live in tools/ and run inside the sandbox; this module
+is the host-side half that installs them.
+"""
+
+from pathlib import Path
+
+from core.readiness import poll_until
+
+TOOLS_DIR = Path(__file__).parent.parent / "tools"
+REMOTE_TOOLS_DIR = "/home/daytona/tools"
+
+# Python packages the in-sandbox tools import
+TOOL_PACKAGES = ["python-xlib", "mss", "pillow"]
+
+# Sandbox ids whose input daemon has answered a ping since we started it
+_DAEMONS_UP = set()
+
+
+def get_tool_scripts():
+    """Read all tool scripts (shell and Python) from the tools directory"""
+    scripts = {}
+    if TOOLS_DIR.exists():
+        for pattern in ("*.sh", "*.py"):
+            for script_file in TOOLS_DIR.glob(pattern):
+                scripts[script_file.name] = script_file.read_text()
+    return scripts
+
+
+def upload_tools(sandbox, log=print, display=":1"):
+    """
+    Upload the tool scripts, install their Python dependencies and start
+    the input daemon. Returns the number of scripts uploaded.
+    """
+    sandbox.process.exec(f"mkdir -p {REMOTE_TOOLS_DIR}")
+
+    scripts = get_tool_scripts()
+    for name, content in scripts.items():
+        sandbox.fs.upload_file(f"{REMOTE_TOOLS_DIR}/{name}", content.encode())
+        log(f"       Uploaded: {name}")
+    sandbox.process.exec(f"chmod +x {REMOTE_TOOLS_DIR}/*.sh {REMOTE_TOOLS_DIR}/*.py")
+
+    result = sandbox.process.exec(
+        f"python3 -m pip install --user -q {' '.join(TOOL_PACKAGES)}",
+        timeout=180
+    )
+    log(f"       Tool packages installed (exit_code={result.exit_code})")
+
+    try:
+        start_input_daemon(sandbox, display)
+        log("       Input daemon running")
+    except TimeoutError:
+        log("       Input daemon did not start - tools fall back to xdotool")
+
+    return len(scripts)
+
+
+def start_input_daemon(sandbox, display=":1", timeout=15):
+    """Start tools/input_daemon.py in the background and wait until it answers"""
+    sandbox.process.exec(
+        f"DISPLAY={display} nohup python3 {REMOTE_TOOLS_DIR}/input_daemon.py "
+        f"> /tmp/inputd.log 2>&1 &"
+    )
+    poll_until(lambda: input_daemon_ready(sandbox), timeout=timeout)
+    _DAEMONS_UP.add(sandbox.id)
+
+
+def input_daemon_started(sandbox):
+    """True if start_input_daemon() succeeded for this sandbox in this process"""
+    return sandbox.id in _DAEMONS_UP
+
+
+def input_daemon_ready(sandbox):
+    """Return True if the input daemon replies to a ping"""
+    result = sandbox.process.exec(
+        f"bash -c 'source {REMOTE_TOOLS_DIR}/inputd.sh && inputd_send ping && echo ready'",
+        timeout=10
+    )
+    return "ready" in result.result
@@ -0,0 +1,301 @@
+"""
+Screenshot capture from a sandbox.
+
+Uses tools/fast_screenshot.py so the image comes back in the exec response
+itself (base64 inside one JSON line) rather than via a file in the sandbox.
+capture_array() goes one step further and hands back a preprocessed NumPy
+array ready for model input, decoded once and never written to disk.
+"""
+
+import io
+import json
+import time
+import shlex
+import base64
+
+from core.readiness import ensure_desktop
+from core.sandbox_tools import REMOTE_TOOLS_DIR
+
+
+def wait_screen(sandbox, mode, timeout=10, stable_ms=500, change_timeout=2):
+    """
+    Run tools/wait_screen.py inside the sandbox and return its result dict:
+    {"ok", "mode", "waited_ms", "changes", "frames"}.
+    """
+    ensure_desktop(sandbox)
+    result = sandbox.process.exec(
+        f"DISPLAY=:1 python3 {REMOTE_TOOLS_DIR}/wait_screen.py {mode} "
+        f"--timeout {float(timeout)} --stable-ms {int(stable_ms)} "
+        f"--change-timeout {float(change_timeout)}",
+        timeout=int(timeout) + 10
+    )
+    try:
+        return json.loads(result.result.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {"ok": False, "mode": mode, "error": result.result.strip()[:500]}
+
+
+def wait_for_change(sandbox, timeout=10):
+    """Block until the screen changes; returns the result dict"""
+    return wait_screen(sandbox, "change", timeout=timeout)
+
+
+def wait_until_stable(sandbox, stable_ms=500, timeout=10):
+    """Block until the screen has not changed for stable_ms"""
+    return wait_screen(sandbox, "stable", timeout=timeout, stable_ms=stable_ms)
+
+
+def wait_until_settled(sandbox, stable_ms=500, timeout=15, change_timeout=2, fallback=None):
+    """
+    Wait for a change to start (up to change_timeout), then until stable.
+
+    If the wait fails (no screen tool in the sandbox, or no stable screen)
+    and fallback is given, sleep until fallback seconds have passed in all,
+    like the fixed sleep this replaces.
+    """
+    result = wait_screen(
+        sandbox, "settle", timeout=timeout, stable_ms=stable_ms, change_timeout=change_timeout
+    )
+    if fallback and not result.get("ok"):
+        time.sleep(max(0, fallback - (result.get("waited_ms") or 0) / 1000))
+    return result
+
+
+def capture(sandbox, fmt="jpeg", quality=70, scale=1.0, region=None, window=None, timeout=30):
+    """
+    Capture the sandbox screen.
+
+    Args:
+        fmt: "jpeg", "webp" or "png"
+        quality: JPEG/WebP quality (1-100)
+        scale: Downscale factor applied before encoding, e.g. 0.5
+        region: Optional (x, y, w, h) crop
+        window: Optional "active" or an X window id to crop to
+
+    Returns:
+        (image_bytes, stats) where stats has width, height, bytes,
+        capture_ms, encode_ms and total_ms measured inside the sandbox
+    """
+    ensure_desktop(sandbox)
+    cmd = (
+        f"DISPLAY=:1 python3 {REMOTE_TOOLS_DIR}/fast_screenshot.py --json "
+        f"--format {fmt} --quality {int(quality)} --scale {float(scale)}"
+    )
+    if region:
+        cmd += " --region " + ",".join(str(int(v)) for v in region)
+    if window:
+        cmd += f" --window {window}"
+
+    result = sandbox.process.exec(cmd, timeout=timeout)
+    try:
+        payload = json.loads(result.result.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise Exception(f"Screenshot failed: {result.result.strip()[:500]}")
+
+    return base64.b64decode(payload["image"]), payload["stats"]
+
+
+def decode_array(image_bytes):
+    """Decode encoded image bytes straight into an RGB uint8 array (H, W, 3)"""
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError:
+        raise Exception("numpy and pillow are required. Run: pip install numpy pillow")
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+def resize_array(array, size):
+    """
+    Resize an (H, W[, C]) array to size=(width, height).
+
+    Integer downscales average each block (box filter); anything else uses
+    nearest-neighbour index sampling. Both are single vectorised operations.
+    """
+    import numpy as np
+
+    height, width = array.shape[:2]
+    new_w, new_h = size
+    if (new_w, new_h) == (width, height):
+        return array
+
+    fx, fy = width // new_w if new_w else 0, height // new_h if new_h else 0
+    if fx and fy and width == new_w * fx and height == new_h * fy:
+        blocks = array.reshape(new_h, fy, new_w, fx, *array.shape[2:])
+        return blocks.mean(axis=(1, 3)).astype(array.dtype)
+
+    rows = (np.arange(new_h) * height // new_h).clip(0, height - 1)
+    cols = (np.arange(new_w) * width // new_w).clip(0, width - 1)
+    return array[rows[:, None], cols]
+
+
+def preprocess(array, crop=None, size=None, grayscale=False, levels=None, normalize=False):
+    """
+    Vectorised preprocessing for model input.
+
+    Args:
+        array: RGB uint8 array (H, W, 3) from decode_array()
+        crop: Optional (x, y, w, h), applied first
+        size: Optional (width, height) to resize to
+        grayscale: Convert to luma (ITU-R 601 weights), giving (H, W)
+        levels: Quantise each channel to this many levels (2-256), e.g. 16
+        normalize: Return float32 in [0, 1] instead of uint8
+
+    Returns:
+        The processed array (a view where possible, no copies of the input)
+    """
+    import numpy as np
+
+    if levels and not 2 <= levels <= 256:
+        raise ValueError(f"levels must be between 2 and 256, got {levels}")
+    if crop:
+        x, y, w, h = crop
+        array = array[y:y + h, x:x + w]
+    if size:
+        array = resize_array(array, size)
+    if grayscale and array.ndim == 3:
+        array = (array @ np.array([0.299, 0.587, 0.114], dtype=np.float32)).astype(np.uint8)
+    if levels:
+        step = 256 // levels
+        # In int16, and clamped to the top level, so e.g. 255 with 3 levels stays bright
+        bucket = np.minimum(array.astype(np.int16) // step, levels - 1)
+        array = (bucket * step + step // 2).astype(np.uint8)
+    if normalize:
+        array = array.astype(np.float32) / 255.0
+    return array
+
+
+def capture_array(sandbox, crop=None, size=None, grayscale=False, levels=None,
+                  normalize=False, fmt="jpeg", quality=85, scale=1.0, region=None, timeout=30):
+    """
+    Capture the sandbox screen as a model-ready NumPy array.
+
+    The image bytes come back inside the exec response, are decoded once
+    and preprocessed in memory. region/scale are applied in the sandbox
+    (fewer bytes on the wire); crop/size/grayscale/levels/normalize locally,
+    see preprocess().
+
+    Returns:
+        (array, stats) where stats adds fetch_ms, decode_ms, preprocess_ms
+        and total_ms (capture to model-ready) to the sandbox-side stats
+    """
+    t0 = time.perf_counter()
+    image_bytes, stats = capture(sandbox, fmt, quality, scale, region, timeout=timeout)
+    t1 = time.perf_counter()
+    array = decode_array(image_bytes)
+    t2 = time.perf_counter()
+    array = preprocess(array, crop, size, grayscale, levels, normalize)
+    t3 = time.perf_counter()
+
+    return array, {
+        **stats,
+        "sandbox_ms": stats.get("total_ms"),
+        "fetch_ms": round((t1 - t0) * 1000, 2),
+        "decode_ms": round((t2 - t1) * 1000, 2),
+        "preprocess_ms": round((t3 - t2) * 1000, 2),
+        "total_ms": round((t3 - t0) * 1000, 2),
+        "shape": list(array.shape),
+        "dtype": str(array.dtype)
+    }
+
+
+def accessibility_tree(sandbox, app=None, max_elements=400, include_all=False,
+                       text_chars=2000, timeout=30):
+    """
+    Return the focused window's accessibility tree from tools/a11y_tree.py:
+    {"app", "window", "count", "truncated", "ms",
+     "elements": [{"role", "name", "box": [x, y, w, h], ...}]}
+
+    A text-only alternative to capture() for steps that need no pixels.
+    """
+    ensure_desktop(sandbox)
+    cmd = (
+        f"DISPLAY=:1 python3 {REMOTE_TOOLS_DIR}/a11y_tree.py "
+        f"--max-elements {int(max_elements)} --text-chars {int(text_chars)}"
+    )
+    if app:
+        cmd += f" --app {shlex.quote(app)}"
+    if include_all:
+        cmd += " --all"
+
+    result = sandbox.process.exec(cmd, timeout=timeout)
+    try:
+        tree = json.loads(result.result.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise Exception(f"Accessibility tree failed: {result.result.strip()[:500]}")
+    if "error" in tree:
+        raise Exception(f"Accessibility tree failed: {tree['error']}")
+    return tree
+
+
+class DiffCompositor:
+    """
+    Rebuild full frames from tools/diff_screenshot.py output.
+
+    Keeps the last full frame and pastes the changed rectangles onto it.
+    Tracks bytes received so the saving over full frames can be reported.
+    """
+
+    def __init__(self, tile=64, fmt="jpeg", quality=80):
+        self.tile = tile
+        self.fmt = fmt
+        self.quality = quality
+        self.frame = None
+        self.frame_id = None
+        self.steps = 0
+        self.bytes_received = 0
+        self.keyframe_bytes = None
+
+    def apply(self, payload):
+        """Apply one diff payload and return the full frame (PIL image)"""
+        try:
+            from PIL import Image
+        except ImportError:
+            raise Exception("pillow not installed. Run: pip install pillow")
+
+        size = (payload["width"], payload["height"])
+        if payload["keyframe"] or self.frame is None or self.frame.size != size:
+            self.frame = Image.new("RGB", size)
+        elif payload["base"] != self.frame_id:
+            raise ValueError(f"diff is against frame {payload['base']}, have {self.frame_id}")
+
+        for tile in payload["tiles"]:
+            patch = Image.open(io.BytesIO(base64.b64decode(tile["data"])))
+            self.frame.paste(patch.convert("RGB"), (tile["x"], tile["y"]))
+
+        self.frame_id = payload["frame_id"]
+        self.steps += 1
+        self.bytes_received += payload["stats"]["bytes"]
+        if payload["keyframe"]:
+            self.keyframe_bytes = payload["stats"]["bytes"]
+        return self.frame
+
+    def capture(self, sandbox, timeout=30):
+        """Fetch the next diff from the sandbox and return (frame, stats)"""
+        ensure_desktop(sandbox)
+        base = f"--base {self.frame_id} " if self.frame_id is not None else ""
+        result = sandbox.process.exec(
+            f"DISPLAY=:1 python3 {REMOTE_TOOLS_DIR}/diff_screenshot.py {base}"
+            f"--tile {self.tile} --format {self.fmt} --quality {int(self.quality)}",
+            timeout=timeout
+        )
+        try:
+            payload = json.loads(result.result.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            raise Exception(f"Diff screenshot failed: {result.result.strip()[:500]}")
+
+        return self.apply(payload), payload["stats"]
+
+    def savings(self):
+        """Average bytes per step compared with sending a keyframe every step"""
+        if not self.steps or not self.keyframe_bytes:
+            return None
+        per_step = self.bytes_received / self.steps
+        return {
+            "steps": self.steps,
+            "avg_bytes_per_step": round(per_step),
+            "keyframe_bytes": self.keyframe_bytes,
+            "ratio": round(self.keyframe_bytes / per_step, 1) if per_step else None
+        }
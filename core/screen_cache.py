@@ -0,0 +1,80 @@
+"""
+Perceptual-hash screenshot cache.
+
+Drives tools/screen_cache.py inside the sandbox, so the screen is hashed
+where it lives and only a short hash crosses the wire. Use cached() to wrap
+a vision call: when the screen is effectively unchanged, the previous
+analysis is returned and the model call is skipped.
+
+Example:
+    from core.screen_cache import cached, cache_stats
+
+    analysis, hit = cached(sandbox, lambda: ask_model(screenshot()))
+    print(cache_stats(sandbox))  # hits, misses, hit_rate, saved_ms, ...
+"""
+
+import json
+import time
+import shlex
+
+from core.readiness import ensure_desktop
+from core.sandbox_tools import REMOTE_TOOLS_DIR
+
+
+def _run(sandbox, args, timeout=30):
+    result = sandbox.process.exec(
+        f"DISPLAY=:1 python3 {REMOTE_TOOLS_DIR}/screen_cache.py {args}",
+        timeout=timeout
+    )
+    try:
+        return json.loads(result.result.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise Exception(f"Screen cache failed: {result.result.strip()[:500]}")
+
+
+def _region_arg(region):
+    return " --region " + ",".join(str(int(v)) for v in region) if region else ""
+
+
+def lookup(sandbox, region=None):
+    """Return {"hit", "hash", "lookup_ms"[, "value", "distance"]}"""
+    ensure_desktop(sandbox)
+    return _run(sandbox, "lookup" + _region_arg(region))
+
+
+def store(sandbox, digest, value, region=None, cost_ms=None):
+    """Store value for the screen hash returned by lookup(); returns the stats"""
+    ensure_desktop(sandbox)
+    args = f"store --hash {shlex.quote(digest)}" + _region_arg(region)
+    if cost_ms is not None:
+        args += f" --cost-ms {float(cost_ms)}"
+    # One --value= argument, so a value such as "-1" is not parsed as an option
+    return _run(sandbox, f"{args} {shlex.quote('--value=' + value)}")
+
+
+def cache_stats(sandbox):
+    """Return hits, misses, hit_rate, saved_ms, entries and bytes"""
+    return _run(sandbox, "stats")
+
+
+def clear(sandbox):
+    return _run(sandbox, "clear")
+
+
+def cached(sandbox, compute, region=None):
+    """
+    Return (value, hit) for the current screen.
+
+    On a miss compute() is called (it must return a string, e.g. the model's
+    analysis or a JSON-encoded action) and stored with its duration, so the
+    stats can report the time saved by later hits.
+    """
+    found = lookup(sandbox, region)
+    if found["hit"]:
+        return found["value"], True
+
+    start = time.perf_counter()
+    value = compute()
+    cost_ms = (time.perf_counter() - start) * 1000
+    store(sandbox, found["hash"], value, region, cost_ms)
+    return value, False
@@ -0,0 +1,435 @@
+"""
+Persistent task queue and a scheduler that runs it over a pool of sandboxes.
+
+Tasks (an OpenCode prompt, optionally with a repo to clone) are stored in
+SQLite, so a batch survives restarts: tasks that were running when the
+scheduler died are queued again by recover().
+
+The scheduler runs one worker per slot; a sandbox has one or more slots
+(agents packed per sandbox) and a global cap limits how many tasks run at
+once. Each slot keeps a small deque of claimed tasks:
+    1. run the next task from its own deque
+    2. otherwise claim the highest-priority queued tasks from the database
+    3. otherwise steal the last task from the longest deque of another slot
+so that when the queue drains, a slot that frees up takes over work that
+was claimed by a slot still busy with a long task.
+
+Failed tasks are retried with exponential backoff up to max_attempts.
+Run one scheduler per database: run() re-queues whatever was left running.
+stats() reports queue depth, wait and run times, throughput and, while a
+scheduler runs, pool utilisation.
+
+Example:
+    from core.task_queue import TaskQueue, Scheduler
+
+    queue = TaskQueue()
+    queue.add("Fix the failing test in tests/test_api.py", repo_url=url, priority=5)
+    Scheduler(queue, [sandbox_a, sandbox_b], slots_per_sandbox=2).run()
+"""
+
+import os
+import time
+import shlex
+import sqlite3
+import threading
+from collections import deque
+
+from core.logs import LogStream, run_streamed
+
+DB_FILE = os.getenv("TASK_QUEUE_DB", "task_queue.db")
+KINDS = ("coding", "computer")
+TASKS_DIR = "/home/daytona/tasks"
+RETRY_DELAY = 10  # seconds before the first retry; doubles per attempt
+THROUGHPUT_WINDOW = 600  # seconds of finished tasks used for the throughput rate
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL DEFAULT 'coding',
+    prompt TEXT NOT NULL,
+    repo_url TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    timeout INTEGER NOT NULL DEFAULT 1800,
+    created_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    first_started_at REAL,
+    started_at REAL,
+    finished_at REAL,
+    sandbox_id TEXT,
+    slot TEXT,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (status, priority DESC, id);
+CREATE TABLE IF NOT EXISTS pool (
+    sandbox_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class TaskQueue:
+    """SQLite-backed task queue; safe to share between threads"""
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params)
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def add(self, prompt, kind="coding", priority=0, repo_url=None, max_attempts=3, timeout=1800):
+        """Queue a task; higher priority runs first. Returns its id"""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown task kind: {kind}")
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO tasks (kind, prompt, repo_url, priority, max_attempts, timeout, "
+            "created_at, available_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (kind, prompt, repo_url, priority, max_attempts, timeout, now, now)
+        )
+        return cursor.lastrowid
+
+    def recover(self):
+        """Queue again the tasks a previous scheduler claimed but never finished"""
+        cursor = self._execute(
+            "UPDATE tasks SET status = 'queued', slot = NULL "
+            "WHERE status IN ('assigned', 'running')"
+        )
+        return cursor.rowcount
+
+    def claim(self, n, slot):
+        """Mark up to n ready tasks as assigned to slot and return them, best first"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.db.execute(
+                    "SELECT * FROM tasks WHERE status = 'queued' AND available_at <= ? "
+                    "ORDER BY priority DESC, id LIMIT ?",
+                    (time.time(), n)
+                ).fetchall()
+                for row in rows:
+                    self.db.execute(
+                        "UPDATE tasks SET status = 'assigned', slot = ? WHERE id = ?",
+                        (slot, row["id"])
+                    )
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return [dict(row, slot=slot) for row in rows]
+
+    def start(self, task_id, sandbox_id, slot):
+        now = time.time()
+        self._execute(
+            "UPDATE tasks SET status = 'running', sandbox_id = ?, slot = ?, started_at = ?, "
+            "first_started_at = COALESCE(first_started_at, ?), attempts = attempts + 1 "
+            "WHERE id = ?",
+            (sandbox_id, slot, now, now, task_id)
+        )
+
+    def finish(self, task_id, ok, result=None, error=None):
+        """Record an attempt; a failure is retried with backoff until max_attempts"""
+        now = time.time()
+        row = self._query("SELECT attempts, max_attempts FROM tasks WHERE id = ?", (task_id,))[0]
+        if ok:
+            status, available_at = "done", now
+        elif row["attempts"] < row["max_attempts"]:
+            status, available_at = "queued", now + RETRY_DELAY * 2 ** (row["attempts"] - 1)
+        else:
+            status, available_at = "failed", now
+        self._execute(
+            "UPDATE tasks SET status = ?, available_at = ?, finished_at = ?, result = ?, "
+            "error = ?, slot = NULL WHERE id = ?",
+            (status, available_at, now, result, error, task_id)
+        )
+        return status
+
+    def release(self, task_id):
+        """Put a claimed but unstarted task back in the queue"""
+        self._execute(
+            "UPDATE tasks SET status = 'queued', slot = NULL WHERE id = ? AND status = 'assigned'",
+            (task_id,)
+        )
+
+    def pending(self):
+        """Number of tasks not yet done or failed (including ones waiting to retry)"""
+        return self._query(
+            "SELECT COUNT(*) FROM tasks WHERE status IN ('queued', 'assigned', 'running')"
+        )[0][0]
+
+    def list(self, status=None, limit=50):
+        if status:
+            rows = self._query(
+                "SELECT * FROM tasks WHERE status = ? ORDER BY priority DESC, id LIMIT ?",
+                (status, limit)
+            )
+        else:
+            rows = self._query("SELECT * FROM tasks ORDER BY id DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        """Queue depth by status, wait and run times, and recent throughput"""
+        now = time.time()
+        counts = {kind: 0 for kind in ("queued", "assigned", "running", "done", "failed")}
+        for row in self._query("SELECT status, COUNT(*) FROM tasks GROUP BY status"):
+            counts[row[0]] = row[1]
+
+        waits = sorted(
+            row[0] for row in self._query(
+                "SELECT first_started_at - created_at FROM tasks WHERE first_started_at IS NOT NULL"
+            )
+        )
+        runs = [
+            row[0] for row in self._query(
+                "SELECT finished_at - started_at FROM tasks WHERE status = 'done'"
+            )
+        ]
+        recent = self._query(
+            "SELECT COUNT(*) FROM tasks WHERE status = 'done' AND finished_at >= ?",
+            (now - THROUGHPUT_WINDOW,)
+        )[0][0]
+        oldest = self._query("SELECT MIN(created_at) FROM tasks WHERE status = 'queued'")[0][0]
+
+        return {
+            "depth": counts["queued"] + counts["assigned"],
+            "counts": counts,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 1) if waits else None,
+                "p50": round(waits[len(waits) // 2], 1) if waits else None,
+                "max": round(waits[-1], 1) if waits else None,
+                "oldest_queued": round(now - oldest, 1) if oldest else None
+            },
+            "run_seconds_avg": round(sum(runs) / len(runs), 1) if runs else None,
+            "throughput_per_hour": round(recent * 3600 / THROUGHPUT_WINDOW, 1)
+        }
+
+    def pool(self):
+        return [row[0] for row in self._query("SELECT sandbox_id FROM pool ORDER BY created_at")]
+
+    def add_to_pool(self, sandbox_id):
+        self._execute(
+            "INSERT OR IGNORE INTO pool (sandbox_id, created_at) VALUES (?, ?)",
+            (sandbox_id, time.time())
+        )
+
+    def remove_from_pool(self, sandbox_id):
+        self._execute("DELETE FROM pool WHERE sandbox_id = ?", (sandbox_id,))
+
+
+def prepare_desktop(sandbox):
+    """Bring up the desktop and the computer control tools (once per sandbox)"""
+    from core.readiness import ensure_desktop
+    from core.sandbox_tools import upload_tools
+
+    ensure_desktop(sandbox)
+    upload_tools(sandbox, log=lambda msg: None)
+
+
+def run_opencode_task(sandbox, task, session_id, log=print):
+    """
+    Run one task with `opencode run` in its own directory in the sandbox
+    (a shallow clone of repo_url, if given). Returns (ok, output).
+    """
+    from core.repo import clone_repo
+
+    workdir = f"{TASKS_DIR}/{task['id']}"
+    sandbox.process.exec(f"rm -rf {workdir} && mkdir -p {TASKS_DIR}")
+    if task["repo_url"]:
+        stats = clone_repo(sandbox, task["repo_url"], dest=workdir, depth=1, log=log)
+        if stats["exit_code"] != 0:
+            return False, f"clone failed: {stats['output'][-500:]}"
+    else:
+        sandbox.process.exec(f"mkdir -p {workdir}")
+
+    # timeout(1) ends the agent inside the sandbox; deleting the session
+    # when run_streamed gives up is only the backstop
+    display = "DISPLAY=:1 " if task["kind"] == "computer" else ""
+    command = (
+        f"export PATH=$HOME/.local/bin:$PATH && cd {workdir} && "
+        f"{display}timeout -k 30 {int(task['timeout'])} opencode run {shlex.quote(task['prompt'])}"
+    )
+    exit_code, output = run_streamed(
+        sandbox, command, LogStream(f"task-{task['id']}"),
+        session_id=session_id, timeout=task["timeout"] + 60
+    )
+    if exit_code in (124, 137):
+        return False, f"timed out after {task['timeout']}s\n{output[-1500:]}"
+    return exit_code == 0, output
+
+
+class Slot:
+    """One agent's worth of capacity on a sandbox, with its own task deque"""
+
+    def __init__(self, name, sandbox):
+        self.name = name
+        self.sandbox = sandbox
+        self.tasks = deque()
+        self.busy_seconds = 0.0
+        self.completed = 0
+
+
+class Scheduler:
+    """
+    Run queued tasks on a pool of sandboxes until the queue is empty (or,
+    with until_empty=False, until stop() is called).
+
+    run_task(sandbox, task, session_id, log) -> (ok, output) does the work;
+    it defaults to run_opencode_task.
+    """
+
+    def __init__(self, queue, sandboxes, slots_per_sandbox=1, max_running=None, prefetch=1,
+                 poll_interval=2, run_task=run_opencode_task, log=print):
+        self.queue = queue
+        self.slots = [
+            Slot(f"{i + 1}.{j + 1}", sandbox)
+            for i, sandbox in enumerate(sandboxes)
+            for j in range(slots_per_sandbox)
+        ]
+        self.running = threading.BoundedSemaphore(max_running or len(self.slots))
+        self.prefetch = prefetch
+        self.poll_interval = poll_interval
+        self.run_task = run_task
+        self.log = log
+        self.lock = threading.Lock()  # guards every slot's deque
+        self.stop_event = threading.Event()
+        # One computer-use task per sandbox at a time: they share its desktop
+        self.desktops = {id(s): threading.Lock() for s in sandboxes}
+        self.desktops_ready = set()
+        self.steals = 0
+        self.started_at = None
+
+    def next_task(self, slot):
+        """Own deque, then the database, then steal from the busiest slot"""
+        with self.lock:
+            if slot.tasks:
+                return slot.tasks.popleft()
+
+        claimed = self.queue.claim(1 + self.prefetch, slot.name)
+        if claimed:
+            with self.lock:
+                slot.tasks.extend(claimed[1:])
+            return claimed[0]
+
+        with self.lock:
+            victim = max(self.slots, key=lambda s: len(s.tasks))
+            if victim is not slot and victim.tasks:
+                self.steals += 1
+                # From the tail: the task its owner would have reached last
+                return victim.tasks.pop()
+        return None
+
+    def execute(self, slot, task):
+        sandbox_id = getattr(slot.sandbox, "id", None)
+        self.log(f"[slot {slot.name}] task {task['id']} (priority {task['priority']}, "
+                 f"attempt {task['attempts'] + 1}/{task['max_attempts']})")
+        start = time.monotonic()
+        desktop = self.desktops[id(slot.sandbox)] if task["kind"] == "computer" else None
+        acquired = False
+        try:
+            # Count the attempt before anything can fail, so retries stay bounded
+            self.queue.start(task["id"], sandbox_id, slot.name)
+            if desktop:
+                desktop.acquire()
+                acquired = True
+                if id(slot.sandbox) not in self.desktops_ready:
+                    prepare_desktop(slot.sandbox)
+                    self.desktops_ready.add(id(slot.sandbox))
+            ok, output = self.run_task(slot.sandbox, task, f"slot-{slot.name}", self.log)
+            error = None if ok else (output or "")[-2000:]
+        except Exception as e:
+            ok, output, error = False, None, str(e)
+        finally:
+            if acquired:
+                desktop.release()
+
+        status = self.queue.finish(task["id"], ok, (output or "")[-2000:] if ok else None, error)
+        elapsed = time.monotonic() - start
+        slot.busy_seconds += elapsed
+        slot.completed += ok
+        self.log(f"[slot {slot.name}] task {task['id']} {status} after {elapsed:.0f}s")
+
+    def worker(self, slot, until_empty):
+        while not self.stop_event.is_set():
+            with self.running:
+                task = self.next_task(slot)
+                if task:
+                    self.execute(slot, task)
+                    continue
+            if until_empty and self.queue.pending() == 0:
+                return
+            self.stop_event.wait(self.poll_interval)
+
+    def run(self, until_empty=True, report_every=60):
+        """Run every slot's worker until done; returns the final stats()"""
+        self.started_at = time.monotonic()
+        recovered = self.queue.recover()
+        if recovered:
+            self.log(f"Re-queued {recovered} interrupted tasks")
+
+        threads = [
+            threading.Thread(target=self.worker, args=(slot, until_empty), daemon=True)
+            for slot in self.slots
+        ]
+        for thread in threads:
+            thread.start()
+        last_report = time.monotonic()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)
+                if report_every and time.monotonic() - last_report >= report_every:
+                    self.log(format_stats(self.stats()))
+                    last_report = time.monotonic()
+        except KeyboardInterrupt:
+            self.log("Stopping: running tasks finish, claimed ones go back to the queue")
+            self.stop()
+            for thread in threads:
+                thread.join()
+        finally:
+            with self.lock:
+                for slot in self.slots:
+                    while slot.tasks:
+                        self.queue.release(slot.tasks.pop()["id"])
+        return self.stats()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        """Queue stats plus pool utilisation and per-slot completions"""
+        stats = self.queue.stats()
+        if self.started_at is not None:
+            wall = time.monotonic() - self.started_at
+            busy = sum(slot.busy_seconds for slot in self.slots)
+            stats["pool"] = {
+                "slots": len(self.slots),
+                "utilisation": round(busy / (wall * len(self.slots)), 3) if wall else None,
+                "steals": self.steals,
+                "completed": {slot.name: slot.completed for slot in self.slots}
+            }
+        return stats
+
+
+def format_stats(stats):
+    """One-line summary of stats() for progress output"""
+    counts = stats["counts"]
+    line = (
+        f"depth={stats['depth']} running={counts['running']} done={counts['done']} "
+        f"failed={counts['failed']} wait_avg={stats['wait_seconds']['avg']}s "
+        f"throughput={stats['throughput_per_hour']}/h"
+    )
+    if "pool" in stats:
+        line += f" utilisation={stats['pool']['utilisation']} steals={stats['pool']['steals']}"
+    return line
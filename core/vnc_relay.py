@@ -0,0 +1,619 @@
+"""
+Shared VNC websocket relay.
+
+Keeps one upstream websocket per sandbox (to Daytona's websockify) and fans
+framebuffer updates out to any number of browser viewers, so upstream
+bandwidth and proxy load do not grow with the number of people watching.
+
+The relay speaks RFB on both sides:
+- Upstream it completes the handshake once, fixes the pixel format to the
+  one noVNC uses and asks for Tight, Hextile, Raw and DesktopSize, with the
+  JPEG quality and zlib level the controlling viewer asks for. Tight's zlib
+  data normally depends on every earlier rectangle; the relay inflates it
+  and recompresses each rectangle as a fresh stream (with Tight's stream
+  reset bit set), so every update stands alone and a viewer that joins
+  mid-stream only needs one full refresh to be in sync.
+- Downstream each viewer gets its own handshake and ServerInit, then every
+  server message, forwarded whole (messages are parsed so they are never
+  split between viewers joining or leaving).
+
+Only the viewer holding control may send pointer, key and clipboard events.
+Control starts with the first viewer and passes to the oldest remaining one
+when the holder leaves.
+
+Uses only the standard library (minimal RFC 6455 framing).
+"""
+
+import os
+import ssl
+import zlib
+import queue
+import base64
+import socket
+import struct
+import hashlib
+import threading
+from urllib.parse import urlparse
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+# noVNC's native format: 32 bpp, depth 24, little endian, true colour, RGB at 0/8/16
+PIXEL_FORMAT = struct.pack(">BBBBHHHBBB3x", 32, 24, 0, 1, 255, 255, 255, 0, 8, 16)
+
+ENC_RAW, ENC_COPYRECT, ENC_HEXTILE, ENC_TIGHT = 0, 1, 5, 7
+ENC_DESKTOP_SIZE, ENC_LAST_RECT = -223, -224
+RELAY_ENCODINGS = [ENC_TIGHT, ENC_HEXTILE, ENC_RAW, ENC_DESKTOP_SIZE, ENC_LAST_RECT]
+# Tight JPEG quality and zlib level pseudo-encodings (level 0-9 each)
+ENC_QUALITY_RANGE = range(-32, -22)
+ENC_COMPRESS_RANGE = range(-256, -246)
+DEFAULT_TUNING = [-32 + 6, -256 + 2]
+
+# Tight compression-control values; TPIXELs are 3 bytes in PIXEL_FORMAT
+TIGHT_FILL, TIGHT_JPEG, TIGHT_EXPLICIT_FILTER = 8, 9, 4
+TIGHT_FILTER_COPY, TIGHT_FILTER_PALETTE, TIGHT_FILTER_GRADIENT = 0, 1, 2
+TIGHT_MIN_TO_COMPRESS = 12
+
+# Hextile subencoding bits
+HEX_RAW, HEX_BG, HEX_FG, HEX_ANY_SUBRECTS, HEX_SUBRECTS_COLOURED = 1, 2, 4, 8, 16
+
+# Messages a viewer may send: type -> fixed length (ClientCutText is variable)
+CLIENT_MESSAGE_SIZES = {0: 20, 3: 10, 4: 8, 5: 6}
+INPUT_MESSAGES = {4, 5, 6}
+
+VIEWER_QUEUE_SIZE = 64
+
+
+# --- websocket framing -------------------------------------------------------
+
+def websocket_accept(key):
+    """Sec-WebSocket-Accept value for a client's Sec-WebSocket-Key"""
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def encode_frame(payload, opcode=OP_BINARY, mask=False):
+    """Build one final websocket frame (clients must mask, servers must not)"""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header += bytes([mask_bit | length])
+    elif length < 1 << 16:
+        header += bytes([mask_bit | 126]) + struct.pack(">H", length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack(">Q", length)
+
+    if not mask:
+        return header + payload
+    key = os.urandom(4)
+    return header + key + apply_mask(payload, key)
+
+
+def apply_mask(payload, key):
+    # XOR as one big integer - much faster than a byte loop in Python
+    repeated = (key * (len(payload) // 4 + 1))[:len(payload)]
+    masked = int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")
+    return masked.to_bytes(len(payload), "big")
+
+
+def read_exact(read, n):
+    data = b""
+    while len(data) < n:
+        chunk = read(n - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return data
+
+
+def read_frame(read):
+    """Read one frame; returns (fin, opcode, payload) with any mask removed"""
+    b0, b1 = read_exact(read, 2)
+    length = b1 & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", read_exact(read, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", read_exact(read, 8))[0]
+    key = read_exact(read, 4) if b1 & 0x80 else None
+    payload = read_exact(read, length) if length else b""
+    if key:
+        payload = apply_mask(payload, key)
+    return bool(b0 & 0x80), b0 & 0x0F, payload
+
+
+class WebSocket:
+    """Blocking websocket over a connected socket; yields binary payloads"""
+
+    def __init__(self, read, write, client):
+        self.read = read
+        self.write = write
+        self.client = client
+        self.send_lock = threading.Lock()
+        self.closed = False
+
+    def send(self, payload, opcode=OP_BINARY):
+        frame = encode_frame(payload, opcode, mask=self.client)
+        with self.send_lock:
+            self.write(frame)
+
+    def recv(self):
+        """Return the next data message, or None once the peer closes"""
+        message = b""
+        while True:
+            fin, opcode, payload = read_frame(self.read)
+            if opcode == OP_CLOSE:
+                self.close()
+                return None
+            if opcode == OP_PING:
+                self.send(payload, OP_PONG)
+                continue
+            if opcode == OP_PONG:
+                continue
+            message += payload
+            if fin:
+                return message
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.send(b"", OP_CLOSE)
+        except OSError:
+            pass
+
+
+def connect_websocket(url, timeout=15):
+    """Open a client websocket (ws:// or wss://) with the "binary" subprotocol"""
+    parsed = urlparse(url)
+    secure = parsed.scheme == "wss"
+    port = parsed.port or (443 if secure else 80)
+    sock = socket.create_connection((parsed.hostname, port), timeout=timeout)
+    if secure:
+        sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname)
+
+    key = base64.b64encode(os.urandom(16)).decode()
+    path = parsed.path or "/"
+    if parsed.query:
+        path += "?" + parsed.query
+    sock.sendall((
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {parsed.netloc}\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Key: {key}\r\n"
+        "Sec-WebSocket-Version: 13\r\n"
+        "Sec-WebSocket-Protocol: binary\r\n"
+        "\r\n"
+    ).encode())
+
+    reader = sock.makefile("rb")
+    status = reader.readline().decode(errors="replace").strip()
+    headers = {}
+    while True:
+        line = reader.readline().decode(errors="replace").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if " 101 " not in f"{status} " or headers.get("sec-websocket-accept") != websocket_accept(key):
+        sock.close()
+        raise ConnectionError(f"websocket upgrade failed: {status}")
+
+    sock.settimeout(None)
+    return sock, WebSocket(reader.read1, sock.sendall, client=True)
+
+
+# --- RFB ---------------------------------------------------------------------
+
+class MessageStream:
+    """Byte-stream view of a websocket: RFB messages may span or share frames"""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.buffer = b""
+        self.taken = []
+
+    def read(self, n):
+        while len(self.buffer) < n:
+            message = self.ws.recv()
+            if message is None:
+                raise ConnectionError("websocket closed")
+            self.buffer += message
+        data, self.buffer = self.buffer[:n], self.buffer[n:]
+        self.taken.append(data)
+        return data
+
+    def take(self):
+        """Return everything read since the last take() as one message"""
+        data = b"".join(self.taken)
+        self.taken = []
+        return data
+
+
+def read_compact_length(stream):
+    """Read a Tight compact length: 1-3 bytes, 7 bits each, low bits first"""
+    length = 0
+    for shift in (0, 7, 14):
+        byte = stream.read(1)[0]
+        length |= (byte & (0x7F if shift < 14 else 0xFF)) << shift
+        if shift == 14 or not byte & 0x80:
+            return length
+
+
+def compact_length(length):
+    out = bytearray()
+    for shift in (0, 7):
+        if length >> shift < 0x80:
+            out.append(length >> shift & 0x7F)
+            return bytes(out)
+        out.append(length >> shift & 0x7F | 0x80)
+    return bytes(out) + bytes([length >> 14 & 0xFF])
+
+
+class TightStreams:
+    """
+    Tight's four zlib streams, as the relay's upstream sees them.
+
+    restate() rewrites one rectangle's zlib data as a complete stream of its
+    own and sets the reset bit for it, so a viewer can decode the rectangle
+    without having seen any earlier one.
+    """
+
+    def __init__(self):
+        self.inflaters = [zlib.decompressobj() for _ in range(4)]
+
+    def reset(self, control):
+        for i in range(4):
+            if control & (1 << i):
+                self.inflaters[i] = zlib.decompressobj()
+
+    def restate(self, index, data):
+        raw = self.inflaters[index].decompress(data)
+        return zlib.compress(raw, 1)
+
+
+def read_tight(stream, width, height, tight):
+    """Consume a Tight rectangle, making its zlib data stateless (see TightStreams)"""
+    mark = len(stream.taken)
+    control = stream.read(1)[0]
+    tight.reset(control)
+    kind = control >> 4
+    if kind == TIGHT_FILL:
+        stream.read(3)
+        return
+    if kind == TIGHT_JPEG:
+        stream.read(read_compact_length(stream))
+        return
+    if kind > TIGHT_JPEG:
+        raise ValueError(f"bad Tight compression control {control:#x}")
+
+    index = kind & 3
+    row_bytes = width * 3
+    if kind & TIGHT_EXPLICIT_FILTER:
+        filter_id = stream.read(1)[0]
+        if filter_id == TIGHT_FILTER_PALETTE:
+            colours = stream.read(1)[0] + 1
+            stream.read(colours * 3)
+            row_bytes = (width + 7) // 8 if colours == 2 else width
+        elif filter_id not in (TIGHT_FILTER_COPY, TIGHT_FILTER_GRADIENT):
+            raise ValueError(f"bad Tight filter {filter_id}")
+
+    size = row_bytes * height
+    if size < TIGHT_MIN_TO_COMPRESS:
+        stream.read(size)
+        return
+    length_at = len(stream.taken)
+    data = tight.restate(index, stream.read(read_compact_length(stream)))
+    head = b"".join(stream.taken[mark:length_at])
+    # Control byte with this stream's reset bit set, then the unchanged filter bytes
+    stream.taken[mark:] = [bytes([head[0] | (1 << index)]) + head[1:] + compact_length(len(data)) + data]
+
+
+def read_rect_payload(stream, width, height, encoding, tight=None):
+    """Consume one rectangle's payload for the encodings the relay requests"""
+    if encoding == ENC_TIGHT:
+        read_tight(stream, width, height, tight)
+    elif encoding == ENC_RAW:
+        stream.read(width * height * 4)
+    elif encoding == ENC_COPYRECT:
+        stream.read(4)
+    elif encoding == ENC_HEXTILE:
+        for ty in range(0, height, 16):
+            th = min(16, height - ty)
+            for tx in range(0, width, 16):
+                tw = min(16, width - tx)
+                sub = stream.read(1)[0]
+                if sub & HEX_RAW:
+                    stream.read(tw * th * 4)
+                    continue
+                if sub & HEX_BG:
+                    stream.read(4)
+                if sub & HEX_FG:
+                    stream.read(4)
+                if sub & HEX_ANY_SUBRECTS:
+                    count = stream.read(1)[0]
+                    stream.read(count * (6 if sub & HEX_SUBRECTS_COLOURED else 2))
+    elif encoding == ENC_DESKTOP_SIZE:
+        pass
+    else:
+        raise ValueError(f"unexpected encoding {encoding} from VNC server")
+
+
+def set_encodings_message(encodings):
+    return struct.pack(">BxH", 2, len(encodings)) + b"".join(struct.pack(">i", e) for e in encodings)
+
+
+class Viewer:
+    """One downstream browser connection"""
+
+    def __init__(self, viewer_id, ws):
+        self.id = viewer_id
+        self.ws = ws
+        self.queue = queue.Queue(maxsize=VIEWER_QUEUE_SIZE)
+        self.bytes_sent = 0
+        self.alive = True
+
+    def writer(self):
+        while self.alive:
+            message = self.queue.get()
+            if message is None:
+                break
+            try:
+                self.ws.send(message)
+                self.bytes_sent += len(message)
+            except OSError:
+                break
+        self.alive = False
+
+    def enqueue(self, message):
+        """Queue a server message; a viewer that falls this far behind is dropped"""
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.disconnect()
+
+    def disconnect(self):
+        self.alive = False
+        self.ws.close()
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+class VncRelay:
+    """One upstream RFB session shared by every viewer of a sandbox"""
+
+    def __init__(self, ws_url, on_empty=None):
+        self.ws_url = ws_url
+        self.on_empty = on_empty
+        self.lock = threading.Lock()
+        self.viewers = []
+        self.controller = None
+        self.upstream = None
+        self.sock = None
+        self.width = self.height = 0
+        self.name = b""
+        self.bytes_upstream = 0
+        self.update_pending = False
+        self.encodings = RELAY_ENCODINGS + DEFAULT_TUNING
+        self.tight = TightStreams()
+        self.joining = 0  # viewers still in their handshake
+
+    # upstream
+
+    def connect(self):
+        """Connect upstream and complete the RFB handshake as a shared client"""
+        self.sock, ws = connect_websocket(self.ws_url)
+        try:
+            self._handshake(ws)
+        except Exception:
+            self.sock.close()
+            self.sock = None
+            raise
+
+    def _handshake(self, ws):
+        stream = MessageStream(ws)
+
+        version = stream.read(12)
+        if not version.startswith(b"RFB 003."):
+            raise ConnectionError(f"not an RFB server: {version!r}")
+        ws.send(b"RFB 003.008\n")
+
+        count = stream.read(1)[0]
+        if count == 0:
+            reason_len = struct.unpack(">I", stream.read(4))[0]
+            raise ConnectionError(stream.read(reason_len).decode(errors="replace"))
+        types = stream.read(count)
+        if 1 not in types:
+            raise ConnectionError("relay needs a VNC server without a password (security type None)")
+        ws.send(bytes([1]))
+        if struct.unpack(">I", stream.read(4))[0] != 0:
+            raise ConnectionError("VNC security handshake failed")
+
+        ws.send(bytes([1]))  # ClientInit: shared session
+        self.width, self.height = struct.unpack(">HH", stream.read(4))
+        stream.read(16)  # server pixel format - replaced below
+        name_len = struct.unpack(">I", stream.read(4))[0]
+        self.name = stream.read(name_len)
+        stream.take()
+
+        ws.send(b"\x00\x00\x00\x00" + PIXEL_FORMAT)
+        ws.send(set_encodings_message(self.encodings))
+
+        self.upstream = ws
+        self.stream = stream
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _pump(self):
+        """Read whole server messages and fan each one out to every viewer"""
+        try:
+            while True:
+                message = self._read_server_message()
+                self.bytes_upstream += len(message)
+                with self.lock:
+                    viewers = list(self.viewers)
+                for viewer in viewers:
+                    viewer.enqueue(message)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        self.close()
+
+    def _read_server_message(self):
+        stream = self.stream
+        kind = stream.read(1)[0]
+        if kind == 0:  # FramebufferUpdate
+            self.update_pending = False
+            count = struct.unpack(">xH", stream.read(3))[0]
+            for _ in range(count):
+                x, y, w, h, encoding = struct.unpack(">HHHHi", stream.read(12))
+                if encoding == ENC_LAST_RECT:
+                    break
+                if encoding == ENC_DESKTOP_SIZE:
+                    self.width, self.height = w, h
+                read_rect_payload(stream, w, h, encoding, self.tight)
+        elif kind == 1:  # SetColourMapEntries
+            _, _, n = struct.unpack(">BHH", stream.read(5))
+            stream.read(n * 6)
+        elif kind == 2:  # Bell
+            pass
+        elif kind == 3:  # ServerCutText
+            length = struct.unpack(">3xI", stream.read(7))[0]
+            stream.read(length)
+        else:
+            raise ValueError(f"unknown server message {kind}")
+        return stream.take()
+
+    def request_update(self, incremental=True):
+        """Ask upstream for an update; incremental requests are coalesced"""
+        if incremental and self.update_pending:
+            return
+        self.update_pending = True
+        self.upstream.send(struct.pack(">BBHHHH", 3, int(incremental), 0, 0, self.width, self.height))
+
+    def set_encodings(self, requested):
+        """
+        Ask upstream for the encodings a viewer requested that the relay can
+        parse, plus its JPEG quality and zlib level. Raw and DesktopSize are
+        always included.
+        """
+        encodings = [e for e in requested if e in RELAY_ENCODINGS]
+        encodings += [e for e in (ENC_RAW, ENC_DESKTOP_SIZE) if e not in encodings]
+        encodings += [e for e in requested if e in ENC_QUALITY_RANGE or e in ENC_COMPRESS_RANGE]
+        if encodings != self.encodings:
+            self.encodings = encodings
+            self.upstream.send(set_encodings_message(encodings))
+
+    # downstream
+
+    def serve(self, viewer_id, ws):
+        """Run one viewer until it disconnects (call from its handler thread)"""
+        stream = MessageStream(ws)
+        with self.lock:
+            self.joining += 1
+        try:
+            ws.send(b"RFB 003.008\n")
+            stream.read(12)
+            ws.send(bytes([1, 1]))  # one security type: None
+            stream.read(1)
+            ws.send(struct.pack(">I", 0))
+            stream.read(1)  # ClientInit
+            ws.send(struct.pack(">HH", self.width, self.height) + PIXEL_FORMAT
+                    + struct.pack(">I", len(self.name)) + self.name)
+            stream.take()
+        except (ConnectionError, OSError, ValueError):
+            # Nobody else may ever join, so do not leave the upstream open
+            with self.lock:
+                self.joining -= 1
+                empty = not self.viewers and not self.joining
+            ws.close()
+            if empty:
+                self.close()
+            return
+
+        viewer = Viewer(viewer_id, ws)
+        with self.lock:
+            self.joining -= 1
+            self.viewers.append(viewer)
+            if self.controller is None:
+                self.controller = viewer_id
+        threading.Thread(target=viewer.writer, daemon=True).start()
+
+        try:
+            # A new viewer has a blank framebuffer: get it one full frame
+            self.request_update(incremental=False)
+            while viewer.alive:
+                self._forward_client_message(viewer, stream)
+        except (ConnectionError, OSError, ValueError):
+            pass
+        finally:
+            viewer.disconnect()
+            self._remove(viewer)
+
+    def _forward_client_message(self, viewer, stream):
+        kind = stream.read(1)[0]
+        if kind == 6:  # ClientCutText
+            length = struct.unpack(">3xI", stream.read(7))[0]
+            stream.read(length)
+        elif kind == 2:  # SetEncodings
+            count = struct.unpack(">xH", stream.read(3))[0]
+            requested = struct.unpack(f">{count}i", stream.read(count * 4))
+        elif kind in CLIENT_MESSAGE_SIZES:
+            stream.read(CLIENT_MESSAGE_SIZES[kind] - 1)
+        else:
+            raise ValueError(f"unsupported client message {kind}")
+        message = stream.take()
+
+        if kind == 3:
+            self.request_update(incremental=bool(message[1]))
+        elif kind == 2 and viewer.id == self.controller:
+            self.set_encodings(requested)
+        elif kind in INPUT_MESSAGES and viewer.id == self.controller:
+            self.upstream.send(message)
+        # SetPixelFormat is dropped: every viewer gets PIXEL_FORMAT
+
+    def _remove(self, viewer):
+        with self.lock:
+            if viewer in self.viewers:
+                self.viewers.remove(viewer)
+            if self.controller == viewer.id:
+                self.controller = self.viewers[0].id if self.viewers else None
+            empty = not self.viewers and not self.joining
+        if empty:
+            self.close()
+
+    def take_control(self, viewer_id):
+        """Give input control to viewer_id; returns False if it is not connected"""
+        with self.lock:
+            if not any(v.id == viewer_id for v in self.viewers):
+                return False
+            self.controller = viewer_id
+            return True
+
+    def close(self):
+        with self.lock:
+            viewers, self.viewers = self.viewers, []
+            sock, self.sock = self.sock, None
+        for viewer in viewers:
+            viewer.disconnect()
+        if sock:
+            try:
+                sock.close()
+            except OSError:
+                pass
+            if self.on_empty:
+                self.on_empty(self)
+
+    def stats(self):
+        with self.lock:
+            viewers = list(self.viewers)
+        return {
+            "viewers": len(viewers),
+            "controller": self.controller,
+            "upstream_bytes": self.bytes_upstream,
+            "downstream_bytes": sum(v.bytes_sent for v in viewers),
+            "width": self.width,
+            "height": self.height
+        }
@@ -17,11 +17,18 @@ import argparse
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Make the shared core/ package importable when run as a script
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.readiness import poll_until, vnc_ready
+from core.sandbox_tools import upload_tools
+from core.actions import run_batch_or_computer_use, click, type_text, key, settle
+from core.screen import wait_until_settled
+
 # Load environment variables
 load_dotenv()
 
 # Constants
-TOOLS_DIR = Path(__file__).parent.parent / "tools"
 DEFAULT_URL = "https://www.buzzfeed.com/luisdelvalle/this-is-not-the-quiz-youre-looking-for"
 
 
@@ -31,15 +38,6 @@ def log(msg: str):
     print(f"[{timestamp}] {msg}")
 
 
-def get_tool_scripts() -> dict:
-    """Read all tool scripts from the tools directory"""
-    scripts = {}
-    if TOOLS_DIR.exists():
-        for script_file in TOOLS_DIR.glob("*.sh"):
-            scripts[script_file.name] = script_file.read_text()
-    return scripts
-
-
 def create_sandbox():
     """Create and configure a Daytona sandbox for computer use"""
 
@@ -79,7 +77,11 @@ def create_sandbox():
         log(f"       VNC error: {e}")
 
     log("       Waiting for desktop to initialize...")
-    time.sleep(5)
+    try:
+        _, waited = poll_until(lambda: vnc_ready(sandbox), timeout=30)
+        log(f"       Desktop ready after {waited:.1f}s")
+    except TimeoutError:
+        log("       Desktop not answering yet, continuing")
 
     # Phase 2: Install OpenCode
     # ✅ BEST PRACTICE: Use npm instead of apt-get (permission issues)
@@ -93,12 +95,8 @@ def create_sandbox():
     # Phase 2: Upload tool scripts
     log("[4/6] Uploading tool scripts...")
     try:
-        sandbox.process.exec("mkdir -p /home/daytona/tools")
-        scripts = get_tool_scripts()
-        for name, content in scripts.items():
-            sandbox.fs.upload_file(f"/home/daytona/tools/{name}", content.encode())
-            log(f"       Uploaded: {name}")
-        sandbox.process.exec("chmod +x /home/daytona/tools/*.sh")
+        # Also installs python-xlib and starts the input daemon
+        upload_tools(sandbox, log=log)
     except Exception as e:
         log(f"       Upload error: {e}")
 
@@ -108,29 +106,37 @@ def create_sandbox():
     try:
         sandbox.computer_use.keyboard.hotkey("ctrl+alt+t")
         log("       Sent Ctrl+Alt+T")
-        time.sleep(3)  # ✅ BEST PRACTICE: Wait for terminal to initialize
+        # ✅ BEST PRACTICE: Wait for terminal to initialize (until the screen settles)
+        wait_until_settled(sandbox, stable_ms=500, timeout=4, change_timeout=2, fallback=3)
     except Exception as e:
         log(f"       Hotkey error: {e}")
 
     # Phase 3: Launch OpenCode
     log("[6/6] Launching OpenCode...")
     try:
-        # ✅ BEST PRACTICE: Click to focus before typing
-        sandbox.computer_use.mouse.click(x=500, y=350, button="left")
-        time.sleep(0.5)
-
-        # Type opencode
-        sandbox.computer_use.keyboard.type("opencode")
-        time.sleep(0.3)
-
-        # ⚠️ CONSTRAINT: keyboard.press("Return") doesn't work
-        # ✅ BEST PRACTICE: Use Ctrl+M for Enter
-        sandbox.computer_use.keyboard.press("m", ["ctrl"])
-        log("       OpenCode launched")
+        # One round trip for the whole focus/type/Enter sequence (computer_use
+        # calls for whatever the batch could not do)
+        result = run_batch_or_computer_use(sandbox, [
+            # ✅ BEST PRACTICE: Click to focus before typing
+            click(500, 350),
+            settle(stable_ms=200, timeout_ms=600, change_timeout_ms=200),
+            type_text("opencode"),
+            settle(stable_ms=100, timeout_ms=400, change_timeout_ms=100),
+            # ✅ BEST PRACTICE: Use Ctrl+M for Enter
+            key("ctrl+m"),
+        ])
+        if result["ok"]:
+            log(f"       OpenCode launched ({result['total_ms']} ms)")
+        elif result["fallback"]:
+            log(f"       Batch failed ({result.get('error') or result['results']}), "
+                f"sent the last {result['fallback']} action(s) via computer_use")
+            log("       OpenCode launched")
+        else:
+            log(f"       Launch error: {result.get('error') or result['results']}")
     except Exception as e:
         log(f"       Launch error: {e}")
 
-    time.sleep(2)
+    wait_until_settled(sandbox, stable_ms=500, timeout=3, fallback=2)
 
     # Get VNC URL
     vnc_url = None
@@ -157,21 +163,27 @@ def open_browser(sandbox, url: str):
     """Open Firefox to a URL in the VNC desktop"""
     log(f"Opening browser to: {url}")
     try:
-        # Open new terminal
-        sandbox.computer_use.keyboard.hotkey("ctrl+alt+t")
-        time.sleep(2)
-
-        # Click to focus
-        sandbox.computer_use.mouse.click(x=500, y=350, button="left")
-        time.sleep(0.3)
-
-        # Type firefox command
-        sandbox.computer_use.keyboard.type(f"firefox {url}")
-        time.sleep(0.3)
-
-        # Press Enter (Ctrl+M)
-        sandbox.computer_use.keyboard.press("m", ["ctrl"])
-        log("       Firefox launched")
+        result = run_batch_or_computer_use(sandbox, [
+            # Open new terminal
+            key("ctrl+alt+t"),
+            settle(stable_ms=300, timeout_ms=2500, change_timeout_ms=2000),
+            # Click to focus
+            click(500, 350),
+            settle(stable_ms=150, timeout_ms=400, change_timeout_ms=150),
+            # Type firefox command
+            type_text(f"GNOME_ACCESSIBILITY=1 firefox {url}"),
+            settle(stable_ms=100, timeout_ms=400, change_timeout_ms=100),
+            # Press Enter (Ctrl+M)
+            key("ctrl+m"),
+        ])
+        if result["ok"]:
+            log(f"       Firefox launched ({result['total_ms']} ms)")
+        elif result["fallback"]:
+            log(f"       Batch failed ({result.get('error') or result['results']}), "
+                f"sent the last {result['fallback']} action(s) via computer_use")
+            log("       Firefox launched")
+        else:
+            log(f"       Browser error: {result.get('error') or result['results']}")
     except Exception as e:
         log(f"       Browser error: {e}")
 
@@ -6,6 +6,7 @@ with a web interface you can access from anywhere.
 
 Usage:
     python run_opencode.py [--repo <git-url>] [--keep-alive]
+                           [--quiet] [--depth N] [--blobless] [--sparse DIR ...] [--bundle-cache]
 
 Requirements:
     - pip install daytona-sdk python-dotenv
@@ -14,20 +15,27 @@ Requirements:
 
 import os
 import sys
-import time
 import argparse
+import threading
 from dotenv import load_dotenv
 
+from core.readiness import wait_for_server, ReadinessFailed
+from core.repo import clone_repo, add_clone_arguments, clone_options, transfer_summary
+from core.logs import LogStream, echo_stream, run_streamed, tail_session_command
+
 # Load environment variables
 load_dotenv()
 
-def create_opencode_sandbox(repo_url: str = None, keep_alive: bool = False):
+def create_opencode_sandbox(repo_url: str = None, keep_alive: bool = False, clone: dict = None,
+                            quiet: bool = False):
     """
     Create a Daytona sandbox with OpenCode running.
 
     Args:
         repo_url: Optional Git repo to clone into the sandbox
         keep_alive: If True, keeps the sandbox alive indefinitely
+        clone: Options for core.repo.clone_repo (depth, blobless, sparse, ...)
+        quiet: If True, don't print command output live
 
     Returns:
         dict with sandbox info and web URL
@@ -59,13 +67,14 @@ def create_opencode_sandbox(repo_url: str = None, keep_alive: bool = False):
 
     # Install OpenCode
     print("Installing OpenCode...")
-    result = sandbox.process.exec(
-        "curl -fsSL https://opencode.ai/install | bash",
-        timeout=120
+    echo = None if quiet else print
+    exit_code, output = run_streamed(
+        sandbox, "curl -fsSL https://opencode.ai/install | bash", timeout=120, echo=echo
     )
-    if result.exit_code != 0:
-        print(f"Warning: OpenCode install returned code {result.exit_code}")
-        print(result.output)
+    if exit_code != 0:
+        print(f"Warning: OpenCode install returned code {exit_code}")
+        if quiet:
+            print(output)
 
     # Add opencode to PATH (it installs to ~/.local/bin)
     sandbox.process.exec("echo 'export PATH=$HOME/.local/bin:$PATH' >> ~/.bashrc")
@@ -73,13 +82,12 @@ def create_opencode_sandbox(repo_url: str = None, keep_alive: bool = False):
     # Clone repo if provided
     if repo_url:
         print(f"Cloning repository: {repo_url}")
-        result = sandbox.process.exec(
-            f"cd /home/daytona && git clone {repo_url} project",
-            timeout=300
-        )
-        if result.exit_code != 0:
-            print(f"Warning: Git clone returned code {result.exit_code}")
-            print(result.output)
+        stats = clone_repo(sandbox, repo_url, **(clone or {}))
+        if stats["exit_code"] != 0:
+            print(f"Warning: Git clone returned code {stats['exit_code']}")
+            print(stats["output"])
+        else:
+            print(f"Cloned via {stats['method']} in {stats['seconds']}s ({transfer_summary(stats)})")
         workdir = "/home/daytona/project"
     else:
         workdir = "/home/daytona"
@@ -91,15 +99,30 @@ def create_opencode_sandbox(repo_url: str = None, keep_alive: bool = False):
 
     # Start OpenCode web server in background
     # Using --hostname 0.0.0.0 to allow external access
-    sandbox.process.execute_session_command(
+    command = sandbox.process.execute_session_command(
         session_id,
         f"cd {workdir} && ~/.local/bin/opencode web --hostname 0.0.0.0 --port 4096",
         var_async=True  # Run async so we don't block
     )
 
-    # Wait for server to start
+    # Show the server's output until it is up
+    cmd_id = getattr(command, "cmd_id", None)
+    stop_tail = threading.Event()
+    if echo and cmd_id:
+        server_log = LogStream(session_id)
+        echo_stream(server_log, echo)
+        tail_session_command(sandbox, session_id, cmd_id, server_log, stop=stop_tail)
+
+    # Wait until the server answers, not a fixed delay
     print("Waiting for OpenCode to start...")
-    time.sleep(5)
+    try:
+        ready_seconds = wait_for_server(sandbox, 4096, session_id, cmd_id)
+    except (ReadinessFailed, TimeoutError) as e:
+        print(f"Error: OpenCode web server did not start: {e}")
+        sys.exit(1)
+    finally:
+        stop_tail.set()
+    print(f"OpenCode ready after {ready_seconds:.1f}s")
 
     # Get the preview URL for the web interface
     web_url = sandbox.get_preview_link(4096)
@@ -123,7 +146,8 @@ def create_opencode_sandbox(repo_url: str = None, keep_alive: bool = False):
         "sandbox_id": sandbox.id,
         "web_url": web_url,
         "terminal_url": terminal_url,
-        "workdir": workdir
+        "workdir": workdir,
+        "ready_seconds": round(ready_seconds, 1)
     }
 
 
@@ -140,12 +164,20 @@ def main():
         action="store_true",
         help="Keep sandbox alive indefinitely (no auto-stop)"
     )
+    parser.add_argument(
+        "--quiet", "-q",
+        action="store_true",
+        help="Don't print command output live"
+    )
+    add_clone_arguments(parser)
 
     args = parser.parse_args()
 
     result = create_opencode_sandbox(
         repo_url=args.repo,
-        keep_alive=args.keep_alive
+        keep_alive=args.keep_alive,
+        clone=clone_options(args),
+        quiet=args.quiet
     )
 
     # Save sandbox info for later reference
@@ -6,6 +6,8 @@ You get a browser-based terminal where you can manage multiple panes/windows.
 
 Usage:
     python run_terminal.py [--repo <git-url>] [--keep-alive]
+    python run_terminal.py --agents 4 [--agent-cpus 0.5] [--agent-memory 1G]
+    python run_terminal.py --stats [<sandbox_id>]   # per-agent CPU and memory
 
 Requirements:
     - pip install daytona-sdk python-dotenv
@@ -14,18 +16,37 @@ Requirements:
 
 import os
 import sys
-import time
 import argparse
 import webbrowser
+
+from core.readiness import (
+    poll_until, tmux_panes, capture_pane, session_command_output, ReadinessFailed
+)
+from core.repo import clone_repo, add_clone_arguments, clone_options, format_bytes, transfer_summary
+from core.logs import LogStream, echo_stream, run_streamed, tail_session_command
+from core.agents import upload_agent_limits, agent_setup_commands, agent_stats
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Windows created by start_opencode.sh after the agent windows
+TMUX_WINDOWS = ("shell", "git")
+
 
-def create_terminal_sandbox(repo_url: str = None, keep_alive: bool = False):
+def create_terminal_sandbox(repo_url: str = None, keep_alive: bool = False, clone: dict = None,
+                            quiet: bool = False, agents: int = 1, agent_cpus: float = None,
+                            agent_memory: str = None):
     """
     Create a Daytona sandbox with TMUX and OpenCode ready to use.
+
+    clone holds options for core.repo.clone_repo (depth, blobless, sparse, ...).
+    Command output is printed live unless quiet is set.
+
+    agents OpenCode agents are packed into the sandbox, each in its own
+    window and working directory, capped at agent_cpus CPUs (default: an
+    even share) and agent_memory (e.g. "1G") - see core/agents.py.
     """
+    echo = None if quiet else print
     try:
         from daytona_sdk import Daytona, DaytonaConfig
     except ImportError:
@@ -51,13 +72,10 @@ def create_terminal_sandbox(repo_url: str = None, keep_alive: bool = False):
 
     # Install tmux and OpenCode
     print("Installing tmux...")
-    sandbox.process.exec("apt-get update && apt-get install -y tmux", timeout=120)
+    run_streamed(sandbox, "apt-get update && apt-get install -y tmux", timeout=120, echo=echo)
 
     print("Installing OpenCode...")
-    result = sandbox.process.exec(
-        "curl -fsSL https://opencode.ai/install | bash",
-        timeout=120
-    )
+    run_streamed(sandbox, "curl -fsSL https://opencode.ai/install | bash", timeout=120, echo=echo)
 
     # Add to PATH
     sandbox.process.exec(
@@ -68,10 +86,11 @@ def create_terminal_sandbox(repo_url: str = None, keep_alive: bool = False):
     # Clone repo if provided
     if repo_url:
         print(f"Cloning repository: {repo_url}")
-        sandbox.process.exec(
-            f"cd /home/daytona && git clone {repo_url} project",
-            timeout=300
-        )
+        stats = clone_repo(sandbox, repo_url, **(clone or {}))
+        if stats["exit_code"] != 0:
+            print(f"Warning: Git clone returned code {stats['exit_code']}")
+        else:
+            print(f"Cloned via {stats['method']} in {stats['seconds']}s ({transfer_summary(stats)})")
         workdir = "/home/daytona/project"
     else:
         workdir = "/home/daytona"
@@ -107,25 +126,32 @@ setw -g pane-base-index 1
         tmux_conf.encode()
     )
 
+    upload_agent_limits(sandbox)
+    windows, agent_lines = agent_setup_commands(workdir, agents, agent_cpus, agent_memory)
+    agent_setup = "\n".join(agent_lines)
+    window_help = "\n".join(
+        f'echo "    {i}. {name:<8} - OpenCode TUI"' for i, name in enumerate(windows, 1)
+    )
+
     # Create a startup script
     startup_script = f"""#!/bin/bash
 export PATH=$HOME/.local/bin:$PATH
 cd {workdir}
 
-# Create tmux session with multiple windows
-tmux new-session -d -s main -n opencode
-tmux send-keys -t main:opencode 'cd {workdir} && opencode' Enter
+# Create tmux session with multiple windows, one per agent first
+tmux new-session -d -s main -n {windows[0]}
+{agent_setup}
 
-# Create a second window for shell
+# Then a window for shell
 tmux new-window -t main -n shell
 tmux send-keys -t main:shell 'cd {workdir}' Enter
 
-# Create third window for git/misc
+# And one for git/misc
 tmux new-window -t main -n git
 tmux send-keys -t main:git 'cd {workdir} && git status 2>/dev/null || echo "Not a git repo"' Enter
 
-# Go back to opencode window
-tmux select-window -t main:opencode
+# Go back to the first agent window
+tmux select-window -t main:{windows[0]}
 
 echo ""
 echo "============================================"
@@ -135,14 +161,14 @@ echo ""
 echo "  Attach with: tmux attach -t main"
 echo ""
 echo "  Windows:"
-echo "    1. opencode - OpenCode TUI"
-echo "    2. shell    - General shell"
-echo "    3. git      - Git operations"
+{window_help}
+echo "    {len(windows) + 1}. shell    - General shell"
+echo "    {len(windows) + 2}. git      - Git operations"
 echo ""
 echo "  TMUX shortcuts (prefix is Ctrl+A):"
 echo "    Ctrl+A |   - Split vertical"
 echo "    Ctrl+A -   - Split horizontal"
-echo "    Ctrl+A 1/2/3 - Switch windows"
+echo "    Ctrl+A 1/2/3... - Switch windows"
 echo "    Ctrl+A d   - Detach"
 echo ""
 echo "============================================"
@@ -156,16 +182,32 @@ echo "============================================"
 
     # Run the startup script to create tmux session
     sandbox.process.create_session("tmux-setup")
-    sandbox.process.execute_session_command(
+    command = sandbox.process.execute_session_command(
         "tmux-setup",
         "bash /home/daytona/start_opencode.sh",
         var_async=True
     )
 
-    time.sleep(3)
+    cmd_id = getattr(command, "cmd_id", None)
+    if echo and cmd_id:
+        setup_log = LogStream("tmux-setup")
+        echo_stream(setup_log, echo)
+        tail_session_command(sandbox, "tmux-setup", cmd_id, setup_log)
+
+    # Return as soon as every window is live and OpenCode is running
+    print("Waiting for tmux session...")
+    try:
+        ready_seconds = wait_for_tmux(sandbox, "tmux-setup", cmd_id, windows)
+    except (ReadinessFailed, TimeoutError) as e:
+        print(f"Error: tmux session did not come up: {e}")
+        sys.exit(1)
+    print(f"tmux session ready after {ready_seconds:.1f}s")
 
     # Get terminal URL
     terminal_url = sandbox.get_preview_link(22222)
+    window_list = "\n".join(
+        f"    [{i}] {name:<8} - OpenCode TUI (coding agent)" for i, name in enumerate(windows, 1)
+    )
 
     # Print results
     print("\n" + "=" * 60)
@@ -178,12 +220,12 @@ echo "============================================"
 
     tmux attach -t main
 
-  This gives you 3 windows:
-    [1] opencode - OpenCode TUI (coding agent)
-    [2] shell    - General terminal
-    [3] git      - Git operations
+  This gives you {len(windows) + 2} windows:
+{window_list}
+    [{len(windows) + 1}] shell    - General terminal
+    [{len(windows) + 2}] git      - Git operations
 
-  Switch windows: Ctrl+A then 1, 2, or 3
+  Switch windows: Ctrl+A then the window number
   Split pane:     Ctrl+A then | or -
   Detach:         Ctrl+A then d
 
@@ -199,10 +241,102 @@ echo "============================================"
     return {
         "sandbox_id": sandbox.id,
         "terminal_url": terminal_url,
-        "workdir": workdir
+        "workdir": workdir,
+        "agents": agents,
+        "ready_seconds": round(ready_seconds, 1)
     }
 
 
+def wait_for_tmux(sandbox, setup_session, cmd_id=None, agent_windows=("opencode",), timeout=60):
+    """
+    Poll until tmux session 'main' has the agent windows and TMUX_WINDOWS
+    and every agent pane is running OpenCode. Returns seconds waited.
+
+    Fails fast (ReadinessFailed, with pane or script output) if the startup
+    script exits without creating the session, a pane dies, or OpenCode
+    starts and then exits back to the shell.
+    """
+    started = set()
+
+    def check():
+        panes = tmux_panes(sandbox, "main")
+        if panes is None:
+            exit_code = None
+            if cmd_id:
+                exit_code = getattr(
+                    sandbox.process.get_session_command(setup_session, cmd_id), "exit_code", None
+                )
+            if exit_code is not None:
+                raise ReadinessFailed(
+                    f"startup script exited ({exit_code}) without a tmux session:\n"
+                    f"{session_command_output(sandbox, setup_session, cmd_id)}"
+                )
+            return False
+
+        dead = [name for name, (_, is_dead) in panes.items() if is_dead]
+        if dead:
+            raise ReadinessFailed(
+                f"window {dead[0]} died:\n{capture_pane(sandbox, f'main:{dead[0]}')}"
+            )
+
+        for name in agent_windows:
+            command = panes.get(name, ("", False))[0]
+            if "opencode" in command:
+                started.add(name)
+            elif name in started:
+                raise ReadinessFailed(
+                    f"OpenCode exited in {name}:\n{capture_pane(sandbox, f'main:{name}')}"
+                )
+        return len(started) == len(agent_windows) and all(name in panes for name in TMUX_WINDOWS)
+
+    try:
+        _, waited = poll_until(check, timeout=timeout, interval=0.25, backoff=1.5, max_interval=2)
+    except TimeoutError as e:
+        waiting = next((name for name in agent_windows if name not in started), agent_windows[0])
+        raise TimeoutError(f"{e}\n{capture_pane(sandbox, f'main:{waiting}')}") from None
+    return waited
+
+
+def print_agent_stats(sandbox_id: str = None):
+    """Print per-agent CPU time and memory for a running sandbox"""
+    try:
+        from daytona_sdk import Daytona, DaytonaConfig
+    except ImportError:
+        print("Error: daytona-sdk not installed. Run: pip install daytona-sdk")
+        sys.exit(1)
+
+    api_key = os.getenv("DAYTONA_API_KEY")
+    if not api_key:
+        print("Error: DAYTONA_API_KEY not found in environment")
+        sys.exit(1)
+
+    if not sandbox_id:
+        try:
+            with open("sandbox_info.txt", "r") as f:
+                for line in f:
+                    if line.startswith("Sandbox ID:"):
+                        sandbox_id = line.split(":")[1].strip()
+                        break
+        except FileNotFoundError:
+            print("Error: No sandbox_id provided and sandbox_info.txt not found")
+            sys.exit(1)
+
+    sandbox = Daytona(DaytonaConfig(api_key=api_key)).get(sandbox_id)
+    try:
+        stats = agent_stats(sandbox)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"{'Agent':<10} {'Caps':<8} {'CPU s':>8} {'Memory':>10} {'Procs':>6}")
+    for name, agent in stats.items():
+        print(f"{name:<10} {agent['limits']:<8} {agent['cpu_seconds']:>8} "
+              f"{format_bytes(agent['memory_bytes']):>10} {agent['processes']:>6}")
+    total_cpu = sum(agent["cpu_seconds"] for agent in stats.values())
+    total_memory = sum(agent["memory_bytes"] for agent in stats.values())
+    print(f"{'total':<10} {'':<8} {round(total_cpu, 1):>8} {format_bytes(total_memory):>10}")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Run OpenCode in Daytona with TMUX (web terminal)"
@@ -221,12 +355,52 @@ def main():
         action="store_true",
         help="Automatically open terminal in browser"
     )
+    parser.add_argument(
+        "--quiet", "-q",
+        action="store_true",
+        help="Don't print command output live"
+    )
+    parser.add_argument(
+        "--agents", "-n",
+        type=int,
+        default=1,
+        help="Number of OpenCode agents to pack into the sandbox"
+    )
+    parser.add_argument(
+        "--agent-cpus",
+        type=float,
+        help="CPU cap per agent, e.g. 0.5 (default: an even share)"
+    )
+    parser.add_argument(
+        "--agent-memory",
+        help="Memory cap per agent, e.g. 1G (needs cgroup v2)"
+    )
+    parser.add_argument(
+        "--stats",
+        nargs="?",
+        const="",
+        metavar="SANDBOX_ID",
+        help="Print per-agent CPU and memory for a running sandbox and exit"
+    )
+    add_clone_arguments(parser)
 
     args = parser.parse_args()
 
+    if args.stats is not None:
+        print_agent_stats(args.stats or None)
+        return
+
+    if args.agents < 1:
+        parser.error("--agents must be at least 1")
+
     result = create_terminal_sandbox(
         repo_url=args.repo,
-        keep_alive=args.keep_alive
+        keep_alive=args.keep_alive,
+        clone=clone_options(args),
+        quiet=args.quiet,
+        agents=args.agents,
+        agent_cpus=args.agent_cpus,
+        agent_memory=args.agent_memory
     )
 
     # Save info
@@ -234,6 +408,7 @@ def main():
         f.write(f"Sandbox ID: {result['sandbox_id']}\n")
         f.write(f"Terminal URL: {result['terminal_url']}\n")
         f.write(f"Workspace: {result['workdir']}\n")
+        f.write(f"Agents: {result['agents']}\n")
 
     print("\nSaved to sandbox_info.txt")
 
@@ -4,17 +4,23 @@ Stop a running Daytona sandbox.
 Usage:
     python stop_sandbox.py <sandbox_id>
     python stop_sandbox.py  # reads from sandbox_info.txt
+    python stop_sandbox.py <sandbox_id> --park     # stop but keep the disk
+    python stop_sandbox.py <sandbox_id> --archive  # park in archive storage
+
+Parked sandboxes can be resumed from the web UI (POST /api/resume with
+the sandbox_id), which skips the OpenCode install and repo clone.
 """
 
 import os
 import sys
+import argparse
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-def stop_sandbox(sandbox_id: str = None):
-    """Stop a Daytona sandbox."""
+def stop_sandbox(sandbox_id: str = None, park: bool = False, archive: bool = False):
+    """Stop a Daytona sandbox, deleting it unless park or archive is set."""
     try:
         from daytona_sdk import Daytona, DaytonaConfig
     except ImportError:
@@ -49,13 +55,43 @@ def stop_sandbox(sandbox_id: str = None):
     daytona = Daytona(config)
 
     try:
-        daytona.delete(sandbox_id)
-        print("Sandbox stopped and deleted successfully.")
+        if park or archive:
+            sandbox = daytona.get(sandbox_id)
+            sandbox.stop()
+            if archive:
+                sandbox.archive()
+                print("Sandbox stopped and archived (disk kept).")
+            else:
+                print("Sandbox stopped (disk kept).")
+        else:
+            daytona.delete(sandbox_id)
+            print("Sandbox stopped and deleted successfully.")
     except Exception as e:
         print(f"Error stopping sandbox: {e}")
         sys.exit(1)
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Stop a Daytona sandbox")
+    parser.add_argument(
+        "sandbox_id",
+        nargs="?",
+        help="Sandbox ID (default: read from sandbox_info.txt)"
+    )
+    parser.add_argument(
+        "--park", "-p",
+        action="store_true",
+        help="Stop the sandbox but keep its disk for a fast resume"
+    )
+    parser.add_argument(
+        "--archive", "-a",
+        action="store_true",
+        help="Like --park, but move the disk to cheaper archive storage"
+    )
+
+    args = parser.parse_args()
+    stop_sandbox(args.sandbox_id, park=args.park, archive=args.archive)
+
+
 if __name__ == "__main__":
-    sandbox_id = sys.argv[1] if len(sys.argv) > 1 else None
-    stop_sandbox(sandbox_id)
+    main()
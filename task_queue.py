@@ -0,0 +1,226 @@
+"""
+Task Queue for OpenCode on Daytona
+
+Queue coding or computer-use tasks on disk, then run them unattended on a
+pool of sandboxes, each running one or more OpenCode agents.
+
+Usage:
+    python task_queue.py add "Fix the flaky test" [--repo <git-url>] [--priority 5]
+                             [--kind coding|computer] [--attempts 3] [--timeout 1800]
+    python task_queue.py add --file prompts.txt [--repo <git-url>]   # one task per line
+    python task_queue.py run [--pool 3] [--slots 2] [--max-running 4] [--keep]
+    python task_queue.py stats [--json]
+    python task_queue.py list [--status failed]
+
+The queue lives in task_queue.db (TASK_QUEUE_DB). run creates the pool,
+works through the queue and deletes the sandboxes again unless --keep is
+given; kept sandboxes are reused by the next run.
+
+Requirements:
+    - pip install daytona python-dotenv
+    - DAYTONA_API_KEY in .env file
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from core.logs import run_streamed
+from core.task_queue import TaskQueue, Scheduler, KINDS, format_stats
+
+load_dotenv()
+
+
+def get_daytona():
+    try:
+        from daytona import Daytona, DaytonaConfig
+    except ImportError:
+        print("Error: daytona not installed. Run: pip install daytona")
+        sys.exit(1)
+
+    api_key = os.getenv("DAYTONA_API_KEY")
+    if not api_key:
+        print("Error: DAYTONA_API_KEY not found in environment")
+        print("Get your API key from: https://app.daytona.io")
+        sys.exit(1)
+
+    config = DaytonaConfig(
+        api_key=api_key,
+        api_url=os.getenv("DAYTONA_API_URL", "https://app.daytona.io/api"),
+        target=os.getenv("DAYTONA_TARGET", "us")
+    )
+    return Daytona(config)
+
+
+def create_pool_sandbox(daytona):
+    """Create a sandbox with OpenCode installed, passing on the LLM API key"""
+    from daytona import CreateSandboxBaseParams
+
+    env_vars = {}
+    if os.getenv("ANTHROPIC_API_KEY"):
+        env_vars["ANTHROPIC_API_KEY"] = os.getenv("ANTHROPIC_API_KEY")
+
+    sandbox = daytona.create(CreateSandboxBaseParams(public=True, env_vars=env_vars))
+    exit_code, output = run_streamed(
+        sandbox, "curl -fsSL https://opencode.ai/install | bash", session_id="setup", timeout=180
+    )
+    if exit_code != 0:
+        daytona.delete(sandbox)
+        raise Exception(f"OpenCode install failed: {output[-500:]}")
+    print(f"  Sandbox ready: {sandbox.id}")
+    return sandbox
+
+
+def get_pool(daytona, queue, size):
+    """Reuse sandboxes kept by an earlier run, then create the rest in parallel"""
+    pool = []
+    for sandbox_id in queue.pool():
+        if len(pool) == size:
+            break
+        try:
+            sandbox = daytona.get(sandbox_id)
+            if sandbox.state != "started":
+                sandbox.start()
+            pool.append(sandbox)
+            print(f"  Reusing sandbox: {sandbox_id}")
+        except Exception as e:
+            print(f"  Dropping sandbox {sandbox_id} from the pool: {e}")
+            queue.remove_from_pool(sandbox_id)
+
+    missing = size - len(pool)
+    if missing:
+        print(f"Creating {missing} sandbox(es)...")
+        with ThreadPoolExecutor(max_workers=missing) as executor:
+            futures = [executor.submit(create_pool_sandbox, daytona) for _ in range(missing)]
+            for future in futures:
+                try:
+                    sandbox = future.result()
+                except Exception as e:
+                    print(f"  Warning: {e}")
+                    continue
+                queue.add_to_pool(sandbox.id)
+                pool.append(sandbox)
+    return pool
+
+
+def cmd_add(queue, args):
+    prompts = [args.prompt] if args.prompt else []
+    if args.file:
+        with open(args.file) as f:
+            prompts += [line.strip() for line in f if line.strip()]
+    if not prompts:
+        print("Error: give a prompt or --file")
+        sys.exit(1)
+
+    for prompt in prompts:
+        task_id = queue.add(
+            prompt, kind=args.kind, priority=args.priority, repo_url=args.repo,
+            max_attempts=args.attempts, timeout=args.timeout
+        )
+        print(f"Queued task {task_id}: {prompt[:60]}")
+    print(f"Queue depth: {queue.stats()['depth']}")
+
+
+def cmd_run(queue, args):
+    if queue.pending() == 0 and not args.forever:
+        print("Nothing queued.")
+        return
+
+    daytona = get_daytona()
+    pool = get_pool(daytona, queue, args.pool)
+    if not pool:
+        print("Error: no sandboxes available")
+        sys.exit(1)
+
+    slots = len(pool) * args.slots
+    print(f"Running with {len(pool)} sandbox(es), {slots} slot(s), "
+          f"max {args.max_running or slots} at once")
+    scheduler = Scheduler(
+        queue, pool, slots_per_sandbox=args.slots, max_running=args.max_running
+    )
+    try:
+        stats = scheduler.run(until_empty=not args.forever, report_every=args.report)
+    finally:
+        if not args.keep:
+            print("Deleting pool sandboxes (use --keep to reuse them)...")
+            for sandbox in pool:
+                try:
+                    daytona.delete(sandbox)
+                    queue.remove_from_pool(sandbox.id)
+                except Exception as e:
+                    print(f"  Warning: could not delete {sandbox.id}: {e}")
+
+    print("\n" + "=" * 60)
+    print(format_stats(stats))
+    print("=" * 60)
+
+
+def cmd_stats(queue, args):
+    stats = queue.stats()
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+    counts = stats["counts"]
+    wait = stats["wait_seconds"]
+    print(f"Queue depth:   {stats['depth']} "
+          f"(queued {counts['queued']}, claimed {counts['assigned']})")
+    print(f"Running:       {counts['running']}")
+    print(f"Done / failed: {counts['done']} / {counts['failed']}")
+    print(f"Wait (s):      avg {wait['avg']}  p50 {wait['p50']}  max {wait['max']}  "
+          f"oldest queued {wait['oldest_queued']}")
+    print(f"Run (s):       avg {stats['run_seconds_avg']}")
+    print(f"Throughput:    {stats['throughput_per_hour']} tasks/hour (last 10 min)")
+    print(f"Pool:          {len(queue.pool())} kept sandbox(es)")
+
+
+def cmd_list(queue, args):
+    for task in queue.list(args.status, args.limit):
+        print(f"{task['id']:>5}  {task['status']:<8} p{task['priority']:<3} {task['kind']:<8} "
+              f"{task['attempts']}/{task['max_attempts']}  {task['prompt'][:60]}")
+        if args.status == "failed" and task["error"]:
+            print(f"       {task['error'].strip().splitlines()[-1][:100]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue OpenCode tasks and run them on a sandbox pool")
+    parser.add_argument("--db", help="Queue database (default: task_queue.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Queue tasks")
+    add.add_argument("prompt", nargs="?", help="Task for OpenCode")
+    add.add_argument("--file", "-f", help="Queue one task per line of this file")
+    add.add_argument("--repo", "-r", help="Git repository to clone for the task")
+    add.add_argument("--kind", choices=KINDS, default="coding",
+                     help="computer tasks get the sandbox desktop and control tools")
+    add.add_argument("--priority", "-p", type=int, default=0, help="Higher runs first")
+    add.add_argument("--attempts", type=int, default=3, help="Tries before giving up")
+    add.add_argument("--timeout", type=int, default=1800, help="Seconds per attempt")
+
+    run = commands.add_parser("run", help="Run queued tasks on a sandbox pool")
+    run.add_argument("--pool", type=int, default=2, help="Number of sandboxes")
+    run.add_argument("--slots", type=int, default=1, help="Agents per sandbox")
+    run.add_argument("--max-running", type=int, help="Cap on tasks running at once")
+    run.add_argument("--keep", "-k", action="store_true",
+                     help="Keep the sandboxes for the next run")
+    run.add_argument("--forever", action="store_true",
+                     help="Keep waiting for new tasks instead of stopping when the queue is empty")
+    run.add_argument("--report", type=int, default=60, help="Seconds between progress lines")
+
+    stats = commands.add_parser("stats", help="Show queue depth, wait time and throughput")
+    stats.add_argument("--json", action="store_true")
+
+    listing = commands.add_parser("list", help="List tasks")
+    listing.add_argument("--status", choices=["queued", "assigned", "running", "done", "failed"])
+    listing.add_argument("--limit", type=int, default=50)
+
+    args = parser.parse_args()
+    queue = TaskQueue(args.db) if args.db else TaskQueue()
+
+    {"add": cmd_add, "run": cmd_run, "stats": cmd_stats, "list": cmd_list}[args.command](queue, args)
+
+
+if __name__ == "__main__":
+    main()
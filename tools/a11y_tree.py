@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Dump the accessibility tree of the focused window as compact JSON.
+
+Many steps only need the text and the clickable elements, not pixels; this
+is a few KB instead of a screenshot and much cheaper for a model to read.
+
+Usage:
+    ./a11y_tree.py [--app firefox] [--max-elements 400] [--max-depth 40]
+                   [--all] [--text-chars 2000]
+
+Prints one JSON object:
+    {"app": "Firefox", "window": "Quiz - Mozilla Firefox", "count": 42,
+     "truncated": false, "ms": 85.3,
+     "elements": [{"role": "push button", "name": "Next", "box": [x, y, w, h]}, ...]}
+
+Boxes are screen coordinates, so the centre of a box can go straight to
+click.sh. Only showing elements that have a name or are interactive are
+listed unless --all is given. Text widgets (e.g. a terminal) also carry a
+"text" field with up to --text-chars of their contents.
+
+Firefox only exposes its tree when started with GNOME_ACCESSIBILITY=1.
+Requires: apt-get install python3-pyatspi at-spi2-core
+"""
+
+import sys
+import json
+import time
+import argparse
+
+try:
+    import pyatspi
+except ImportError:
+    print(json.dumps({"error": "pyatspi not installed. Run: apt-get install python3-pyatspi at-spi2-core"}))
+    sys.exit(1)
+
+# Roles worth listing even when they have no name
+INTERACTIVE_ROLES = {
+    "push button", "toggle button", "check box", "radio button", "link",
+    "entry", "password text", "combo box", "menu item", "page tab",
+    "list item", "slider", "spin button", "terminal", "text"
+}
+TEXT_ROLES = {"terminal", "text", "entry", "paragraph"}
+
+
+def find_window(app_name=None):
+    """Return (application, window) for the active window, or of app_name"""
+    desktop = pyatspi.Registry.getDesktop(0)
+    fallback = None
+    for app in desktop:
+        if app is None:
+            continue
+        if app_name and app_name.lower() not in (app.name or "").lower():
+            continue
+        for window in app:
+            if window is None:
+                continue
+            if window.getState().contains(pyatspi.STATE_ACTIVE):
+                return app, window
+            if app_name and fallback is None:
+                fallback = (app, window)
+    if fallback:
+        return fallback
+    raise RuntimeError(f"no active window{' for ' + app_name if app_name else ''}")
+
+
+def bounding_box(node):
+    try:
+        extents = node.queryComponent().getExtents(pyatspi.DESKTOP_COORDS)
+    except NotImplementedError:
+        return None
+    return [extents.x, extents.y, extents.width, extents.height]
+
+
+def node_text(node, limit):
+    """Return the last `limit` characters of a text widget, or None"""
+    try:
+        text = node.queryText()
+    except NotImplementedError:
+        return None
+    count = text.characterCount
+    if not count:
+        return None
+    return text.getText(max(0, count - limit), count)
+
+
+def walk(root, max_elements=400, max_depth=40, include_all=False, text_chars=2000):
+    """Collect visible elements depth-first; returns (elements, truncated)"""
+    elements = []
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node is None:
+            continue
+        state = node.getState()
+        if not state.contains(pyatspi.STATE_SHOWING):
+            continue
+
+        role = node.getRoleName()
+        name = (node.name or "").strip()
+        if include_all or name or role in INTERACTIVE_ROLES:
+            box = bounding_box(node)
+            if box and box[2] > 0 and box[3] > 0:
+                element = {"role": role, "name": name, "box": box}
+                if state.contains(pyatspi.STATE_FOCUSED):
+                    element["focused"] = True
+                if role in TEXT_ROLES and text_chars:
+                    text = node_text(node, text_chars)
+                    if text and text != name:
+                        element["text"] = text
+                elements.append(element)
+                if len(elements) >= max_elements:
+                    return elements, True
+
+        if depth < max_depth:
+            # Reversed so children come out in document order
+            for i in range(node.childCount - 1, -1, -1):
+                stack.append((node.getChildAtIndex(i), depth + 1))
+    return elements, False
+
+
+def dump(app_name=None, max_elements=400, max_depth=40, include_all=False, text_chars=2000):
+    start = time.perf_counter()
+    app, window = find_window(app_name)
+    elements, truncated = walk(window, max_elements, max_depth, include_all, text_chars)
+    return {
+        "app": app.name,
+        "window": window.name,
+        "count": len(elements),
+        "truncated": truncated,
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+        "elements": elements
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dump the focused window's accessibility tree")
+    parser.add_argument("--app", help="application name to use instead of the active window")
+    parser.add_argument("--max-elements", type=int, default=400)
+    parser.add_argument("--max-depth", type=int, default=40)
+    parser.add_argument("--all", action="store_true", help="include unnamed, non-interactive nodes")
+    parser.add_argument("--text-chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    try:
+        tree = dump(args.app, args.max_elements, args.max_depth, args.all, args.text_chars)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+    print(json.dumps(tree, separators=(",", ":"), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Run an ordered list of input actions in one call.
+
+Usage:
+    ./batch.py '[{"action": "click", "x": 500, "y": 300},
+                 {"action": "type", "text": "hello"},
+                 {"action": "text", "text": "a long prompt ..."},
+                 {"action": "key", "keys": "ctrl+m"},
+                 {"action": "scroll", "direction": "down", "amount": 3},
+                 {"action": "wait", "ms": 500},
+                 {"action": "settle", "stable_ms": 300, "timeout_ms": 5000}]'
+                [--screenshot] [--keep-going]
+
+The actions go to input_daemon.py over one socket connection (falling back
+to xdotool if it is not running). "text" pastes long strings through the
+clipboard and types short ones; its result records the path taken. Prints one JSON result with per-action
+timing and, with --screenshot, an image taken after the last action.
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import subprocess
+
+SOCKET_PATH = os.getenv("INPUTD_SOCKET", "/tmp/inputd.sock")
+DISPLAY = os.getenv("DISPLAY", ":1")
+
+
+class NotSent(Exception):
+    """The action failed before any of its input could reach the display"""
+
+
+class DaemonClient:
+    """One connection to input_daemon.py for the whole batch"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(SOCKET_PATH)
+        self.reader = self.sock.makefile("rb")
+
+    def send(self, action):
+        try:
+            self.sock.sendall((to_command(action) + "\n").encode())
+        except (OSError, ValueError) as e:
+            raise NotSent(str(e))
+        reply = self.reader.readline().decode().strip()
+        if not reply.startswith("ok"):
+            raise RuntimeError(reply or "input daemon closed the connection")
+        # "ok <micros> paste" -> "paste"; other commands have no path
+        parts = reply.split()
+        return parts[2] if len(parts) > 2 else None
+
+    def close(self):
+        self.sock.close()
+
+
+class XdotoolClient:
+    """Fallback used when the daemon is not running"""
+
+    def send(self, action):
+        kind = action.get("action")
+        if kind == "click":
+            cmd = ["mousemove", str(action["x"]), str(action["y"]),
+                   "click", str(action.get("button", 1))]
+        elif kind == "key":
+            cmd = ["key", action["keys"]]
+        elif kind in ("type", "text"):
+            cmd = ["type", "--delay", "50", action["text"]]
+        elif kind == "scroll":
+            button = "4" if action.get("direction", "down") == "up" else "5"
+            cmd = ["click", "--repeat", str(action.get("amount", 3)), "--delay", "50", button]
+        else:
+            raise NotSent(f"unknown action: {kind}")
+        try:
+            subprocess.run(["xdotool", *cmd], check=True, env={**os.environ, "DISPLAY": DISPLAY})
+        except FileNotFoundError:
+            raise NotSent("xdotool is not installed")
+        return "type" if kind == "text" else None
+
+    def close(self):
+        pass
+
+
+def escape(text):
+    """Escape text so it fits on one protocol line (see input_daemon.py)"""
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace("\t", "\\t")
+
+
+def to_command(action):
+    """Translate one action dict into an input daemon command line"""
+    kind = action.get("action")
+    if kind == "click":
+        return f"click {int(action['x'])} {int(action['y'])} {int(action.get('button', 1))}"
+    if kind in ("type", "text"):
+        return f"{kind} {escape(action['text'])}"
+    if kind == "key":
+        return f"key {action['keys']}"
+    if kind == "scroll":
+        return f"scroll {action.get('direction', 'down')} {int(action.get('amount', 3))}"
+    raise ValueError(f"unknown action: {kind}")
+
+
+def settle(action):
+    """
+    Wait until the screen stops changing (see wait_screen.py). Like the
+    fixed wait it replaces, running out of time is not an error: returns
+    whether the screen settled. Without mss, just waits timeout_ms.
+    """
+    timeout = action.get("timeout_ms", 5000) / 1000
+    try:
+        from wait_screen import wait_screen
+    except ImportError:
+        time.sleep(timeout)
+        return False
+
+    result = wait_screen(
+        "settle",
+        timeout=timeout,
+        stable_ms=action.get("stable_ms", 300),
+        change_timeout=action.get("change_timeout_ms", 1000) / 1000
+    )
+    return result["ok"]
+
+
+def take_screenshot():
+    """Capture the screen and return it as a data URI"""
+    try:
+        from fast_screenshot import capture
+        data, _ = capture("jpeg", quality=70)
+        return "data:image/jpeg;base64," + base64.b64encode(data).decode()
+    except ImportError:
+        pass
+
+    # mss/pillow not installed: fall back to a scrot PNG
+    path = f"/tmp/batch_{os.getpid()}.png"
+    subprocess.run(["scrot", "-o", path], check=True, env={**os.environ, "DISPLAY": DISPLAY})
+    try:
+        with open(path, "rb") as f:
+            return "data:image/png;base64," + base64.b64encode(f.read()).decode()
+    finally:
+        os.unlink(path)
+
+
+def run_batch(actions, screenshot=False, stop_on_error=True):
+    """Run actions in order and return the result dict"""
+    try:
+        client = DaemonClient()
+        via = "daemon"
+    except OSError:
+        client = XdotoolClient()
+        via = "xdotool"
+
+    started = time.perf_counter()
+    results = []
+    ok = True
+
+    try:
+        for action in actions:
+            t0 = time.perf_counter()
+            entry = {"action": action.get("action")}
+            try:
+                if action.get("action") == "wait":
+                    time.sleep(action.get("ms", 0) / 1000)
+                elif action.get("action") == "settle":
+                    entry["settled"] = settle(action)
+                else:
+                    path = client.send(action)
+                    if path:
+                        entry["path"] = path
+                entry["ok"] = True
+            except Exception as e:
+                entry["ok"] = False
+                entry["error"] = str(e)
+                # Whether the action may have had an effect, so callers never repeat input
+                entry["sent"] = action.get("action") not in ("wait", "settle") and not isinstance(e, NotSent)
+                ok = False
+            entry["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            results.append(entry)
+            if not entry["ok"] and stop_on_error:
+                break
+    finally:
+        client.close()
+
+    output = {
+        "ok": ok,
+        "via": via,
+        "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": results
+    }
+
+    if screenshot:
+        t0 = time.perf_counter()
+        try:
+            output["screenshot"] = take_screenshot()
+        except Exception as e:
+            output["screenshot_error"] = str(e)
+        output["screenshot_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+    return output
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    flags = set(sys.argv[1:]) - set(args)
+
+    if not args:
+        print(__doc__.strip())
+        sys.exit(1)
+
+    payload = json.loads(args[0] if args[0] != "-" else sys.stdin.read())
+    # Accept a bare list or {"actions": [...], "screenshot": bool}
+    if isinstance(payload, dict):
+        actions = payload.get("actions", [])
+        screenshot = payload.get("screenshot", False)
+        stop_on_error = payload.get("stop_on_error", True)
+    else:
+        actions, screenshot, stop_on_error = payload, False, True
+
+    result = run_batch(
+        actions,
+        screenshot=screenshot or "--screenshot" in flags,
+        stop_on_error=stop_on_error and "--keep-going" not in flags
+    )
+    print(json.dumps(result))
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
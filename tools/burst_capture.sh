@@ -2,9 +2,29 @@
 # burst_capture.sh - Capture 10 frames at 10fps from X11 display
 # Returns base64-encoded JPEGs for Gemini vision analysis
 # Cost: ~3000 tokens (~$0.0002) per burst
+#
+# Usage: ./burst_capture.sh [FRAME_COUNT] [FPS] [QUALITY]
+#        ./burst_capture.sh --stream [FRAME_COUNT] [FPS] [QUALITY] [DEDUP_THRESHOLD]
+#        ./burst_capture.sh --on-change [damage_capture.py options]
+#
+# --stream emits NDJSON (header, one record per frame as soon as it is
+# encoded, then an end record) and drops near-duplicate frames; see
+# burst_stream.py.
+# --on-change captures only when X reports screen damage, up to --max-fps,
+# and stops after --quiet-ms without changes; see damage_capture.py.
 
 set -e
 
+if [ "$1" = "--stream" ]; then
+  shift
+  exec env DISPLAY="${DISPLAY:-:1}" python3 "$(dirname "$0")/burst_stream.py" "$@"
+fi
+
+if [ "$1" = "--on-change" ]; then
+  shift
+  exec env DISPLAY="${DISPLAY:-:1}" python3 "$(dirname "$0")/damage_capture.py" "$@"
+fi
+
 BURST_DIR="/tmp/burst_$$"
 FRAME_COUNT="${1:-10}"
 FPS="${2:-10}"
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Streaming, deduplicated burst capture.
+
+Pipes ffmpeg's x11grab output as MJPEG straight into this process and emits
+each frame as an NDJSON record as soon as it is encoded, instead of writing
+every frame to disk and printing one big JSON document at the end.
+Near-duplicate frames (dHash Hamming distance <= threshold and similar mean
+brightness compared with the last emitted frame) are dropped.
+
+Usage:
+    ./burst_stream.py [FRAME_COUNT] [FPS] [QUALITY] [THRESHOLD]
+
+Output, one JSON object per line:
+    {"type": "header", "frame_count": 10, "fps": 10, "started_at": 1700000000.0, ...}
+    {"type": "frame", "index": 0, "t": 0.0, "elapsed": 0.12, "hash": "...", "data": "data:image/jpeg;base64,..."}
+    {"type": "end", "captured": 10, "emitted": 3, "dropped": 7, "elapsed": 1.05}
+
+Requires: ffmpeg, pip install pillow
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import base64
+import subprocess
+
+from PIL import Image
+
+DISPLAY = os.getenv("DISPLAY", ":1")
+VIDEO_SIZE = os.getenv("BURST_VIDEO_SIZE", "1024x768")
+
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+
+
+def fingerprint(jpeg, size=8):
+    """
+    Return (dhash, mean_luma) for a JPEG.
+
+    dHash only sees gradients, so a flat screen changing colour keeps the
+    same hash; the mean brightness catches that case.
+    """
+    image = Image.open(io.BytesIO(jpeg))
+    # Let the JPEG decoder downscale for us - much cheaper than a full decode
+    image.draft("L", (size * 8, size * 8))
+    pixels = image.convert("L").resize((size + 1, size), Image.BILINEAR).tobytes()
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits, sum(pixels) / len(pixels)
+
+
+def is_duplicate(a, b, threshold, luma_tolerance=8):
+    """True if two fingerprints are near-identical"""
+    return bin(a[0] ^ b[0]).count("1") <= threshold and abs(a[1] - b[1]) <= luma_tolerance
+
+
+def jpeg_frames(stream, chunk_size=65536):
+    """Split a concatenated MJPEG byte stream into individual JPEGs"""
+    buffer = b""
+    while True:
+        chunk = stream.read1(chunk_size) if hasattr(stream, "read1") else stream.read(chunk_size)
+        if not chunk:
+            return
+        buffer += chunk
+        while True:
+            start = buffer.find(SOI)
+            end = buffer.find(EOI, start + 2) if start >= 0 else -1
+            if end < 0:
+                break
+            yield buffer[start:end + 2]
+            buffer = buffer[end + 2:]
+
+
+def emit(record):
+    sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+
+
+def stream_burst(frame_count=10, fps=10, quality=70, threshold=4):
+    """Capture frame_count frames at fps and stream them as NDJSON"""
+    started_at = time.time()
+    emit({
+        "type": "header",
+        "burst": True,
+        "stream": True,
+        "frame_count": frame_count,
+        "fps": fps,
+        "quality": quality,
+        "dedup_threshold": threshold,
+        "started_at": started_at
+    })
+
+    # Same quality mapping as burst_capture.sh (2-31, lower is better)
+    qscale = max(2, 31 - quality * 31 // 100)
+    ffmpeg = subprocess.Popen(
+        [
+            "ffmpeg", "-loglevel", "error",
+            "-f", "x11grab", "-framerate", str(fps), "-video_size", VIDEO_SIZE,
+            "-i", DISPLAY,
+            "-frames:v", str(frame_count),
+            "-f", "image2pipe", "-c:v", "mjpeg", "-q:v", str(qscale), "-"
+        ],
+        stdout=subprocess.PIPE
+    )
+
+    captured = emitted = 0
+    last = None
+    try:
+        for index, jpeg in enumerate(jpeg_frames(ffmpeg.stdout)):
+            captured += 1
+            current = fingerprint(jpeg)
+            if last is not None and is_duplicate(current, last, threshold):
+                continue
+            last = current
+            emitted += 1
+            emit({
+                "type": "frame",
+                "index": index,
+                "t": round(index / fps, 3),
+                "elapsed": round(time.time() - started_at, 3),
+                "hash": f"{current[0]:016x}",
+                "data": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode()
+            })
+    finally:
+        ffmpeg.stdout.close()
+        ffmpeg.wait()
+
+    emit({
+        "type": "end",
+        "captured": captured,
+        "emitted": emitted,
+        "dropped": captured - emitted,
+        "elapsed": round(time.time() - started_at, 3)
+    })
+
+
+def main():
+    args = [int(a) for a in sys.argv[1:5]]
+    defaults = [10, 10, 70, 4]
+    frame_count, fps, quality, threshold = args + defaults[len(args):]
+    stream_burst(frame_count, fps, quality, threshold)
+
+
+if __name__ == "__main__":
+    main()
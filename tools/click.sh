@@ -13,7 +13,19 @@ if [ -z "$X" ] || [ -z "$Y" ]; then
     exit 1
 fi
 
-DISPLAY=:1 xdotool mousemove "$X" "$Y"
-sleep 0.1
-DISPLAY=:1 xdotool click "$BUTTON"
+source "${0%/*}/inputd.sh" 2>/dev/null || source /home/daytona/tools/inputd.sh
+
+inputd_send "click $X $Y $BUTTON"
+case $? in
+    1)
+        # Daemon not running: fall back to one-shot xdotool
+        DISPLAY=:1 xdotool mousemove "$X" "$Y"
+        sleep 0.1
+        DISPLAY=:1 xdotool click "$BUTTON"
+        ;;
+    2)
+        echo "Error: input daemon failed: ${INPUTD_REPLY:-no reply}"
+        exit 1
+        ;;
+esac
 echo "Clicked at ($X, $Y) with button $BUTTON"
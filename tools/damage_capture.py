@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Change-triggered capture using X DAMAGE events.
+
+Instead of sampling at a fixed FPS, subscribes to damage notifications on
+the root window and captures a frame only when something was drawn. Frames
+are rate-limited to --max-fps, and capture stops once the screen has been
+quiet for --quiet-ms (or after --max-seconds).
+
+Usage:
+    ./damage_capture.py [--max-fps 10] [--quiet-ms 1000] [--max-seconds 10]
+                        [--quality 70] [--scale 1.0]
+
+Output is NDJSON in the same shape as burst_stream.py (header, frame
+records, end record). The end record compares the frames captured with
+what fixed-rate sampling at --max-fps would have taken over the same time.
+Falls back to polling with frame hashing if the X server lacks DAMAGE.
+
+Requires: pip install python-xlib mss pillow
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import argparse
+import select
+
+from Xlib import display
+from Xlib.ext import damage
+
+from fast_screenshot import grab, encode
+
+DISPLAY = os.getenv("DISPLAY", ":1")
+
+
+def emit(record):
+    sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+
+
+class DamageWatcher:
+    """Blocks until the root window is damaged"""
+
+    def __init__(self):
+        self.display = display.Display(DISPLAY)
+        if not self.display.has_extension("DAMAGE"):
+            raise RuntimeError("X server has no DAMAGE extension")
+        self.display.damage_query_version()
+        root = self.display.screen().root
+        self.damage = root.damage_create(damage.DamageReportNonEmpty)
+        self.event_type = self.display.extension_event.DamageNotify
+        self.display.flush()
+
+    def wait(self, timeout):
+        """Return True if damage was reported within timeout seconds"""
+        if not self.display.pending_events():
+            readable, _, _ = select.select([self.display.fileno()], [], [], max(0, timeout))
+            if not readable:
+                return False
+
+        damaged = False
+        for _ in range(self.display.pending_events()):
+            if self.display.next_event().type == self.event_type:
+                damaged = True
+        return damaged
+
+    def reset(self):
+        """Clear accumulated damage so the next change raises a new event"""
+        self.display.damage_subtract(self.damage)
+        self.display.flush()
+
+
+class PollingWatcher:
+    """Fallback: hash a frame every interval and report changes"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.last = None
+
+    def wait(self, timeout):
+        time.sleep(max(0, min(timeout, self.interval)))
+        digest = hashlib.blake2b(grab().tobytes(), digest_size=8).digest()
+        changed = self.last is not None and digest != self.last
+        self.last = digest
+        return changed
+
+    def reset(self):
+        pass
+
+
+def capture_on_change(max_fps=10, quiet_ms=1000, max_seconds=10, quality=70, scale=1.0):
+    """Stream frames as NDJSON whenever the screen changes"""
+    min_gap = 1.0 / max_fps
+    quiet = quiet_ms / 1000
+
+    try:
+        watcher = DamageWatcher()
+        source = "damage"
+    except Exception:
+        watcher = PollingWatcher(min_gap)
+        source = "polling"
+
+    started = time.monotonic()
+    emit({
+        "type": "header",
+        "stream": True,
+        "trigger": source,
+        "max_fps": max_fps,
+        "quiet_ms": quiet_ms,
+        "max_seconds": max_seconds,
+        "started_at": time.time()
+    })
+
+    frames = events = 0
+    last_capture = last_change = None
+    pending = True  # always send the starting frame
+
+    while True:
+        now = time.monotonic()
+        elapsed = now - started
+        if elapsed >= max_seconds:
+            reason = "max_seconds"
+            break
+        if not pending and last_change is not None and now - last_change >= quiet:
+            reason = "quiet"
+            break
+
+        if pending and (last_capture is None or now - last_capture >= min_gap):
+            watcher.reset()
+            data, size = encode(grab(), "jpeg", quality, scale)
+            last_capture = time.monotonic()
+            if last_change is None:
+                last_change = last_capture
+            emit({
+                "type": "frame",
+                "index": frames,
+                "t": round(last_capture - started, 3),
+                "width": size[0],
+                "height": size[1],
+                "data": "data:image/jpeg;base64," + base64.b64encode(data).decode()
+            })
+            frames += 1
+            pending = False
+            continue
+
+        if pending:
+            timeout = min_gap - (now - last_capture)
+        else:
+            timeout = min(quiet - (now - last_change), max_seconds - elapsed)
+
+        if watcher.wait(timeout):
+            events += 1
+            pending = True
+            last_change = time.monotonic()
+
+    duration = time.monotonic() - started
+    fixed_rate = max(1, int(duration * max_fps))
+    emit({
+        "type": "end",
+        "reason": reason,
+        "frames": frames,
+        "change_events": events,
+        "duration": round(duration, 3),
+        "fixed_rate_frames": fixed_rate,
+        "frames_saved": max(0, fixed_rate - frames)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture frames only when the screen changes")
+    parser.add_argument("--max-fps", type=float, default=10)
+    parser.add_argument("--quiet-ms", type=int, default=1000)
+    parser.add_argument("--max-seconds", type=float, default=10)
+    parser.add_argument("--quality", "-q", type=int, default=70)
+    parser.add_argument("--scale", "-s", type=float, default=1.0)
+    args = parser.parse_args()
+
+    capture_on_change(args.max_fps, args.quiet_ms, args.max_seconds, args.quality, args.scale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Differential screenshots: return only the tiles that changed.
+
+Splits the screen into tiles, hashes each one and compares the hashes with
+the previous capture (kept in /tmp). Runs of changed tiles in a row are
+encoded as one rectangle. The first capture, or one whose --base does not
+match the stored frame, is sent as a single full-frame keyframe.
+
+Usage:
+    ./diff_screenshot.py [--base FRAME_ID] [--tile 64] [--format jpeg|webp|png]
+                         [--quality 80]
+
+Prints one JSON object:
+    {"frame_id": 7, "base": 6, "keyframe": false, "width": 1024, "height": 768,
+     "tiles": [{"x": 0, "y": 64, "w": 192, "h": 64, "data": <base64>}, ...],
+     "stats": {"changed_tiles": 3, "total_tiles": 192, "bytes": 5120, ...}}
+
+Pass the returned frame_id as --base next time. core.screen.DiffCompositor
+rebuilds full frames on the client.
+Requires: pip install mss pillow
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import argparse
+
+from fast_screenshot import grab, encode
+
+STATE_FILE = os.getenv("DIFF_SCREEN_STATE", "/tmp/diff_screen_state.json")
+
+
+def tile_hashes(image, tile):
+    """Hash every tile of the image, row-major"""
+    hashes = []
+    for y in range(0, image.height, tile):
+        for x in range(0, image.width, tile):
+            box = (x, y, min(x + tile, image.width), min(y + tile, image.height))
+            hashes.append(hashlib.blake2b(image.crop(box).tobytes(), digest_size=8).hexdigest())
+    return hashes
+
+
+def changed_rects(image, tile, old, new):
+    """Merge horizontally adjacent changed tiles into (x, y, w, h) rects"""
+    cols = (image.width + tile - 1) // tile
+    rects = []
+    for index, (before, after) in enumerate(zip(old, new)):
+        if before == after:
+            continue
+        row, col = divmod(index, cols)
+        x, y = col * tile, row * tile
+        w, h = min(tile, image.width - x), min(tile, image.height - y)
+        last = rects[-1] if rects else None
+        if last and last[1] == y and last[0] + last[2] == x:
+            last[2] += w
+        else:
+            rects.append([x, y, w, h])
+    return rects
+
+
+def load_state():
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(state):
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, STATE_FILE)
+
+
+def diff_capture(base=None, tile=64, fmt="jpeg", quality=80):
+    """Capture, diff against the stored frame and return the payload dict"""
+    t0 = time.perf_counter()
+    image = grab()
+    t1 = time.perf_counter()
+
+    hashes = tile_hashes(image, tile)
+    state = load_state()
+    keyframe = not (
+        state
+        and base is not None
+        and state["frame_id"] == base
+        and state["tile"] == tile
+        and (state["width"], state["height"]) == image.size
+    )
+    if keyframe:
+        rects = [[0, 0, image.width, image.height]]
+    else:
+        rects = changed_rects(image, tile, state["hashes"], hashes)
+    t2 = time.perf_counter()
+
+    tiles = []
+    total_bytes = 0
+    for x, y, w, h in rects:
+        data, _ = encode(image.crop((x, y, x + w, y + h)), fmt, quality)
+        total_bytes += len(data)
+        tiles.append({"x": x, "y": y, "w": w, "h": h, "data": base64.b64encode(data).decode()})
+    t3 = time.perf_counter()
+
+    frame_id = (state["frame_id"] + 1) if state else 1
+    save_state({
+        "frame_id": frame_id,
+        "tile": tile,
+        "width": image.width,
+        "height": image.height,
+        "hashes": hashes
+    })
+
+    return {
+        "frame_id": frame_id,
+        "base": None if keyframe else base,
+        "keyframe": keyframe,
+        "width": image.width,
+        "height": image.height,
+        "tile": tile,
+        "format": fmt,
+        "tiles": tiles,
+        "stats": {
+            "changed_tiles": len(hashes) if keyframe else sum(a != b for a, b in zip(state["hashes"], hashes)),
+            "total_tiles": len(hashes),
+            "rects": len(rects),
+            "bytes": total_bytes,
+            "capture_ms": round((t1 - t0) * 1000, 2),
+            "diff_ms": round((t2 - t1) * 1000, 2),
+            "encode_ms": round((t3 - t2) * 1000, 2),
+            "total_ms": round((t3 - t0) * 1000, 2)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tile-based differential screenshot")
+    parser.add_argument("--base", type=int, help="frame_id the caller already has")
+    parser.add_argument("--tile", type=int, default=64)
+    parser.add_argument("--format", "-f", default="jpeg", choices=["jpeg", "webp", "png"])
+    parser.add_argument("--quality", "-q", type=int, default=80)
+    args = parser.parse_args()
+
+    print(json.dumps(diff_capture(args.base, args.tile, args.format, args.quality)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Fast screenshot capture with JPEG/WebP encoding.
+
+Grabs the screen through MIT-SHM (via mss) instead of scrot's full PNG,
+optionally crops to a region or window and downscales before encoding.
+
+Usage:
+    ./fast_screenshot.py [-o PATH|-] [--format jpeg|webp|png] [--quality 70]
+                         [--scale 0.5] [--region X,Y,W,H] [--window active|ID]
+                         [--base64] [--json]
+
+    -o -        write the encoded image to stdout (default: /tmp/screen.jpg)
+    --base64    write base64 instead of raw bytes
+    --json      print one JSON object: {"image": <base64>, "stats": {...}}
+
+Timing and size stats are printed as JSON on stderr (or inside --json).
+Requires: pip install mss pillow python-xlib
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+
+import mss
+from PIL import Image
+
+DISPLAY = os.getenv("DISPLAY", ":1")
+PIL_FORMATS = {"jpeg": "JPEG", "jpg": "JPEG", "webp": "WEBP", "png": "PNG"}
+
+
+def window_region(window):
+    """Return (x, y, w, h) of the active window or a window id"""
+    from Xlib import display, X
+
+    disp = display.Display(DISPLAY)
+    root = disp.screen().root
+    if window == "active":
+        atom = disp.intern_atom("_NET_ACTIVE_WINDOW")
+        prop = root.get_full_property(atom, X.AnyPropertyType)
+        if not prop or not prop.value[0]:
+            raise ValueError("no active window")
+        win = disp.create_resource_object("window", prop.value[0])
+    else:
+        win = disp.create_resource_object("window", int(window, 0))
+
+    geom = win.get_geometry()
+    pos = win.translate_coords(root, 0, 0)
+    # translate_coords gives root's origin relative to the window
+    return -pos.x, -pos.y, geom.width, geom.height
+
+
+def grab(region=None):
+    """Capture the screen (or a region) and return a PIL RGB image"""
+    with mss.mss(display=DISPLAY) as sct:
+        if region:
+            x, y, w, h = region
+            monitor = {"left": x, "top": y, "width": w, "height": h}
+        else:
+            monitor = sct.monitors[1]
+        shot = sct.grab(monitor)
+    return Image.frombuffer("RGB", shot.size, shot.bgra, "raw", "BGRX", 0, 1)
+
+
+def encode(image, fmt="jpeg", quality=70, scale=1.0):
+    """Downscale and encode an image, returning bytes"""
+    if scale != 1.0:
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.BILINEAR)
+
+    pil_format = PIL_FORMATS[fmt.lower()]
+    if pil_format == "JPEG":
+        options = {"quality": quality}
+    elif pil_format == "WEBP":
+        # method=0 is the fastest WebP encoder setting
+        options = {"quality": quality, "method": 0}
+    else:
+        options = {"compress_level": 1}
+
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue(), image.size
+
+
+def capture(fmt="jpeg", quality=70, scale=1.0, region=None, window=None):
+    """Capture and encode; returns (bytes, stats dict)"""
+    t0 = time.perf_counter()
+    if window:
+        region = window_region(window)
+    image = grab(region)
+    t1 = time.perf_counter()
+    data, size = encode(image, fmt, quality, scale)
+    t2 = time.perf_counter()
+
+    stats = {
+        "format": fmt.lower(),
+        "quality": quality,
+        "width": size[0],
+        "height": size[1],
+        "bytes": len(data),
+        "capture_ms": round((t1 - t0) * 1000, 2),
+        "encode_ms": round((t2 - t1) * 1000, 2),
+        "total_ms": round((t2 - t0) * 1000, 2)
+    }
+    return data, stats
+
+
+def parse_region(value):
+    parts = [int(p) for p in value.split(",")]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("region must be X,Y,W,H")
+    return tuple(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast screenshot capture")
+    parser.add_argument("-o", "--output", default=None)
+    parser.add_argument("--format", "-f", default="jpeg", choices=sorted(PIL_FORMATS))
+    parser.add_argument("--quality", "-q", type=int, default=70)
+    parser.add_argument("--scale", "-s", type=float, default=1.0)
+    parser.add_argument("--region", "-r", type=parse_region)
+    parser.add_argument("--window", "-w")
+    parser.add_argument("--base64", action="store_true")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    data, stats = capture(args.format, args.quality, args.scale, args.region, args.window)
+
+    if args.json:
+        print(json.dumps({"image": base64.b64encode(data).decode(), "stats": stats}))
+        return
+
+    output = args.output or f"/tmp/screen.{stats['format']}"
+    payload = base64.b64encode(data) if args.base64 else data
+    if output == "-":
+        sys.stdout.buffer.write(payload)
+        sys.stdout.flush()
+    else:
+        with open(output, "wb") as f:
+            f.write(payload)
+        stats["output"] = output
+
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Long-lived input daemon for the VNC desktop.
+
+Holds a single X connection and injects mouse/keyboard events through the
+XTEST extension, so each tool call costs one socket round trip instead of
+forking bash + xdotool and opening a fresh X connection.
+
+Usage:
+    DISPLAY=:1 python3 input_daemon.py &
+
+Listens on a Unix socket (for Python clients) and on a loopback TCP port
+(for bash clients via /dev/tcp). One command per line, one reply per line:
+
+    ping                   -> ok <micros>
+    move X Y               -> ok <micros>
+    click X Y [BUTTON]     -> ok <micros>
+    key COMBO              -> ok <micros>      e.g. key ctrl+shift+t
+    type TEXT              -> ok <micros>      \\n, \\t and \\\\ are unescaped
+    text TEXT              -> ok <micros> paste|type
+    scroll up|down [N]     -> ok <micros>
+
+"text" pastes long strings through the clipboard in one keystroke and
+types short ones (or when the focused window never asks for the clipboard
+contents). The reply says which path was taken.
+
+Errors reply with "err <message>". Requires: pip install python-xlib
+"""
+
+import os
+import sys
+import time
+import socket
+import threading
+import socketserver
+
+import Xlib.threaded  # noqa: F401 - the clipboard thread shares the library
+from Xlib import X, XK, Xatom, display
+from Xlib.protocol import event
+from Xlib.ext import xtest
+
+SOCKET_PATH = os.getenv("INPUTD_SOCKET", "/tmp/inputd.sock")
+TCP_PORT = int(os.getenv("INPUTD_PORT", 7707))
+TYPE_DELAY = float(os.getenv("INPUTD_TYPE_DELAY", 0.005))
+
+# Text shorter than this is typed; longer text is pasted
+PASTE_MIN_CHARS = int(os.getenv("INPUTD_PASTE_MIN", 32))
+# How long to wait for the target to fetch the clipboard before typing instead
+PASTE_CONFIRM_TIMEOUT = float(os.getenv("INPUTD_PASTE_TIMEOUT", 1.0))
+# Above this the selection would need the INCR protocol, so just type
+PASTE_MAX_BYTES = 200_000
+# WM_CLASS values that must never receive a paste (comma separated)
+NO_PASTE_CLASSES = {c for c in os.getenv("INPUTD_NO_PASTE", "").lower().split(",") if c}
+
+# Paste shortcut by window class; anything else gets ctrl+v
+PASTE_KEYS = {
+    "xterm": "shift+Insert",
+    "uxterm": "shift+Insert",
+    "xfce4-terminal": "ctrl+shift+v",
+    "gnome-terminal": "ctrl+shift+v",
+    "gnome-terminal-server": "ctrl+shift+v",
+    "konsole": "ctrl+shift+v",
+    "terminator": "ctrl+shift+v",
+    "tilix": "ctrl+shift+v",
+    "alacritty": "ctrl+shift+v",
+    "kitty": "ctrl+shift+v",
+}
+
+MODIFIERS = {
+    "ctrl": "Control_L",
+    "control": "Control_L",
+    "alt": "Alt_L",
+    "shift": "Shift_L",
+    "super": "Super_L",
+    "meta": "Super_L",
+    "win": "Super_L",
+}
+
+# Characters whose keysym is not simply their code point
+SPECIAL_CHARS = {"\n": XK.XK_Return, "\t": XK.XK_Tab}
+
+
+class Keyboard:
+    """XTEST keyboard and mouse on one shared X connection"""
+
+    def __init__(self, disp):
+        self.display = disp
+        self.lock = threading.Lock()
+        self.shift = disp.keysym_to_keycode(XK.XK_Shift_L)
+        self.scratch = self._find_scratch_keycode()
+        self.clipboard = None
+
+    def _find_scratch_keycode(self):
+        """Find an unused keycode to bind keysyms the keymap lacks"""
+        first = self.display.display.info.min_keycode
+        count = self.display.display.info.max_keycode - first + 1
+        mapping = self.display.get_keyboard_mapping(first, count)
+        for offset in range(count - 1, -1, -1):
+            if not any(mapping[offset]):
+                return first + offset
+        return None
+
+    def keycode(self, keysym):
+        """Return (keycode, needs_shift) for a keysym, remapping if needed"""
+        keycode = self.display.keysym_to_keycode(keysym)
+        if keycode:
+            if self.display.keycode_to_keysym(keycode, 0) == keysym:
+                return keycode, False
+            if self.display.keycode_to_keysym(keycode, 1) == keysym:
+                return keycode, True
+            return keycode, False
+
+        if self.scratch is None:
+            raise ValueError(f"no keycode for keysym {keysym:#x}")
+        self.display.change_keyboard_mapping(self.scratch, [(keysym, keysym)])
+        self.display.sync()
+        return self.scratch, False
+
+    def tap(self, keysym, modifiers=()):
+        """Press and release one key with optional modifier keysyms held"""
+        keycode, needs_shift = self.keycode(keysym)
+        held = [self.display.keysym_to_keycode(m) for m in modifiers]
+        if needs_shift and self.shift not in held:
+            held.append(self.shift)
+
+        for mod in held:
+            xtest.fake_input(self.display, X.KeyPress, mod)
+        xtest.fake_input(self.display, X.KeyPress, keycode)
+        xtest.fake_input(self.display, X.KeyRelease, keycode)
+        for mod in reversed(held):
+            xtest.fake_input(self.display, X.KeyRelease, mod)
+        self.display.sync()
+
+    def key(self, combo):
+        """Press a combination like "Return", "ctrl+l" or "alt+Tab" """
+        parts = combo.split("+")
+        modifiers = []
+        for name in parts[:-1]:
+            modifiers.append(XK.string_to_keysym(MODIFIERS.get(name.lower(), name)))
+
+        name = parts[-1]
+        keysym = XK.string_to_keysym(name)
+        if not keysym and len(name) == 1:
+            keysym = char_keysym(name)
+        if not keysym:
+            raise ValueError(f"unknown key: {name}")
+        self.tap(keysym, modifiers)
+
+    def type(self, text):
+        """Type text one character at a time"""
+        for char in text:
+            self.tap(char_keysym(char))
+            if TYPE_DELAY:
+                time.sleep(TYPE_DELAY)
+
+    def active_window_class(self):
+        """Return the lower-cased WM_CLASS of the focused window, or "" """
+        root = self.display.screen().root
+        prop = root.get_full_property(
+            self.display.intern_atom("_NET_ACTIVE_WINDOW"), X.AnyPropertyType
+        )
+        if not prop or not prop.value[0]:
+            return ""
+        win = self.display.create_resource_object("window", prop.value[0])
+        wm_class = win.get_wm_class()
+        return wm_class[1].lower() if wm_class else ""
+
+    def text(self, text):
+        """Paste long text via the clipboard, type short text; returns the path"""
+        if self.clipboard is None or len(text) < PASTE_MIN_CHARS:
+            self.type(text)
+            return "type"
+
+        encoded = len(text.encode("utf-8"))
+        wm_class = self.active_window_class()
+        if encoded > PASTE_MAX_BYTES or wm_class in NO_PASTE_CLASSES:
+            self.type(text)
+            return "type"
+
+        self.clipboard.set_text(text)
+        self.key(PASTE_KEYS.get(wm_class, "ctrl+v"))
+        self.clipboard.served.wait(PASTE_CONFIRM_TIMEOUT)
+        if self.clipboard.withdraw():
+            return "paste"
+
+        # The target never asked for the clipboard, and now never gets it: type
+        self.type(text)
+        return "type"
+
+    def move(self, x, y):
+        xtest.fake_input(self.display, X.MotionNotify, x=x, y=y)
+        self.display.sync()
+
+    def click(self, button, count=1):
+        for _ in range(count):
+            xtest.fake_input(self.display, X.ButtonPress, button)
+            xtest.fake_input(self.display, X.ButtonRelease, button)
+        self.display.sync()
+
+
+class Clipboard:
+    """Owns CLIPBOARD and PRIMARY on its own X connection and serves them"""
+
+    def __init__(self, display_name):
+        self.display = display.Display(display_name)
+        self.window = self.display.screen().root.create_window(0, 0, 1, 1, 0, X.CopyFromParent)
+        self.atoms = {
+            name: self.display.intern_atom(name)
+            for name in ("CLIPBOARD", "PRIMARY", "TARGETS", "UTF8_STRING", "TEXT")
+        }
+        self.data = None
+        self.served = threading.Event()
+        # Guards data, so a late request is either served or refused, never both
+        self.lock = threading.Lock()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def set_text(self, text):
+        """Take ownership of both selections with text as their content"""
+        with self.lock:
+            self.data = text.encode("utf-8")
+            self.served.clear()
+        for name in ("CLIPBOARD", "PRIMARY"):
+            self.window.set_selection_owner(self.atoms[name], X.CurrentTime)
+        self.display.flush()
+
+    def withdraw(self):
+        """
+        Return True if the text was already served. If not, stop serving it:
+        later requests are refused, so the text can be typed without the
+        target also pasting it.
+        """
+        with self.lock:
+            if self.served.is_set():
+                return True
+            self.data = None
+            return False
+
+    def _serve(self):
+        while True:
+            e = self.display.next_event()
+            if e.type == X.SelectionRequest:
+                self._answer(e)
+
+    def _answer(self, request):
+        prop = request.property or request.target
+        text_targets = (self.atoms["UTF8_STRING"], self.atoms["TEXT"], Xatom.STRING)
+
+        if request.target == self.atoms["TARGETS"]:
+            request.requestor.change_property(
+                prop, Xatom.ATOM, 32, [self.atoms["TARGETS"], *text_targets]
+            )
+        elif request.target in text_targets:
+            with self.lock:
+                if self.data is None:
+                    prop = X.NONE
+                else:
+                    request.requestor.change_property(prop, request.target, 8, self.data)
+                    self.served.set()
+        else:
+            prop = X.NONE
+
+        notify = event.SelectionNotify(
+            time=request.time,
+            requestor=request.requestor,
+            selection=request.selection,
+            target=request.target,
+            property=prop
+        )
+        request.requestor.send_event(notify)
+        self.display.flush()
+
+
+def char_keysym(char):
+    """Map a character to its X keysym"""
+    if char in SPECIAL_CHARS:
+        return SPECIAL_CHARS[char]
+    code = ord(char)
+    # Latin-1 keysyms equal their code point; the rest use the Unicode range
+    return code if code < 0x100 else 0x01000000 | code
+
+
+def unescape(text):
+    """Decode the \\n, \\t and \\\\ escapes used to keep commands on one line"""
+    out = []
+    chars = iter(text)
+    for char in chars:
+        if char == "\\":
+            nxt = next(chars, "\\")
+            out.append({"n": "\n", "t": "\t"}.get(nxt, nxt))
+        else:
+            out.append(char)
+    return "".join(out)
+
+
+def run_command(kb, line):
+    """Execute one protocol line and return the reply"""
+    verb, _, rest = line.partition(" ")
+    args = rest.split()
+    start = time.perf_counter()
+    suffix = ""
+
+    try:
+        with kb.lock:
+            if verb == "ping":
+                pass
+            elif verb == "move":
+                kb.move(int(args[0]), int(args[1]))
+            elif verb == "click":
+                kb.move(int(args[0]), int(args[1]))
+                kb.click(int(args[2]) if len(args) > 2 else 1)
+            elif verb == "key":
+                kb.key(args[0])
+            elif verb == "type":
+                kb.type(unescape(rest))
+            elif verb == "text":
+                suffix = " " + kb.text(unescape(rest))
+            elif verb == "scroll":
+                button = {"up": 4, "down": 5}[args[0]]
+                kb.click(button, int(args[1]) if len(args) > 1 else 3)
+            else:
+                return f"err unknown command: {verb}"
+    except (IndexError, KeyError, ValueError) as e:
+        return f"err {verb}: {e or 'bad arguments'}"
+
+    return f"ok {int((time.perf_counter() - start) * 1_000_000)}{suffix}"
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """Serve protocol lines until the client disconnects"""
+
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if not line:
+                continue
+            reply = run_command(self.server.keyboard, line)
+            self.wfile.write((reply + "\n").encode())
+            self.wfile.flush()
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def already_running():
+    """Return True if another daemon answers on the Unix socket"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1)
+            sock.connect(SOCKET_PATH)
+            sock.sendall(b"ping\n")
+            return sock.recv(64).startswith(b"ok")
+    except OSError:
+        return False
+
+
+def main():
+    if already_running():
+        print(f"input daemon already running on {SOCKET_PATH}")
+        return
+
+    if os.path.exists(SOCKET_PATH):
+        os.unlink(SOCKET_PATH)
+
+    display_name = os.getenv("DISPLAY", ":1")
+    kb = Keyboard(display.Display(display_name))
+    if not kb.display.query_extension("XTEST"):
+        print("ERROR: X server has no XTEST extension", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        kb.clipboard = Clipboard(display_name)
+    except Exception as e:
+        print(f"clipboard unavailable, long text will be typed: {e}", file=sys.stderr)
+
+    servers = [UnixServer(SOCKET_PATH, Handler), TCPServer(("127.0.0.1", TCP_PORT), Handler)]
+    for server in servers:
+        server.keyboard = kb
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"input daemon listening on {SOCKET_PATH} and 127.0.0.1:{TCP_PORT}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.unlink(SOCKET_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/bin/bash
+# Client helper for input_daemon.py, sourced by the input tool scripts
+# Usage: source inputd.sh; inputd_send "click 500 300 1"; case $? in 1) <fallback>;; esac
+#
+# Talks to the daemon over bash's /dev/tcp, so no process is forked.
+# Returns 1 if the daemon is not running (nothing was sent, so a fallback
+# is safe) and 2 if it was sent but failed, possibly partway: falling back
+# then could repeat input. The reply line is left in $INPUTD_REPLY.
+
+INPUTD_PORT="${INPUTD_PORT:-7707}"
+
+inputd_send() {
+    INPUTD_REPLY=""
+    { exec 3<>"/dev/tcp/127.0.0.1/$INPUTD_PORT"; } 2>/dev/null || return 1
+    printf '%s\n' "$1" >&3
+    IFS= read -r INPUTD_REPLY <&3
+    exec 3>&-
+    [[ "$INPUTD_REPLY" == ok* ]] || return 2
+}
+
+# Escape text so it fits on one protocol line (see input_daemon.py);
+# the result is left in $INPUTD_ESCAPED to avoid a command substitution
+inputd_escape() {
+    INPUTD_ESCAPED="${1//\\/\\\\}"
+    INPUTD_ESCAPED="${INPUTD_ESCAPED//$'\n'/\\n}"
+    INPUTD_ESCAPED="${INPUTD_ESCAPED//$'\t'/\\t}"
+}
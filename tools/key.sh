@@ -18,5 +18,11 @@ if [ -z "$KEY" ]; then
     exit 1
 fi
 
-DISPLAY=:1 xdotool key "$KEY"
+source "${0%/*}/inputd.sh" 2>/dev/null || source /home/daytona/tools/inputd.sh
+
+inputd_send "key $KEY"
+case $? in
+    1) DISPLAY=:1 xdotool key "$KEY" ;;
+    2) echo "Error: input daemon failed: ${INPUTD_REPLY:-no reply}"; exit 1 ;;
+esac
 echo "Pressed: $KEY"
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash cache for screen analyses.
+
+Agent loops on quizzes and forms often look at a screen they have already
+analysed. This keys the previous analysis (or chosen action) by a dHash of
+the screen, or of one region of it, so a near-identical screen can reuse it
+instead of another vision call.
+
+Usage:
+    ./screen_cache.py lookup [--region X,Y,W,H]
+        -> {"hit": true, "hash": "...", "value": "...", "distance": 1}  (exit 0)
+        -> {"hit": false, "hash": "..."}                                  (exit 1)
+    ./screen_cache.py store --hash HASH [--region X,Y,W,H] [--cost-ms 4000] --value=VALUE
+    ./screen_cache.py stats
+    ./screen_cache.py clear
+
+Pass the hash from a missed lookup to store, so the analysis is keyed by
+the screen it was made from even if the screen has changed since. Write
+--value=VALUE as one argument so a value starting with "-" is not read as
+an option.
+Entries are evicted least-recently-used once there are more than
+SCREEN_CACHE_MAX entries or SCREEN_CACHE_MAX_BYTES of stored values.
+The state lives in /tmp so it survives between tool calls, and each call
+holds a lock on it so concurrent calls do not lose each other's updates.
+
+Requires: pip install mss pillow
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import argparse
+
+STATE_FILE = os.getenv("SCREEN_CACHE_STATE", "/tmp/screen_cache.json")
+MAX_ENTRIES = int(os.getenv("SCREEN_CACHE_MAX", 128))
+MAX_BYTES = int(os.getenv("SCREEN_CACHE_MAX_BYTES", 1_000_000))
+# Max differing bits (of 256) for two screens to count as the same
+THRESHOLD = int(os.getenv("SCREEN_CACHE_THRESHOLD", 3))
+HASH_SIZE = 16
+
+
+def dhash(image, size=HASH_SIZE):
+    """Difference hash of a PIL image as a hex string (size * size bits)"""
+    from PIL import Image
+
+    image = image.convert("L")
+    # Shrink in two steps: reduce() is a cheap box filter for the bulk of it
+    factor = max(1, min(image.width // (size * 8), image.height // (size * 8)))
+    if factor > 1:
+        image = image.reduce(factor)
+    pixels = image.resize((size + 1, size), Image.BILINEAR).tobytes()
+
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{size * size // 4}x}"
+
+
+def distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def region_key(region):
+    return ",".join(str(v) for v in region) if region else "full"
+
+
+class ScreenCache:
+    """LRU cache of values keyed by (region, perceptual hash)"""
+
+    def __init__(self, path=STATE_FILE, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES,
+                 threshold=THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self.entries = []  # least recently used first
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0,
+                      "evictions": 0, "saved_ms": 0}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.entries = state.get("entries", [])
+        self.stats.update(state.get("stats", {}))
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"entries": self.entries, "stats": self.stats}, f)
+        os.replace(tmp, self.path)
+
+    def lookup(self, digest, region=None):
+        """Return (entry, distance) for the closest match within threshold, or (None, None)"""
+        key = region_key(region)
+        self.stats["lookups"] += 1
+
+        best, best_distance = None, None
+        for entry in self.entries:
+            if entry["region"] != key:
+                continue
+            d = distance(entry["hash"], digest)
+            if d <= self.threshold and (best is None or d < best_distance):
+                best, best_distance = entry, d
+
+        if best is None:
+            self.stats["misses"] += 1
+            return None, None
+
+        # Move to the most-recently-used end
+        self.entries.remove(best)
+        self.entries.append(best)
+        best["hits"] += 1
+        self.stats["hits"] += 1
+        self.stats["saved_ms"] += best.get("cost_ms") or 0
+        return best, best_distance
+
+    def store(self, digest, value, region=None, cost_ms=None):
+        """Add or replace the value for a screen hash, then evict to the caps"""
+        key = region_key(region)
+        self.entries = [e for e in self.entries if not (e["region"] == key and e["hash"] == digest)]
+        self.entries.append({
+            "hash": digest,
+            "region": key,
+            "value": value,
+            "cost_ms": cost_ms,
+            "hits": 0,
+            "stored_at": time.time()
+        })
+        self.stats["stores"] += 1
+
+        while self.entries and (
+            len(self.entries) > self.max_entries
+            or sum(len(e["value"]) for e in self.entries) > self.max_bytes
+        ):
+            self.entries.pop(0)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        self.entries = []
+        self.stats = {k: 0 for k in self.stats}
+
+    def summary(self):
+        lookups = self.stats["lookups"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            "entries": len(self.entries),
+            "bytes": sum(len(e["value"]) for e in self.entries),
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes
+        }
+
+
+def screen_hash(region=None):
+    """Grab the screen (or a region of it) and return its dHash"""
+    from fast_screenshot import grab
+
+    return dhash(grab(region))
+
+
+def parse_region(value):
+    return tuple(int(v) for v in value.split(",")) if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perceptual-hash cache for screen analyses")
+    parser.add_argument("command", choices=["lookup", "store", "stats", "clear"])
+    parser.add_argument("--value", help="analysis or action to store")
+    parser.add_argument("--hash", help="screen hash returned by lookup")
+    parser.add_argument("--region", help="X,Y,W,H")
+    parser.add_argument("--cost-ms", type=float, help="what computing the value cost")
+    args = parser.parse_args()
+    region = parse_region(args.region)
+
+    # Held until exit: the whole load-modify-save must not interleave with another call
+    lock = open(STATE_FILE + ".lock", "w")
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    cache = ScreenCache()
+
+    if args.command == "lookup":
+        t0 = time.perf_counter()
+        digest = screen_hash(region)
+        entry, d = cache.lookup(digest, region)
+        cache.save()
+        result = {"hit": entry is not None, "hash": digest,
+                  "lookup_ms": round((time.perf_counter() - t0) * 1000, 2)}
+        if entry:
+            result.update({"value": entry["value"], "distance": d})
+        print(json.dumps(result))
+        sys.exit(0 if entry else 1)
+
+    if args.command == "store":
+        if args.value is None:
+            parser.error("store needs --value")
+        cache.store(args.hash or screen_hash(region), args.value, region, args.cost_ms)
+        cache.save()
+    elif args.command == "clear":
+        cache.clear()
+        cache.save()
+
+    print(json.dumps(cache.summary()))
+
+
+if __name__ == "__main__":
+    main()
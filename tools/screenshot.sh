@@ -1,6 +1,28 @@
 #!/bin/bash
 # Takes a screenshot and saves it to /tmp/screen.png
 # Usage: ./screenshot.sh [output_path]
+#        ./screenshot.sh --fast [fast_screenshot.py options]
+#
+# --fast uses shared-memory capture with JPEG/WebP encoding, downscaling and
+# region/window cropping, e.g.:
+#   ./screenshot.sh --fast --quality 60 --scale 0.5      -> /tmp/screen.jpg
+#   ./screenshot.sh --fast --window active -o - > out.jpg
+# Timing and size stats are printed as JSON on stderr.
+#
+#        ./screenshot.sh --diff [--base FRAME_ID] [--tile 64]
+#
+# --diff prints only the tiles that changed since frame FRAME_ID as JSON
+# (see diff_screenshot.py); without a matching --base it sends a keyframe.
+
+if [ "$1" = "--fast" ]; then
+    shift
+    exec env DISPLAY=:1 python3 "$(dirname "$0")/fast_screenshot.py" "$@"
+fi
+
+if [ "$1" = "--diff" ]; then
+    shift
+    exec env DISPLAY=:1 python3 "$(dirname "$0")/diff_screenshot.py" "$@"
+fi
 
 OUTPUT="${1:-/tmp/screen.png}"
 DISPLAY=:1 scrot "$OUTPUT"
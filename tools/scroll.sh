@@ -16,9 +16,20 @@ else
     exit 1
 fi
 
-for ((i=0; i<AMOUNT; i++)); do
-    DISPLAY=:1 xdotool click "$BUTTON"
-    sleep 0.05
-done
+source "${0%/*}/inputd.sh" 2>/dev/null || source /home/daytona/tools/inputd.sh
+
+inputd_send "scroll $DIRECTION $AMOUNT"
+case $? in
+    1)
+        for ((i=0; i<AMOUNT; i++)); do
+            DISPLAY=:1 xdotool click "$BUTTON"
+            sleep 0.05
+        done
+        ;;
+    2)
+        echo "Error: input daemon failed: ${INPUTD_REPLY:-no reply}"
+        exit 1
+        ;;
+esac
 
 echo "Scrolled $DIRECTION $AMOUNT times"
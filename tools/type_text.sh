@@ -1,6 +1,9 @@
 #!/bin/bash
 # Types the specified text
 # Usage: ./type_text.sh "text to type"
+#
+# Long text is pasted through the clipboard by input_daemon.py in one step;
+# short text (and windows that ignore paste) are typed key by key.
 
 TEXT="$1"
 
@@ -9,5 +12,21 @@ if [ -z "$TEXT" ]; then
     exit 1
 fi
 
-DISPLAY=:1 xdotool type --delay 50 "$TEXT"
-echo "Typed: $TEXT"
+source "${0%/*}/inputd.sh" 2>/dev/null || source /home/daytona/tools/inputd.sh
+
+inputd_escape "$TEXT"
+inputd_send "text $INPUTD_ESCAPED"
+STATUS=$?
+if [ $STATUS -eq 0 ]; then
+    # Reply is "ok <micros> <path>"
+    read -r _ MICROS VIA <<< "$INPUTD_REPLY"
+    echo "Typed: $TEXT (via $VIA, $((MICROS / 1000)) ms)"
+elif [ $STATUS -eq 2 ]; then
+    # Some of the text may already be typed; typing it again would double it
+    echo "Error: input daemon failed: ${INPUTD_REPLY:-no reply}"
+    exit 1
+else
+    START=$(date +%s%N)
+    DISPLAY=:1 xdotool type --delay 50 "$TEXT"
+    echo "Typed: $TEXT (via xdotool, $(( ($(date +%s%N) - START) / 1000000 )) ms)"
+fi
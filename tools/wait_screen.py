@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Wait for the screen to change or to settle.
+
+Compares frames grabbed through shared memory (a few ms each) instead of
+sleeping for a worst-case delay. Frames are shrunk to 1/8 size in
+grayscale, and two frames differ only if more than --tolerance of their
+pixels changed, so a blinking caret or a small spinner does not keep the
+screen from counting as stable.
+
+Usage:
+    ./wait_screen.py change [--timeout 10]
+    ./wait_screen.py stable [--stable-ms 500] [--timeout 10]
+    ./wait_screen.py settle [--change-timeout 2] [--stable-ms 500] [--timeout 10]
+    (all modes take --tolerance 0.005)
+
+    change  return as soon as the screen differs from when we started
+    stable  return once the screen has not changed for --stable-ms
+    settle  wait briefly for a change to start, then until stable
+
+Prints one JSON line, e.g. {"ok": true, "mode": "stable", "waited_ms": 640,
+"changes": 3, "frames": 14}, and exits non-zero on timeout.
+Requires: pip install mss pillow
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import mss
+from PIL import Image, ImageChops
+
+DISPLAY = os.getenv("DISPLAY", ":1")
+
+# Fraction of (shrunk) pixels that must change for two frames to differ
+TOLERANCE = 0.005
+# A shrunk pixel counts as changed when its gray level moves by more than this
+PIXEL_THRESHOLD = 16
+SHRINK = 8
+
+
+class ScreenHasher:
+    """Grab small grayscale frames on one reusable mss handle and compare them"""
+
+    def __init__(self, tolerance=TOLERANCE):
+        self.sct = mss.mss(display=DISPLAY)
+        self.monitor = self.sct.monitors[1]
+        self.tolerance = tolerance
+        self.frames = 0
+
+    def frame(self):
+        self.frames += 1
+        shot = self.sct.grab(self.monitor)
+        image = Image.frombuffer("RGB", shot.size, shot.bgra, "raw", "BGRX", 0, 1)
+        return image.convert("L").reduce(SHRINK)
+
+    def differs(self, a, b):
+        changed = ImageChops.difference(a, b).point(lambda v: 255 if v > PIXEL_THRESHOLD else 0)
+        return changed.histogram()[255] > self.tolerance * a.width * a.height
+
+    def close(self):
+        self.sct.close()
+
+
+def wait_for_change(hasher, timeout, interval=0.05, baseline=None):
+    """Return True once the frame differs from baseline"""
+    baseline = hasher.frame() if baseline is None else baseline
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(interval)
+        if hasher.differs(hasher.frame(), baseline):
+            return True
+    return False
+
+
+def wait_until_stable(hasher, stable_ms, timeout, interval=0.05):
+    """Return (stable, changes) once no change was seen for stable_ms"""
+    deadline = time.monotonic() + timeout
+    last = hasher.frame()
+    last_change = time.monotonic()
+    changes = 0
+    while time.monotonic() < deadline:
+        time.sleep(interval)
+        current = hasher.frame()
+        now = time.monotonic()
+        # Compared with the last frame that counted, so slow drift still adds up
+        if hasher.differs(current, last):
+            last = current
+            last_change = now
+            changes += 1
+        elif (now - last_change) * 1000 >= stable_ms:
+            return True, changes
+    return False, changes
+
+
+def wait_screen(mode, timeout=10, stable_ms=500, change_timeout=2, interval=0.05,
+                tolerance=TOLERANCE):
+    """Run one wait and return the result dict"""
+    start = time.monotonic()
+    hasher = ScreenHasher(tolerance)
+    changes = 0
+    try:
+        if mode == "change":
+            ok = wait_for_change(hasher, timeout, interval)
+            changes = int(ok)
+        elif mode == "stable":
+            ok, changes = wait_until_stable(hasher, stable_ms, timeout, interval)
+        elif mode == "settle":
+            changed = wait_for_change(hasher, min(change_timeout, timeout), interval)
+            remaining = max(0, timeout - (time.monotonic() - start))
+            ok, changes = wait_until_stable(hasher, stable_ms, remaining, interval)
+            changes += int(changed)
+        else:
+            raise ValueError(f"unknown mode: {mode}")
+    finally:
+        hasher.close()
+
+    return {
+        "ok": ok,
+        "mode": mode,
+        "waited_ms": round((time.monotonic() - start) * 1000),
+        "changes": changes,
+        "frames": hasher.frames
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wait for the screen to change or settle")
+    parser.add_argument("mode", choices=["change", "stable", "settle"])
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--stable-ms", type=int, default=500)
+    parser.add_argument("--change-timeout", type=float, default=2)
+    parser.add_argument("--interval-ms", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="fraction of pixels that may change between 'equal' frames")
+    args = parser.parse_args()
+
+    result = wait_screen(
+        args.mode, args.timeout, args.stable_ms, args.change_timeout, args.interval_ms / 1000,
+        args.tolerance
+    )
+    print(json.dumps(result))
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()